@@ -8,20 +8,36 @@ import base64
 import uuid
 import datetime
 import hashlib
+import queue
+import threading
 from PIL import Image
-from flask import Flask, request, jsonify, render_template, flash, redirect, url_for
+from flask import Flask, Response, request, jsonify, render_template, flash, redirect, url_for, has_request_context, \
+    stream_with_context
 from flask_login import LoginManager, current_user, login_required
-from openai import OpenAI
 from dotenv import load_dotenv
+from sqlalchemy import text
 from sqlalchemy.sql import func
 import json
 
 # Import our hybrid style classifier and services
 import hybrid_classifier
-from db_manager import DatabaseManager
-from storage_manager import StorageManager
-from ebay_manager import EbayManager
-from models import db, User, Prediction, Favorite, Feedback
+import llm_client
+from pipeline import Pipeline, Stage
+from outbound import outbound_executor
+from rate_limiter import get_rate_limiter
+from db_manager import get_database_manager
+from storage_manager import get_storage_manager
+from ebay_manager import get_ebay_manager, product_cache as ebay_product_cache
+from product_catalog import get_product_catalog
+from models import db, User, Prediction, Favorite, Feedback, add_missing_columns
+from phash_index import phash_index, dhash, hash_to_hex, PHASH_ENABLED
+from local_classifier import encode_features
+from image_artifact import ImageArtifact
+from payload_policy import build_payload, payload_report
+from service_health import health_monitor
+from job_queue import get_job_queue
+from metrics import registry as metrics_registry
+import keyword_extractor
 
 # Import blueprints
 from auth import auth_bp
@@ -33,85 +49,18 @@ load_dotenv()
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 
-# Initialize OpenAI client with comprehensive error handling
-openai_client = None
-openai_api_key = os.environ.get("OPENAI_API_KEY")
-
+# Shared, pooled OpenAI client. It is created without any network call;
+# the API key is validated lazily (see llm_client.validate_key)
 def init_openai_client():
-    """Initialize the OpenAI client with proper error handling and validation"""
-    global openai_client, openai_api_key
-    
-    # Refresh the API key from environment in case it was updated
-    openai_api_key = os.environ.get("OPENAI_API_KEY")
-    
-    if not openai_api_key:
-        logging.warning("OPENAI_API_KEY is not set. AI-based style prediction will be unavailable.")
-        return None
-        
-    try:
-        # For newer versions of OpenAI library (without proxies parameter)
-        client = OpenAI(api_key=openai_api_key)
-        
-        # Validate the API key with a simple, low-cost API call
-        try:
-            # Use models.list as it's a lightweight API call for validation
-            # The limit parameter is not needed and may not be supported in all versions
-            client.models.list()
-            logging.info("Successfully initialized and validated OpenAI client")
-            return client
-        except Exception as validation_error:
-            if "insufficient_quota" in str(validation_error):
-                logging.error(f"OpenAI API key has insufficient quota: {str(validation_error)}")
-            else:
-                logging.error(f"OpenAI API key validation failed: {str(validation_error)}")
-            return None
-            
-    except TypeError as e:
-        if 'unexpected keyword argument' in str(e) and 'proxies' in str(e):
-            # Handle compatibility with older versions or environment issues
-            try:
-                import httpx
-                # Create compatible client without proxy settings
-                client = OpenAI(
-                    api_key=openai_api_key,
-                    http_client=httpx.Client(
-                        base_url="https://api.openai.com/v1",
-                        follow_redirects=True,
-                        timeout=60.0
-                    )
-                )
-                
-                # Validate the API key
-                try:
-                    client.models.list()
-                    logging.info("Successfully initialized and validated OpenAI client with custom HTTP client")
-                    return client
-                except Exception as validation_error:
-                    if "insufficient_quota" in str(validation_error):
-                        logging.error(f"OpenAI API key has insufficient quota: {str(validation_error)}")
-                    else:
-                        logging.error(f"OpenAI API key validation failed: {str(validation_error)}")
-                    return None
-                    
-            except Exception as custom_client_error:
-                logging.error(f"Failed to initialize OpenAI client with custom HTTP client: {str(custom_client_error)}")
-                return None
-        else:
-            logging.error(f"Error initializing OpenAI client: {str(e)}")
-            return None
-            
-    except Exception as general_error:
-        logging.error(f"Unexpected error initializing OpenAI client: {str(general_error)}")
-        logging.warning("AI-based style prediction will be unavailable or limited")
-        return None
+    """Re-create the shared OpenAI client from the current OPENAI_API_KEY"""
+    llm_client.reset()
+    return llm_client.shared_client if llm_client.shared_client else None
 
-# Initialize the OpenAI client
-openai_client = init_openai_client()
+openai_client = llm_client.shared_client
 
 # Share the OpenAI client with the hybrid_classifier module
 import hybrid_classifier
-if openai_client is not None:
-    hybrid_classifier.set_openai_client(openai_client)
+hybrid_classifier.set_openai_client(openai_client)
 
 # Create Flask app
 app = Flask(__name__)
@@ -146,6 +95,7 @@ def refresh_openai_client():
     """
     Refresh the OpenAI client with a new API key from environment variables.
     This is useful when a new API key is provided while the app is running.
+    The key is only checked against the API when ?validate=1 is passed.
     
     Returns:
         JSON response with status and message
@@ -158,10 +108,18 @@ def refresh_openai_client():
     # Share the OpenAI client with the hybrid_classifier module
     if openai_client is not None:
         hybrid_classifier.set_openai_client(openai_client)
-        return jsonify({
+        response = {
             'status': 'success',
             'message': 'OpenAI client refreshed successfully'
-        })
+        }
+        if request.args.get('validate', '').lower() in ('1', 'true'):
+            validation = llm_client.validate_key(force=True)
+            if not validation['valid']:
+                response = {
+                    'status': 'error',
+                    'message': f"OpenAI API key validation failed: {validation['error']}"
+                }
+        return jsonify(response)
     else:
         return jsonify({
             'status': 'error',
@@ -268,29 +226,35 @@ def ebay_user_deletion():
                 'message': f'Error processing deletion notification: {str(e)}'
             }), 500
 
-# Create placeholder service manager objects
-db_manager = None
-storage_manager = None
+# Services that must be healthy before /ready reports the app as ready
+READINESS_REQUIRED_SERVICES = [
+    name.strip() for name in os.environ.get('READINESS_REQUIRED_SERVICES', 'database').split(',') if name.strip()
+]
+
+# Timeouts (seconds) for the service stages of the /predict pipeline
+SERVICE_STAGE_TIMEOUTS = {
+    'storage': float(os.environ.get('STORAGE_STAGE_TIMEOUT', '20')),
+    'persistence': float(os.environ.get('PERSISTENCE_STAGE_TIMEOUT', '10')),
+    'products': float(os.environ.get('PRODUCTS_STAGE_TIMEOUT', '20')),
+}
+
+# Whether /predict queues the analysis for worker.py by default (clients can
+# also opt in or out per request with the async form or query field)
+ASYNC_PREDICT_DEFAULT = os.environ.get('ASYNC_PREDICT_DEFAULT', 'false').lower() == 'true'
+# Longest /jobs/<id>?wait= long poll, in seconds
+JOB_MAX_WAIT = float(os.environ.get('JOB_MAX_WAIT', '25'))
+
+# Service managers are process-wide singletons that connect on first use,
+# so importing the app never waits on a backend
+db_manager = get_database_manager()
+storage_manager = get_storage_manager()
 ebay_manager = None
 
-# Initialize external services with proper error handling
 try:
-    # Initialize MongoDB for storing feedback and metadata
-    db_manager = DatabaseManager()
-    if not hasattr(db_manager, 'client') or db_manager.client is None:
-        logging.warning("MongoDB connection failed. Feedback and analytics features may be limited.")
-    
-    # Initialize Backblaze B2 for image storage
-    storage_manager = StorageManager()
-    if not hasattr(storage_manager, 's3_client') or storage_manager.s3_client is None:
-        logging.warning("Backblaze B2 storage connection failed. Image upload features may be limited.")
-    
-    # Initialize eBay API for product recommendations
-    ebay_manager = EbayManager()
+    # Initialize eBay API for product recommendations (no network call)
+    ebay_manager = get_ebay_manager()
     if not hasattr(ebay_manager, 'api') or ebay_manager.api is None:
         logging.warning("eBay API connection failed. Product recommendation features may be limited.")
-        
-    logging.info("External services initialized successfully")
 except Exception as e:
     logging.error(f"Error initializing external services: {str(e)}")
     logging.warning("Application will continue with limited functionality")
@@ -305,7 +269,7 @@ def predict_style_with_openai(image):
     Uses OpenAI's GPT-4o mini with vision capabilities to predict the fashion style of an image.
     
     Args:
-        image: A PIL Image object
+        image: A PIL Image object or ImageArtifact
         
     Returns:
         A dictionary containing:
@@ -317,7 +281,7 @@ def predict_style_with_openai(image):
     logging.debug(f"Processing image of size: {image.size}")
     
     # Check if OpenAI client is available
-    if openai_client is None:
+    if not openai_client:
         logging.warning("OpenAI client not available. Using fallback style prediction.")
         return {
             "primary_style": "Contemporary Casual",
@@ -327,10 +291,8 @@ def predict_style_with_openai(image):
         }
     
     try:
-        # Convert PIL Image to base64 string
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
+        # Reuse the request's encoded image, sized for the stage
+        image_payload = build_payload(image, "style")
         
         # Create the prompt for style analysis
         prompt = """
@@ -351,7 +313,7 @@ def predict_style_with_openai(image):
         """
         
         # Call OpenAI API using GPT-4o mini for cost efficiency
-        response = openai_client.chat.completions.create(
+        response = llm_client.chat_completion(openai_client, "style_prediction",
             model="gpt-4o-mini",  # Using GPT-4o mini for cost efficiency as lengthy outputs aren't necessary
             messages=[
                 {"role": "system", "content": """You are a professional fashion stylist with expertise in identifying clothing styles and providing fashion advice.
@@ -360,7 +322,7 @@ def predict_style_with_openai(image):
                 You can identify subtle style elements and provide detailed, specific fashion analysis."""},
                 {"role": "user", "content": [
                     {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img_str}"}}
+                    image_payload.content()
                 ]}
             ],
             response_format={"type": "json_object"}
@@ -382,156 +344,42 @@ def predict_style_with_openai(image):
             "styling_tips": "Pair with minimal accessories for a polished, effortless look."
         }
 
-def generate_outfit_combinations(image, style_info):
-    """
-    Generate context-aware outfit combination suggestions based on the uploaded image
-    
-    Args:
-        image: The PIL Image object of the uploaded fashion item
-        style_info: Dictionary containing style analysis information
-        
-    Returns:
-        List of outfit combinations with descriptions and components
-    """
-    logging.debug("Generating context-aware outfit combinations")
+def prediction_outfits(style_info):
+    """Returns the classifier's outfit combinations, or seasonal suggestions if it has none"""
+    return (style_info or {}).get('outfit_combinations') or seasonal_fallback_outfits()
+
+def seasonal_fallback_outfits():
+    """Returns generic outfit suggestions named after the current month"""
+    current_month = datetime.datetime.now().strftime("%B")
     
-    # Default fallback outfits in case of timeout
-    fallback_outfits = [
+    return [
+        {
+            "name": f"{current_month} Weekend Casual",
+            "description": "A comfortable yet stylish outfit for weekend activities in the current weather",
+            "components": ["White t-shirt", "Jeans", "Sneakers", "Casual watch", "Minimal jewelry", "Light jacket"],
+            "occasion": "Weekend outings, casual meetups, outdoor activities",
+            "statement_piece": "Stylish sneakers",
+            "styling_tip": "Roll up the jeans slightly to create a more casual, relaxed look"
+        },
         {
-            "name": "Classic Combination",
-            "description": "A timeless outfit that works for multiple occasions",
-            "components": ["White t-shirt", "Dark jeans", "Leather sneakers", "Minimal accessories"],
-            "occasion": "Casual outings and everyday wear",
-            "statement_piece": "Well-fitted denim",
-            "styling_tip": "Keep accessories minimal for a clean look"
+            "name": "Seasonal Work Ensemble",
+            "description": "Professional outfit suitable for office environments during this time of year",
+            "components": ["Button-down shirt", "Tailored pants", "Leather shoes", "Belt", "Simple accessories", "Blazer"],
+            "occasion": "Office work, business meetings, professional events",
+            "statement_piece": "Well-fitted blazer",
+            "styling_tip": "Keep the blazer unbuttoned for a more relaxed professional look"
+        },
+        {
+            "name": f"{current_month} Evening Style",
+            "description": "Dressy outfit for evening social events appropriate for the current season",
+            "components": ["Dress shirt", "Dark jeans or slacks", "Leather boots", "Statement accessory", "Seasonal jacket"],
+            "occasion": "Dinner dates, evening gatherings, special events",
+            "statement_piece": "Unique statement accessory",
+            "styling_tip": "Layer appropriately based on the evening temperature"
         }
     ]
-    
-    try:
-        from concurrent.futures import ThreadPoolExecutor, TimeoutError
-        with ThreadPoolExecutor() as executor:
-            future = executor.submit(lambda: _generate_outfits_with_openai(image, style_info))
-            try:
-                return future.result(timeout=30)  # 30 second timeout
-            except TimeoutError:
-                logging.warning("OpenAI request timed out, using fallback outfits")
-                return fallback_outfits
-    except Exception as e:
-        logging.error(f"Error generating outfits: {e}")
-        return fallback_outfits
-    try:
-        # Convert PIL Image to base64 string
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        
-        # Get current month and season for context awareness
-        current_month = datetime.datetime.now().strftime("%B")  # Full month name
-        
-        # Determine current season in Northern Hemisphere (adjust as needed)
-        month_num = datetime.datetime.now().month
-        if 3 <= month_num <= 5:
-            current_season = "Spring"
-        elif 6 <= month_num <= 8:
-            current_season = "Summer"
-        elif 9 <= month_num <= 11:
-            current_season = "Fall"
-        else:
-            current_season = "Winter"
-            
-        # Extract style attributes if available
-        attributes = style_info.get('attributes', {})
-        garment_type = attributes.get('garment_type', 'clothing item')
-        colors = attributes.get('colors', [])
-        color_description = ', '.join(colors) if colors else 'unknown colors'
-        
-        # Create the prompt for outfit generation with context
-        prompt = f"""
-        I'm looking at a fashion item/outfit with these details:
-        - Primary style: {style_info.get('primary_style', 'Unknown')}
-        - Style tags: {', '.join(style_info.get('style_tags', ['trendy']))}
-        - Type of garment: {garment_type}
-        - Colors: {color_description}
-        
-        Current context:
-        - Month: {current_month}
-        - Season: {current_season}
-        
-        Based on this image and the current {current_season} season, suggest 3 different complete outfit combinations that would work well with this item.
-        
-        For each outfit:
-        1. Give it a catchy name that references the current season
-        2. Provide a brief description of the overall look, mentioning how it's appropriate for the current weather
-        3. List all components (4-6 items) needed for the complete look, with specific details about colors and styles
-        4. Suggest specific occasions where it would be appropriate during this season
-        5. Include at least one accessory recommendation
-        
-        Format your response as a JSON array with each outfit as an object containing:
-        - name: The outfit name (include the season or a seasonal reference)
-        - description: Overall look description (mention how it works for the current weather)
-        - components: Array of individual clothing/accessory items with specific details
-        - occasion: Where to wear this outfit (be specific about seasonal activities)
-        - statement_piece: The key item that makes this outfit stand out
-        - styling_tip: One practical tip for wearing this outfit effectively
-        """
-        
-        # Call OpenAI API with enhanced prompt using GPT-4o mini for cost efficiency
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",  # Using GPT-4o mini for cost efficiency as lengthy outputs aren't necessary
-            messages=[
-                {"role": "system", "content": """You are a professional fashion stylist specializing in seasonal outfit creation.
-                You have an expert eye for coordination, color matching, and creating cohesive looks appropriate for specific seasons and occasions.
-                You understand how to layer clothing appropriately for different weather conditions.
-                When suggesting outfits, be extremely specific about items, including details like exact colors, fabric types, cuts, and styles.
-                Focus on creating outfits that are practical and wearable while maintaining style."""},
-                {"role": "user", "content": [
-                    {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img_str}"}}
-                ]}
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.7  # Slightly higher temperature for more creative outfit combinations
-        )
-        
-        # Parse the response
-        result = json.loads(response.choices[0].message.content)
-        logging.debug(f"Generated outfit combinations: {result}")
-        
-        return result.get("outfits", [])
-    
-    except Exception as e:
-        logging.error(f"Error generating outfit combinations: {str(e)}")
-        # Return fallback outfit suggestions if OpenAI fails
-        current_month = datetime.datetime.now().strftime("%B")
-        
-        return [
-            {
-                "name": f"{current_month} Weekend Casual",
-                "description": "A comfortable yet stylish outfit for weekend activities in the current weather",
-                "components": ["White t-shirt", "Jeans", "Sneakers", "Casual watch", "Minimal jewelry", "Light jacket"],
-                "occasion": "Weekend outings, casual meetups, outdoor activities",
-                "statement_piece": "Stylish sneakers",
-                "styling_tip": "Roll up the jeans slightly to create a more casual, relaxed look"
-            },
-            {
-                "name": "Seasonal Work Ensemble",
-                "description": "Professional outfit suitable for office environments during this time of year",
-                "components": ["Button-down shirt", "Tailored pants", "Leather shoes", "Belt", "Simple accessories", "Blazer"],
-                "occasion": "Office work, business meetings, professional events",
-                "statement_piece": "Well-fitted blazer",
-                "styling_tip": "Keep the blazer unbuttoned for a more relaxed professional look"
-            },
-            {
-                "name": f"{current_month} Evening Style",
-                "description": "Dressy outfit for evening social events appropriate for the current season",
-                "components": ["Dress shirt", "Dark jeans or slacks", "Leather boots", "Statement accessory", "Seasonal jacket"],
-                "occasion": "Dinner dates, evening gatherings, special events",
-                "statement_piece": "Unique statement accessory",
-                "styling_tip": "Layer appropriately based on the evening temperature"
-            }
-        ]
 
-def fetch_ebay_recommendations(style, limit=6, user_comments=''):
+def fetch_ebay_recommendations(style, limit=6, user_comments='', ebay=None, style_info=None):
     """
     Fetch product recommendations from eBay API based on predicted style.
     
@@ -539,84 +387,47 @@ def fetch_ebay_recommendations(style, limit=6, user_comments=''):
         style: The predicted fashion style
         limit: Maximum number of products to return
         user_comments: Optional user comments to refine recommendations
+        ebay: EbayManager to search with (defaults to the process-wide one)
+        style_info: Optional prediction whose style tags and attributes rank
+            products served from the local catalog
         
     Returns:
         List of product recommendations with details
     """
-    from ebay_manager import EbayManager
-    
-    # Initialize eBay API client
-    ebay_manager = EbayManager()
+    # Reuse the process-wide client, its pooled connections and rate limit state
+    ebay_manager = ebay or get_ebay_manager()
     
-    # Use the style name directly as the search query
-    search_query = style.lower() + " fashion clothing"
-    
-    # If user provided comments, extract useful keywords for recommendations
-    if user_comments:
-        # Log the user comments
-        logging.debug(f"User provided comments for recommendations: {user_comments}")
-        
-        try:
-            # Use OpenAI to extract relevant keywords from user comments
-            # This would help tailor the recommendations more accurately
-            response = openai_client.chat.completions.create(
-                model="gpt-4o-mini",  # Using GPT-4o mini for cost efficiency as lengthy outputs aren't necessary
-                messages=[
-                    {"role": "system", "content": """You are a fashion search query expert.
-                    Extract relevant fashion search keywords from user comments.
-                    Focus on extracting:
-                    - Specific item types (jeans, dresses, etc.)
-                    - Size preferences or measurements
-                    - Color preferences
-                    - Material preferences
-                    - Occasion needs
-                    - Brand preferences
-                    - Price preferences
-                    - Specific style elements
-                    Return only the most relevant keywords as a comma-separated list."""},
-                    {"role": "user", "content": f"Extract fashion search keywords from this comment: {user_comments}"}
-                ],
-                max_tokens=100
-            )
-            
-            # Get the extracted keywords
-            extracted_keywords = response.choices[0].message.content.strip()
-            
-            if extracted_keywords:
-                # Enhance search query with extracted keywords
-                search_query = f"{search_query} {extracted_keywords}"
-                logging.debug(f"Enhanced search query based on user comments: {search_query}")
-        except Exception as e:
-            logging.error(f"Error processing user comments for recommendations: {str(e)}")
-            # Continue with the original search query if there's an error
-    
-    logging.debug(f"Searching for products with query: {search_query}")
+    # Turn the user's comments into search keywords (vocabulary based, with an
+    # LLM fallback only for long comments; results are cached)
+    keywords = keyword_extractor.extract_keywords(user_comments, openai_client) if user_comments else None
+    if keywords:
+        logging.debug(f"Search keywords from user comments ({keywords['source']}): "
+                      f"{keyword_extractor.keywords_query(keywords)}")
     
     try:
-        # Check if eBay API connection is available
-        if ebay_manager.connection_available:
-            # Use eBay API to get real product recommendations
-            logging.info(f"Using eBay API to search for products with style: {style}")
-            products = ebay_manager.search_products(style, user_comments, limit)
-            
-            # If we got results from eBay API, return them
-            if products:
-                logging.info(f"Found {len(products)} products from eBay API")
-                return products
-            else:
-                # Create a more informative message about rate limiting
-                logging.warning("eBay API rate limit reached or no products found, showing rate limit message")
-                return [{
-                    'id': 'rate-limit',
-                    'title': 'eBay API Rate Limit',
-                    'description': 'We\'ve reached eBay\'s API request limit. Try again later to see real product recommendations.',
-                    'price': 'N/A',
-                    'image': 'https://placehold.co/400x300/2a2a2a/ffffff?text=Rate+Limit+Reached',
-                    'url': '#',
-                    'rating': 0,
-                    'reviews': 0,
-                    'is_error_message': True
-                }]
+        # The local catalog can answer even when the eBay API is unreachable
+        logging.info(f"Searching for products with style: {style}")
+        products = ebay_manager.search_products(style, user_comments, limit, keywords=keywords,
+                                                style_info=style_info)
+        
+        # If we got results from the catalog or eBay API, return them
+        if products:
+            logging.info(f"Found {len(products)} products")
+            return products
+        elif ebay_manager.connection_available:
+            # Create a more informative message about rate limiting
+            logging.warning("eBay API rate limit reached or no products found, showing rate limit message")
+            return [{
+                'id': 'rate-limit',
+                'title': 'eBay API Rate Limit',
+                'description': 'We\'ve reached eBay\'s API request limit. Try again later to see real product recommendations.',
+                'price': 'N/A',
+                'image': 'https://placehold.co/400x300/2a2a2a/ffffff?text=Rate+Limit+Reached',
+                'url': '#',
+                'rating': 0,
+                'reviews': 0,
+                'is_error_message': True
+            }]
         else:
             logging.warning("eBay API connection not available, showing connection error message")
             return [{
@@ -671,15 +482,90 @@ def generate_sample_products(style, limit=6, search_query=None):
         'is_error_message': True
     }]
 
+def store_image_metadata(storage_result):
+    """Store metadata about a stored image in MongoDB"""
+    if not storage_result or not storage_result.get('success'):
+        return False
+    
+    metadata = {
+        'image_id': storage_result.get('image_id'),
+        'storage_path': storage_result.get('storage_path'),
+        'upload_timestamp': datetime.datetime.now().isoformat(),
+        'file_size': storage_result.get('file_size'),
+        'dimensions': storage_result.get('dimensions')
+    }
+    return db_manager.store_image_metadata(metadata)
+
+def store_style_prediction(storage_result, style_info):
+    """
+    Store the style prediction result in MongoDB
+    
+    Returns:
+        The stored prediction data, or None if the image was not stored
+    """
+    if not storage_result or not storage_result.get('success'):
+        return None
+    
+    prediction_data = {
+        'prediction_id': str(uuid.uuid4()),
+        'image_id': storage_result.get('image_id'),
+        'primary_style': style_info.get('primary_style'),
+        'style_tags': style_info.get('style_tags', []),
+        'confidence_score': random.randint(70, 95),  # Placeholder confidence score
+        'attributes': style_info.get('attributes', {}),
+        'analysis_mode': style_info.get('analysis_mode'),
+        'timestamp': datetime.datetime.now().isoformat()
+    }
+    db_manager.store_style_prediction(prediction_data)
+    return prediction_data
+
+def find_near_duplicate_analysis(image_phash):
+    """
+    Look up the analysis of an earlier prediction whose image is perceptually
+    identical (within PHASH_MAX_DISTANCE bits) to the uploaded one.
+    
+    Args:
+        image_phash: Perceptual hash of the uploaded image
+        
+    Returns:
+        The earlier prediction's analysis dictionary, or None
+    """
+    match = phash_index.lookup(image_phash)
+    if not match:
+        return None
+    
+    prediction_id, distance = match
+    try:
+        prediction = Prediction.query.get(prediction_id)
+        if prediction and prediction.analysis:
+            logging.info(f"Reusing analysis of prediction {prediction_id} (hash distance {distance})")
+            return json.loads(prediction.analysis)
+    except Exception as e:
+        logging.error(f"Error loading near-duplicate prediction {prediction_id}: {str(e)}")
+    return None
+
 # Store a prediction in the database (SQL)
-def store_prediction_in_db(style_info, image_path):
-    """Store the prediction in the SQL database"""
+def store_prediction_in_db(style_info, image_path, image_phash=None, reusable=False, local_features=None,
+                           user_id=None):
+    """
+    Store the prediction in the SQL database
+    
+    Args:
+        style_info: Combined style analysis
+        image_path: URL of the stored image
+        image_phash: Optional perceptual hash of the image
+        reusable: Whether the analysis is complete enough to be reused for near duplicates
+            and as a training example for the local classifier
+        local_features: Optional local classifier feature vector of the image
+        user_id: Owner of the prediction (defaults to the logged in user of the current request)
+    """
     try:
         # Create a new prediction record
         prediction_id = str(uuid.uuid4())
         
-        # Get user_id if user is authenticated
-        user_id = current_user.id if current_user.is_authenticated else None
+        # Get user_id if user is authenticated (there is no user outside a request, e.g. in batch runs)
+        if user_id is None and has_request_context() and current_user.is_authenticated:
+            user_id = current_user.id
         
         # Convert style tags to a JSON string
         style_tags_json = json.dumps(style_info.get('style_tags', []))
@@ -697,9 +583,26 @@ def store_prediction_in_db(style_info, image_path):
             confidence_score=confidence_score
         )
         
+        # Keep the hash and analysis so near-duplicate uploads can reuse this prediction
+        if reusable and image_phash is not None:
+            new_prediction.image_phash = hash_to_hex(image_phash)
+            new_prediction.analysis = json.dumps(style_info)
+        # Local answers are not training examples, so the local classifier does not learn from itself
+        if reusable and local_features is not None and style_info.get('analysis_source') != 'local':
+            new_prediction.local_features = encode_features(local_features)
+        
+        # Record which model answered and how confident the local model was,
+        # so the cascade threshold can be tuned against feedback
+        new_prediction.analysis_source = style_info.get('analysis_source')
+        if style_info.get('local_analysis'):
+            new_prediction.local_margin = style_info['local_analysis'].get('margin')
+        
         db.session.add(new_prediction)
         db.session.commit()
         
+        if new_prediction.image_phash:
+            phash_index.add(image_phash, prediction_id)
+        
         return prediction_id
         
     except Exception as e:
@@ -742,115 +645,371 @@ def index():
     
     return render_template('index.html', style_categories=style_categories, recent_styles=recent_styles)
 
-@app.route('/predict', methods=['POST'])
-def predict():
+def get_uploaded_image():
     """
-    Process the uploaded image and return a style prediction using hybrid classification
+    Returns the uploaded image file of a prediction request
     
     Returns:
-        JSON response with predicted style or error message
+        Tuple of (image file, error message); the error message is None if an image was uploaded
     """
-    try:
-        if 'image' not in request.files:
-            return jsonify({'error': 'No image file provided'}), 400
-        
-        image_file = request.files['image']
-        if image_file.filename == '':
-            return jsonify({'error': 'No selected image file'}), 400
+    if 'image' not in request.files:
+        return None, 'No image file provided'
+    
+    image_file = request.files['image']
+    if image_file.filename == '':
+        return None, 'No selected image file'
+    return image_file, None
+
+def prediction_options():
+    """
+    Returns the options of a prediction request
+    
+    Returns:
+        Dictionary with user_comments, analysis_mode and include_attributes
+    """
+    # Get optional user comments
+    user_comments = request.form.get('user_comments', '')
+    logging.debug(f"User provided comments: {user_comments}")
+    
+    return {
+        'user_comments': user_comments,
+        # Optional override of the classifier's analysis mode ("multi" or "single")
+        'analysis_mode': request.form.get('analysis_mode'),
+        # In cascade mode, detailed attributes are only extracted on request (or on escalation)
+        'include_attributes': request.form.get('detailed_attributes', '').lower() in ('1', 'true', 'on')
+    }
+
+def build_prediction(image, options, ebay=None):
+    """
+    Build the stages of a prediction
+    
+    Args:
+        image: Image artifact of the upload; every stage shares it and its
+            memoized resized and encoded forms
+        options: Dictionary returned by prediction_options
+        ebay: EbayManager for the product search (defaults to the process-wide one)
         
-        # Get optional user comments
-        user_comments = request.form.get('user_comments', '')
-        logging.debug(f"User provided comments: {user_comments}")
+    Returns:
+        Tuple of (pipeline stages, perceptual hash)
+    """
+    user_comments = options.get('user_comments', '')
+    analysis_mode = hybrid_classifier.resolve_analysis_mode(options.get('analysis_mode'))
+    include_attributes = options.get('include_attributes', False)
+    
+    # Reuse the analysis of a perceptually identical earlier upload if there is one
+    image_phash = dhash(image.resized()) if PHASH_ENABLED else None
+    known_analysis = find_near_duplicate_analysis(image_phash) if image_phash is not None else None
+    
+    # Classification, storage, persistence and product search form one
+    # stage pipeline so independent network calls overlap
+    stages = hybrid_classifier.classification_stages(analysis_mode, known_analysis, include_attributes) + [
+        Stage('storage', lambda img: storage_manager.store_image(img), inputs=('image',),
+              timeout=SERVICE_STAGE_TIMEOUTS['storage'], fallback={'success': False}),
+        Stage('image_metadata', store_image_metadata, inputs=('storage',),
+              timeout=SERVICE_STAGE_TIMEOUTS['persistence'], fallback=False),
+        Stage('mongo_prediction', store_style_prediction, inputs=('storage', 'style_info'),
+              timeout=SERVICE_STAGE_TIMEOUTS['persistence']),
+        Stage('products',
+              lambda info: fetch_ebay_recommendations(info.get('primary_style'), limit=6,
+                                                      user_comments=user_comments, ebay=ebay, style_info=info),
+              inputs=('style_info',), timeout=SERVICE_STAGE_TIMEOUTS['products'], fallback=[]),
+    ]
+    return stages, image_phash
+
+# Shown when the uploaded image could not be stored
+PLACEHOLDER_IMAGE_URL = "https://placehold.co/600x400/1e1e1e/cccccc?text=Image+Storage+Failed"
+
+def stored_image_url(storage_result):
+    """Returns the public URL of a stored upload, or a placeholder if storage failed"""
+    if storage_result and storage_result.get('success'):
+        return storage_result.get('public_url')
+    return PLACEHOLDER_IMAGE_URL
+
+def finish_prediction(result, image, image_phash, user_id=None):
+    """
+    Store a finished prediction in the SQL database and build the response
+    
+    Args:
+        result: PipelineResult of the prediction stages
+        image: Image artifact of the upload
+        image_phash: Perceptual hash of the upload
+        user_id: Owner of the prediction outside a request (defaults to the logged in user)
         
-        # Open and process the image
-        image = Image.open(image_file)
+    Returns:
+        Response dictionary
+    """
+    style_info = result['style_info']
+    logging.debug(f"Hybrid classifier result: {style_info}")
+    outfits = prediction_outfits(style_info)
+    storage_result = result['storage']
+    products = result['products']
+    image_url = stored_image_url(storage_result)
+    
+    # Check if storage was successful
+    if storage_result and storage_result.get('success'):
+        logging.debug(f"Image stored successfully. URL: {image_url}, ID: {storage_result.get('image_id')}")
         
-        # Call our hybrid classifier to analyze the image
-        style_info = hybrid_classifier.classify_fashion_style(image)
-        logging.debug(f"Hybrid classifier result: {style_info}")
+        # Also store in SQL database for user accounts functionality
+        prediction_id = store_prediction_in_db(
+            style_info, image_url, image_phash,
+            reusable=hybrid_classifier.is_complete_result(result),
+            local_features=result.get('local_features'),
+            user_id=user_id
+        )
+        if not prediction_id:
+            prediction_data = result['mongo_prediction']
+            prediction_id = prediction_data['prediction_id'] if prediction_data else str(uuid.uuid4())
+    else:
+        # If storage failed, use a placeholder URL and ID
+        logging.warning("Image storage failed, using placeholder values")
+        prediction_id = str(uuid.uuid4())
+    
+    # Prepare the response
+    response = {
+        'prediction_id': prediction_id,
+        'primary_style': style_info.get('primary_style'),
+        'style_tags': style_info.get('style_tags', []),
+        'description': style_info.get('description') or style_info.get('style_description', ''),
+        'styling_tips': style_info.get('styling_tips', ''),
+        'image_url': image_url,
+        'attributes': style_info.get('attributes', {}),
+        'outfit_combinations': outfits,
+        'products': products,
+        'confidence_score': style_info.get('confidence_score', 85),  # Default confidence score
+        'analysis_mode': style_info.get('analysis_mode'),
+        'analysis_source': style_info.get('analysis_source'),
+        'local_analysis': style_info.get('local_analysis'),
+        'stage_timings': result.timings,
+        'payload': payload_report(image)
+    }
+    logging.info(f"Vision payload: {response['payload']['total_bytes']} bytes, "
+                 f"~{response['payload']['estimated_image_tokens']} image tokens")
+    return response
+
+def prediction_error(e):
+    """
+    Log a failed prediction and describe it for the client
+    
+    Returns:
+        Tuple of (error dictionary, HTTP status)
+    """
+    error_message = str(e)
+    logging.error(f"Error in style prediction: {error_message}")
+    
+    # Check if it's an OpenAI API-related error
+    if "openai" in error_message.lower() or "api key" in error_message.lower() or "quota" in error_message.lower():
+        # Make the error message more user-friendly
+        user_message = "OpenAI API issue detected. Please check your API key or try refreshing the connection."
+        logging.warning("OpenAI API error detected, suggesting refresh")
+        return {'error': user_message, 'type': 'openai_error'}, 500
+    else:
+        # Generic error message for other errors
+        return {'error': f'Style prediction failed: {error_message}'}, 500
+
+def overloaded_response():
+    """
+    Returns a 503 response while the outbound executor has no free capacity,
+    so new analyses are turned away up front instead of timing out half way.
+    
+    Returns:
+        (response, status, headers) tuple, or None when there is capacity
+    """
+    stats = outbound_executor.stats()
+    if stats['saturation'] < 1:
+        return None
+    logging.warning(f"Rejecting prediction, outbound executor is full: {stats}")
+    return jsonify({'error': 'The server is busy, please try again shortly.', 'type': 'overloaded'}), 503, {'Retry-After': '5'}
+
+def wants_async_prediction():
+    """Whether a /predict request should be queued instead of answered inline"""
+    value = request.values.get('async')
+    if value is None:
+        return ASYNC_PREDICT_DEFAULT
+    return value.lower() in ('1', 'true', 'on')
+
+def enqueue_prediction(image_file):
+    """
+    Validate an upload and queue its analysis for a worker
+    
+    Args:
+        image_file: Uploaded image file
         
-        # Generate outfit combinations based on the style analysis
-        outfits = generate_outfit_combinations(image, style_info)
+    Returns:
+        202 response with the job id and the URL to poll
+    """
+    image_bytes = image_file.read()
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image.verify()
+    except Exception as e:
+        return jsonify({'error': f'Invalid image file: {str(e)}'}), 400
+    
+    params = prediction_options()
+    params['user_id'] = current_user.id if current_user.is_authenticated else None
+    job_id = get_job_queue().enqueue('predict', params, image_bytes)
+    logging.info(f"Queued prediction job {job_id} ({len(image_bytes)} bytes)")
+    
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': url_for('get_job', job_id=job_id)
+    }), 202
+
+def run_prediction_job(job):
+    """
+    Run a queued prediction (called by worker.py inside an app context)
+    
+    Args:
+        job: Job claimed from the job queue
         
-        # Store the image in cloud storage if needed
-        storage_result = storage_manager.store_image(image)
+    Returns:
+        The same response dictionary /predict returns
+    """
+    image = ImageArtifact.from_file(io.BytesIO(job.payload))
+    stages, image_phash = build_prediction(image, job.params)
+    result = Pipeline(stages).run(image=image)
+    return finish_prediction(result, image, image_phash, user_id=job.params.get('user_id'))
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Returns the state of a queued prediction, and its result once done.
+    With ?wait=<seconds>, waits up to JOB_MAX_WAIT seconds for it to finish.
+    """
+    job_queue = get_job_queue()
+    wait = min(request.args.get('wait', 0, type=float) or 0, JOB_MAX_WAIT)
+    job = job_queue.wait(job_id, wait) if wait > 0 else job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/predict', methods=['POST'])
+def predict():
+    """
+    Process the uploaded image and return a style prediction using hybrid classification.
+    In async mode the analysis is queued for worker.py and a job id is returned instead.
+    
+    Returns:
+        JSON response with predicted style (or job id) or error message
+    """
+    try:
+        image_file, error = get_uploaded_image()
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Check if storage was successful
-        if storage_result and storage_result.get('success'):
-            # Use the public URL from storage
-            image_url = storage_result.get('public_url')
-            image_id = storage_result.get('image_id')
-            
-            logging.debug(f"Image stored successfully. URL: {image_url}, ID: {image_id}")
-            
-            # Store metadata about the image in MongoDB
-            metadata = {
-                'image_id': image_id,
-                'storage_path': storage_result.get('storage_path'),
-                'upload_timestamp': datetime.datetime.now().isoformat(),
-                'file_size': storage_result.get('file_size'),
-                'dimensions': storage_result.get('dimensions')
-            }
-            db_manager.store_image_metadata(metadata)
-            
-            # Store the style prediction result in MongoDB
-            prediction_data = {
-                'prediction_id': str(uuid.uuid4()),
-                'image_id': image_id,
-                'primary_style': style_info.get('primary_style'),
-                'style_tags': style_info.get('style_tags', []),
-                'confidence_score': random.randint(70, 95),  # Placeholder confidence score
-                'attributes': style_info.get('attributes', {}),
-                'timestamp': datetime.datetime.now().isoformat()
-            }
-            db_manager.store_style_prediction(prediction_data)
-            
-            # Also store in SQL database for user accounts functionality
-            prediction_id = store_prediction_in_db(style_info, image_url)
-            if not prediction_id:
-                prediction_id = prediction_data['prediction_id']
-        else:
-            # If storage failed, use a placeholder URL and ID
-            logging.warning("Image storage failed, using placeholder values")
-            image_url = "https://placehold.co/600x400/1e1e1e/cccccc?text=Image+Storage+Failed"
-            prediction_id = str(uuid.uuid4())
-        
-        # Fetch product recommendations based on predicted style
-        products = fetch_ebay_recommendations(
-            style_info.get('primary_style'), 
-            limit=6,
-            user_comments=user_comments
-        )
+        if wants_async_prediction():
+            return enqueue_prediction(image_file)
         
-        # Prepare and return the response
-        response = {
-            'prediction_id': prediction_id,
-            'primary_style': style_info.get('primary_style'),
-            'style_tags': style_info.get('style_tags', []),
-            'description': style_info.get('description', ''),
-            'styling_tips': style_info.get('styling_tips', ''),
-            'image_url': image_url,
-            'attributes': style_info.get('attributes', {}),
-            'outfit_combinations': outfits,
-            'products': products,
-            'confidence_score': style_info.get('confidence_score', 85)  # Default confidence score
-        }
+        overloaded = overloaded_response()
+        if overloaded:
+            return overloaded
         
-        return jsonify(response)
+        # Decode the image once; every stage shares the artifact
+        image = ImageArtifact.from_file(image_file)
+        stages, image_phash = build_prediction(image, prediction_options())
+        result = Pipeline(stages).run(image=image)
+        return jsonify(finish_prediction(result, image, image_phash))
     
     except Exception as e:
-        error_message = str(e)
-        logging.error(f"Error in style prediction: {error_message}")
-        
-        # Check if it's an OpenAI API-related error
-        if "openai" in error_message.lower() or "api key" in error_message.lower() or "quota" in error_message.lower():
-            # Make the error message more user-friendly
-            user_message = "OpenAI API issue detected. Please check your API key or try refreshing the connection."
-            logging.warning("OpenAI API error detected, suggesting refresh")
-            return jsonify({'error': user_message, 'type': 'openai_error'}), 500
-        else:
-            # Generic error message for other errors
-            return jsonify({'error': f'Style prediction failed: {error_message}'}), 500
+        error, status = prediction_error(e)
+        return jsonify(error), status
+
+def _style_event(values):
+    analysis = values['cached_analysis'] or values['style_analysis'] or {}
+    return {
+        'primary_style': analysis.get('primary_style'),
+        'style_tags': analysis.get('style_tags', []),
+        'description': analysis.get('style_description', ''),
+        'styling_tips': analysis.get('styling_tips', ''),
+        'confidence_score': analysis.get('confidence_score', 85),
+        'analysis_source': analysis.get('analysis_source', 'gpt')
+    }
+
+def _attributes_event(values):
+    analysis = values['cached_analysis'] or hybrid_classifier.combine_analysis(
+        values['style_analysis'] or {}, values['attribute_analysis'] or {})
+    return {'attributes': analysis.get('attributes', {})}
+
+# Events of /predict/stream in the order they are sent: (event name, stages it
+# waits for, builder of its data from the stage values)
+PREDICT_STREAM_EVENTS = [
+    ('style', ('cached_analysis', 'style_analysis'), _style_event),
+    ('attributes', ('cached_analysis', 'style_analysis', 'attribute_analysis'), _attributes_event),
+    ('outfits', ('style_info',), lambda values: {'outfit_combinations': prediction_outfits(values['style_info'])}),
+    ('image', ('storage',), lambda values: {'image_url': stored_image_url(values['storage'])}),
+    ('products', ('products',), lambda values: {'products': values['products']}),
+]
+
+def sse_event(event, data):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.route('/predict/stream', methods=['POST'])
+def predict_stream():
+    """
+    Streaming variant of /predict. Sends server-sent events as the pipeline
+    progresses, in order: style, attributes, outfits, image, products, and
+    finally done with the same body /predict returns (or error).
+    """
+    image_file, error = get_uploaded_image()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    overloaded = overloaded_response()
+    if overloaded:
+        return overloaded
+    
+    try:
+        image = ImageArtifact.from_file(image_file)
+        stages, image_phash = build_prediction(image, prediction_options())
+    except Exception as e:
+        error, status = prediction_error(e)
+        return jsonify(error), status
+    
+    events = queue.Queue()
+    values = {}
+    sent = [0]
+    
+    def on_complete(name, value, status):
+        # Called on the pipeline thread; release events in their fixed order
+        values[name] = value
+        while sent[0] < len(PREDICT_STREAM_EVENTS):
+            event, required, build = PREDICT_STREAM_EVENTS[sent[0]]
+            if not all(stage in values for stage in required):
+                break
+            events.put(('event', sse_event(event, build(values))))
+            sent[0] += 1
+    
+    def run_pipeline():
+        try:
+            events.put(('result', Pipeline(stages, on_complete=on_complete).run(image=image)))
+        except Exception as e:
+            events.put(('error', e))
+    
+    threading.Thread(target=run_pipeline, name='predict-stream', daemon=True).start()
+    
+    def generate():
+        while True:
+            try:
+                kind, item = events.get(timeout=15)
+            except queue.Empty:
+                # Keep proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            
+            if kind == 'event':
+                yield item
+                continue
+            try:
+                if kind == 'error':
+                    raise item
+                yield sse_event('done', finish_prediction(item, image, image_phash))
+            except Exception as e:
+                yield sse_event('error', prediction_error(e)[0])
+            return
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/feedback', methods=['POST'])
 def submit_feedback():
@@ -918,6 +1077,26 @@ def submit_feedback():
         logging.error(f"Error submitting feedback: {str(e)}")
         return jsonify({'error': f'Feedback submission failed: {str(e)}'}), 500
 
+def popular_styles(limit=5, since=None):
+    """
+    Most predicted styles
+    
+    Args:
+        limit: Number of styles to return
+        since: Optional datetime; only count predictions made after it
+        
+    Returns:
+        List of {'style', 'count'} dictionaries, most predicted first
+    """
+    query = db.session.query(
+        Prediction.primary_style, 
+        func.count(Prediction.id).label('count')
+    )
+    if since is not None:
+        query = query.filter(Prediction.created_at >= since)
+    rows = query.group_by(Prediction.primary_style).order_by(func.count(Prediction.id).desc()).limit(limit).all()
+    return [{'style': style, 'count': count} for style, count in rows]
+
 @app.route('/stats', methods=['GET'])
 def get_stats():
     """
@@ -934,14 +1113,7 @@ def get_stats():
         sql_stats = {}
         try:
             # Most popular styles
-            popular_styles = db.session.query(
-                Prediction.primary_style, 
-                func.count(Prediction.id).label('count')
-            ).group_by(Prediction.primary_style).order_by(func.count(Prediction.id).desc()).limit(5).all()
-            
-            sql_stats['popular_styles'] = [
-                {'style': style, 'count': count} for style, count in popular_styles
-            ]
+            sql_stats['popular_styles'] = popular_styles(5)
             
             # Accuracy rate
             total_feedback = Feedback.query.count()
@@ -952,26 +1124,122 @@ def get_stats():
             sql_stats['total_predictions'] = Prediction.query.count()
             sql_stats['total_feedback'] = total_feedback
             
+            # Feedback accuracy by answering model, for tuning the cascade threshold
+            source_accuracy = db.session.query(
+                Prediction.analysis_source,
+                func.count(Feedback.id),
+                func.sum(db.case((Feedback.is_accurate.is_(True), 1), else_=0))
+            ).join(Feedback, Feedback.prediction_id == Prediction.id).group_by(Prediction.analysis_source).all()
+            
+            sql_stats['accuracy_by_source'] = {
+                (source or 'unknown'): {
+                    'feedback': count,
+                    'accuracy_rate': round((accurate or 0) / count * 100, 1) if count else 0
+                } for source, count, accurate in source_accuracy
+            }
+            
         except Exception as e:
             logging.error(f"Error fetching SQL stats: {str(e)}")
         
         # Combine stats
         combined_stats = {**mongo_stats, **sql_stats}
         
+        # Cascade escalation rate (this worker; /metrics has cascade_decisions_total for every worker)
+        combined_stats['cascade'] = hybrid_classifier.get_cascade_stats()
+        
+        # Classification cache effectiveness (shared by all workers)
+        if hybrid_classifier.classification_cache is not None:
+            combined_stats['classification_cache'] = hybrid_classifier.classification_cache.stats()
+        if hybrid_classifier.outfit_cache is not None:
+            combined_stats['outfit_cache'] = hybrid_classifier.outfit_cache.stats()
+        if keyword_extractor.keyword_cache is not None:
+            combined_stats['keyword_cache'] = keyword_extractor.keyword_cache.stats()
+        if ebay_product_cache is not None:
+            # Includes stale_hits, negative_hits, refreshes and coalesced searches
+            combined_stats['ebay_cache'] = ebay_product_cache.stats()
+        
+        # Shared outbound pool load and eBay client state (this worker)
+        combined_stats['outbound'] = outbound_executor.stats()
+        if ebay_manager is not None:
+            combined_stats['ebay'] = ebay_manager.stats()
+        # Remaining API budgets shared by every process on the host
+        combined_stats['rate_limits'] = get_rate_limiter().stats()
+        # Local product catalog (shared) and its index (this worker)
+        if get_product_catalog() is not None:
+            combined_stats['catalog'] = get_product_catalog().stats()
+        
         return jsonify(combined_stats)
     
     except Exception as e:
         logging.error(f"Error getting stats: {str(e)}")
         return jsonify({'error': f'Failed to retrieve statistics: {str(e)}'}), 500
 
-# Create necessary database tables when the app starts
+@app.route('/ready')
+def readiness():
+    """
+    Readiness probe. Reports the cached health of the backing services
+    without contacting them; returns 503 until the required ones are healthy.
+    """
+    state = health_monitor.snapshot()
+    return jsonify(state), 200 if state['ready'] else 503
+
+CACHE_HIT_RATIO = metrics_registry.gauge(
+    'cache_hit_ratio', 'Hit ratio of the shared disk caches (all workers)', ('cache',))
+
+def collect_cache_stats():
+    caches = {
+        'classification': hybrid_classifier.classification_cache,
+        'outfits': hybrid_classifier.outfit_cache,
+        'keywords': keyword_extractor.keyword_cache,
+        'ebay_products': ebay_product_cache,
+    }
+    for name, cache in caches.items():
+        if cache is not None:
+            CACHE_HIT_RATIO.set(cache.stats().get('hit_ratio', 0), cache=name)
+
+metrics_registry.add_collector(collect_cache_stats)
+
+@app.route('/metrics')
+def metrics():
+    """
+    Prometheus metrics of this worker process: token usage, cost, latency,
+    request size and retries of each OpenAI call by stage, pipeline stage
+    durations, and the hit ratios of the shared caches.
+    """
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+def initialize_database():
+    """Create missing database tables and columns, then start loading the perceptual hash index."""
+    with app.app_context():
+        db.create_all()
+        add_missing_columns()
+        logging.info("Database tables created successfully")
+    
+    # Load perceptual hashes of earlier predictions for near-duplicate reuse
+    if PHASH_ENABLED:
+        phash_index.start_background_loader(app, Prediction)
+
+def check_sql_database():
+    with app.app_context():
+        try:
+            db.session.execute(text('SELECT 1'))
+        finally:
+            db.session.remove()
+    return True
+
+# Check the backing services in the background and keep their health cached
+# for /ready. Table creation runs on the probe thread instead of at import.
 if app.config["SQLALCHEMY_DATABASE_URI"]:
-    try:
-        with app.app_context():
-            db.create_all()
-            logging.info("Database tables created successfully")
-    except Exception as e:
-        logging.error(f"Error creating database tables: {str(e)}")
-        logging.warning("Application will continue, but database functionality may be limited")
+    health_monitor.on_start(initialize_database)
+    health_monitor.register('database', check_sql_database,
+                            required='database' in READINESS_REQUIRED_SERVICES)
 else:
     logging.warning("No DATABASE_URL provided. Database features will be unavailable.")
+health_monitor.register('mongodb', db_manager.ping, required='mongodb' in READINESS_REQUIRED_SERVICES)
+health_monitor.register('storage', storage_manager.ping, required='storage' in READINESS_REQUIRED_SERVICES)
+health_monitor.register('openai', lambda: llm_client.validate_key()['valid'],
+                        required='openai' in READINESS_REQUIRED_SERVICES)
+# eBay is not probed over the network, to save API quota
+health_monitor.register('ebay', lambda: bool(ebay_manager and ebay_manager.connection_available),
+                        required='ebay' in READINESS_REQUIRED_SERVICES)
+health_monitor.start()
@@ -0,0 +1,401 @@
+"""
+Batch Classification for Fashion Style Analyzer
+
+Command-line runner for backfilling and re-analyzing catalog images from
+local directories and Backblaze B2. Images are decoded, resized and encoded
+in a process pool, classified through the hybrid classifier's stage pipeline
+with bounded concurrency, and written to a JSONL file and/or the Prediction
+table. Progress is checkpointed in SQLite, so a killed run resumes where it
+stopped without reprocessing images.
+
+Usage:
+    python batch_classify.py --dir catalog/ --output results.jsonl
+    python batch_classify.py --b2-prefix uploads/2024/ --db --mode cascade
+"""
+
+import os
+import sys
+import json
+import time
+import inspect
+import sqlite3
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from dotenv import load_dotenv
+
+import llm_client
+import hybrid_classifier
+from pipeline import Pipeline
+from outbound import outbound_executor
+from image_artifact import API_MAX_SIZE, ImageArtifact
+from payload_policy import build_payload
+from local_classifier import extract_features
+from phash_index import dhash, hash_to_hex
+
+# Load environment variables
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Prefix of references to images in Backblaze B2
+B2_PREFIX = 'b2://'
+
+# Local file extensions treated as images
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp')
+
+# Payloads each analysis mode may send, built ahead of time in the worker processes
+# (outfit ideas are generated without the image in text-only mode)
+_OUTFIT_PAYLOAD = () if hybrid_classifier.OUTFIT_TEXT_ONLY else ("outfits",)
+PAYLOAD_STAGES = {
+    "multi": ("style", "attributes") + _OUTFIT_PAYLOAD,
+    "single": ("single_pass",),
+    "cascade": ("style", "attributes") + _OUTFIT_PAYLOAD,
+}
+
+# Classification stages whose values are computed in the worker processes
+PREPARED_STAGES = ("base64_image", "local_features")
+
+
+def iter_local_images(directory):
+    """Yield image file paths under a directory, in a stable order."""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def iter_b2_images(prefix):
+    """Yield references to images stored in Backblaze B2 under a prefix."""
+    from storage_manager import get_storage_manager
+    for storage_path in get_storage_manager().list_images(prefix):
+        yield B2_PREFIX + storage_path
+
+
+def load_image(ref):
+    """
+    Open the image behind a reference (a local path or b2://storage/path).
+
+    Returns:
+        ImageArtifact
+    """
+    if ref.startswith(B2_PREFIX):
+        from storage_manager import get_storage_manager
+        image = get_storage_manager().retrieve_image(ref[len(B2_PREFIX):])
+        if image is None:
+            raise ValueError(f"Could not retrieve {ref}")
+        image.load()
+        return ImageArtifact(image)
+    return ImageArtifact.from_file(ref)
+
+
+def prepare_image(ref, mode):
+    """
+    Decode an image and do all CPU-bound work ahead of classification. Runs in
+    a worker process; the artifact comes back with its encodings and payloads
+    but without pixels.
+
+    Args:
+        ref: Image reference
+        mode: Analysis mode
+
+    Returns:
+        Dictionary with the artifact, initial pipeline values and perceptual hash
+    """
+    artifact = load_image(ref)
+    resized = artifact.resized(API_MAX_SIZE)
+    prepared = {
+        "image": artifact,
+        "base64_image": artifact.base64(API_MAX_SIZE),
+        "local_features": extract_features(resized),
+        "image_phash": dhash(resized),
+    }
+    for stage in PAYLOAD_STAGES[mode]:
+        build_payload(artifact, stage)
+    return prepared
+
+
+def api_calls():
+    """Returns the chat completion calls sent to OpenAI by this process so far."""
+    return (llm_client.LLM_REQUESTS.total(status='ok') +
+            llm_client.LLM_REQUESTS.total(status='error'))
+
+
+class Checkpoint:
+    """SQLite record of processed images, so an interrupted run can resume."""
+
+    def __init__(self, path):
+        """
+        Open (and create if needed) a checkpoint file.
+
+        Args:
+            path: SQLite database path
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS processed ("
+            "ref TEXT PRIMARY KEY, status TEXT NOT NULL, prediction_id TEXT, error TEXT, finished_at REAL)"
+        )
+        # Failed images are retried on the next run
+        self.done = {row[0] for row in self.conn.execute("SELECT ref FROM processed WHERE status = 'ok'")}
+
+    def is_done(self, ref):
+        return ref in self.done
+
+    def mark(self, ref, status, prediction_id=None, error=None):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO processed (ref, status, prediction_id, error, finished_at) VALUES (?, ?, ?, ?, ?)",
+            (ref, status, prediction_id, error, time.time())
+        )
+        if status == 'ok':
+            self.done.add(ref)
+
+
+class BatchStats:
+    """Counters and throughput of a batch run."""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.start_calls = api_calls()
+        self.processed = 0
+        self.errors = 0
+        self.skipped = 0
+        self.reused = 0
+
+    def summary(self):
+        elapsed = time.monotonic() - self.start
+        calls = api_calls() - self.start_calls
+        return {
+            "processed": self.processed,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "reused": self.reused,
+            "seconds": round(elapsed, 1),
+            "images_per_second": round(self.processed / elapsed, 2) if elapsed else 0,
+            "api_calls": calls,
+            "api_calls_per_image": round(calls / self.processed, 3) if self.processed else 0
+        }
+
+
+def classify_prepared(prepared, mode, include_attributes=False, find_known=None):
+    """
+    Run the classification pipeline on a prepared image.
+
+    Args:
+        prepared: Result of prepare_image
+        mode: Analysis mode
+        include_attributes: In cascade mode, always extract attributes
+        find_known: Optional callable returning a known analysis for a perceptual hash
+
+    Returns:
+        PipelineResult
+    """
+    known_analysis = find_known(prepared["image_phash"]) if find_known else None
+    stages = [stage for stage in hybrid_classifier.classification_stages(mode, known_analysis, include_attributes)
+              if stage.name not in PREPARED_STAGES]
+    return Pipeline(stages).run(**{name: prepared[name] for name in ("image",) + PREPARED_STAGES})
+
+
+def max_concurrency(mode, include_attributes=False):
+    """
+    Returns the most images that can be classified at once without the
+    outbound executor rejecting stages, assuming every stage of each image
+    is in flight at the same time. Thread stages and coroutine stages (the
+    OpenAI calls) have separate capacities.
+    """
+    stages = [stage for stage in hybrid_classifier.classification_stages(mode, None, include_attributes)
+              if stage.name not in PREPARED_STAGES]
+    coroutines = sum(1 for stage in stages if inspect.iscoroutinefunction(stage.func))
+    limits = [(outbound_executor.max_workers + outbound_executor.max_queue) // max(1, len(stages) - coroutines)]
+    if coroutines:
+        limits.append(outbound_executor.max_async // coroutines)
+    return max(1, min(limits))
+
+
+def process_image(processes, ref, mode, include_attributes=False, find_known=None):
+    """Prepare an image in the process pool, then classify it on this thread."""
+    prepared = processes.submit(prepare_image, ref, mode).result()
+    return prepared, classify_prepared(prepared, mode, include_attributes, find_known)
+
+
+def run_batch(refs, mode, output=None, store=None, checkpoint=None, workers=None, concurrency=8,
+              include_attributes=False, find_known=None, stats=None, report_every=100):
+    """
+    Classify a stream of images.
+
+    At most `concurrency` images are classified at once (capped by
+    max_concurrency), and image references are consumed lazily, so
+    arbitrarily large listings use constant memory. Images whose analysis
+    fell back to a placeholder count as errors and are retried on resume.
+
+    Args:
+        refs: Iterable of image references
+        mode: Analysis mode
+        output: Optional open file receiving one JSON line per image
+        store: Optional callable (ref, prepared, result) -> prediction ID storing the result
+        checkpoint: Optional Checkpoint
+        workers: Number of preprocessing processes (defaults to the CPU count)
+        concurrency: Number of images classified at once
+        include_attributes: In cascade mode, always extract attributes
+        find_known: Optional callable returning a known analysis for a perceptual hash
+        stats: Optional BatchStats to update
+        report_every: Log progress every this many images
+
+    Returns:
+        BatchStats
+    """
+    stats = stats or BatchStats()
+    limit = max_concurrency(mode, include_attributes)
+    if concurrency > limit:
+        logger.warning(f"Concurrency {concurrency} exceeds the outbound executor's capacity; using {limit}")
+        concurrency = limit
+
+    def finish(future, ref):
+        try:
+            prepared, result = future.result()
+        except Exception as e:
+            logger.error(f"Failed to classify {ref}: {e}")
+            stats.errors += 1
+            if checkpoint:
+                checkpoint.mark(ref, 'error', error=str(e))
+            return
+
+        if not hybrid_classifier.is_complete_result(result):
+            # A stage fell back to a placeholder (rate limit, API error, full executor);
+            # leave the image unprocessed so the next run retries it
+            failed = [name for name, timing in result.timings.items() if timing['status'] != 'ok']
+            error = "Incomplete analysis" + (f" (stages: {', '.join(failed)})" if failed else "")
+            logger.warning(f"Failed to classify {ref}: {error}")
+            stats.errors += 1
+            if checkpoint:
+                checkpoint.mark(ref, 'error', error=error)
+            return
+
+        style_info = result["style_info"]
+        if result.get("cached_analysis"):
+            stats.reused += 1
+        prediction_id = store(ref, prepared, result) if store else None
+        if output:
+            output.write(json.dumps({
+                "ref": ref,
+                "prediction_id": prediction_id,
+                "image_phash": hash_to_hex(prepared["image_phash"]),
+                "style_info": style_info
+            }) + "\n")
+            output.flush()
+        if checkpoint:
+            checkpoint.mark(ref, 'ok', prediction_id=prediction_id)
+
+        stats.processed += 1
+        if stats.processed % report_every == 0:
+            summary = stats.summary()
+            logger.info(f"{summary['processed']} images, {summary['images_per_second']} images/sec, "
+                        f"{summary['api_calls_per_image']} API calls/image, {summary['errors']} errors")
+
+    with ProcessPoolExecutor(max_workers=workers) as processes, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch') as threads:
+        in_flight = {}
+
+        def drain(block_until):
+            while len(in_flight) > block_until:
+                finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    finish(future, in_flight.pop(future))
+
+        for ref in refs:
+            if checkpoint and checkpoint.is_done(ref):
+                stats.skipped += 1
+                continue
+            drain(concurrency - 1)
+            future = threads.submit(process_image, processes, ref, mode, include_attributes, find_known)
+            in_flight[future] = ref
+        drain(0)
+
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify catalog images in bulk.")
+    parser.add_argument('--dir', action='append', default=[], help="Local directory of images (repeatable)")
+    parser.add_argument('--b2-prefix', action='append', default=[],
+                        help="Backblaze B2 storage path prefix to classify (repeatable)")
+    parser.add_argument('--output', help="JSONL file to append results to")
+    parser.add_argument('--db', action='store_true', help="Store results in the Prediction table")
+    parser.add_argument('--checkpoint', default=os.path.join('.cache', 'batch_checkpoint.db'),
+                        help="Checkpoint database used to resume interrupted runs")
+    parser.add_argument('--mode', help="Analysis mode: multi, single or cascade (defaults to CLASSIFIER_MODE)")
+    parser.add_argument('--detailed-attributes', action='store_true',
+                        help="In cascade mode, extract attributes even when the local classifier answers")
+    parser.add_argument('--workers', type=int, default=None, help="Preprocessing processes (default: CPU count)")
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help="Images classified at once (capped by the outbound executor's capacity)")
+    parser.add_argument('--report-every', type=int, default=100, help="Log progress every N images")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    logging.getLogger('pipeline').setLevel(logging.WARNING)
+
+    if not args.dir and not args.b2_prefix:
+        parser.error("Provide at least one --dir or --b2-prefix")
+    if not args.output and not args.db:
+        parser.error("Provide --output and/or --db")
+
+    mode = hybrid_classifier.resolve_analysis_mode(args.mode)
+    store = find_known = None
+
+    if args.db:
+        # Importing the app connects the databases and loads the perceptual hash index
+        from app import app, find_near_duplicate_analysis, store_prediction_in_db
+        from storage_manager import get_storage_manager
+        from models import db
+        storage = get_storage_manager()
+        app.app_context().push()
+
+        def store(ref, prepared, result):
+            image_path = storage.public_url(ref[len(B2_PREFIX):]) if ref.startswith(B2_PREFIX) else ref
+            # Only complete results reach store
+            return store_prediction_in_db(
+                result["style_info"], image_path, prepared["image_phash"], reusable=True,
+                local_features=result.get("local_features")
+            )
+
+        def find_known(image_phash):
+            # Reuse analyses of near-duplicate images, as /predict does
+            with app.app_context():
+                try:
+                    return find_near_duplicate_analysis(image_phash)
+                finally:
+                    db.session.remove()
+
+    if not hybrid_classifier.openai_client and mode != 'cascade':
+        parser.error("OPENAI_API_KEY is not set")
+
+    def refs():
+        for directory in args.dir:
+            yield from iter_local_images(directory)
+        for prefix in args.b2_prefix:
+            yield from iter_b2_images(prefix)
+
+    checkpoint = Checkpoint(args.checkpoint)
+    stats = BatchStats()
+    output = open(args.output, 'a') if args.output else None
+    try:
+        run_batch(refs(), mode, output=output, store=store, checkpoint=checkpoint, workers=args.workers,
+                  concurrency=args.concurrency, include_attributes=args.detailed_attributes,
+                  find_known=find_known, stats=stats, report_every=args.report_every)
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; rerun the same command to resume")
+    finally:
+        if output:
+            output.close()
+        print(json.dumps(stats.summary()))
+    return 0 if not stats.errors else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
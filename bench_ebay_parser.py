@@ -0,0 +1,137 @@
+"""
+eBay Parser Benchmark for Fashion Style Analyzer
+
+Measures the cost of turning Finding API results into product dictionaries,
+per 100 items: parsing into Product records, serializing them with
+to_dict(), and encoding the result as JSON (as the cache and /predict do).
+For comparison it runs the per-item dictionary loop the parser replaced, and
+reports the memory held by 100 parsed products either way.
+
+The payload in fixtures/ is shaped like ebaysdk's response.dict() of a
+findItemsAdvanced call (all values are strings, as eBay returns them).
+
+Usage:
+    python bench_ebay_parser.py --rounds 50
+"""
+
+import os
+import gc
+import json
+import timeit
+import argparse
+import tracemalloc
+
+from ebay_products import parse_items
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'fixtures', 'ebay_find_items_advanced.json')
+
+
+def tracking_url(url, item_id):
+    return f"{url}?mkcid=item-{item_id}&campid=fashion-style"
+
+
+def legacy_parse(response_dict):
+    """The dictionary-building loop search_products used before ebay_products.py."""
+    products = []
+    for item in response_dict['searchResult']['item']:
+        item_id = item['itemId']
+        image_url = item.get('galleryURL', 'https://placehold.co/200x150/2a2a2a/ffffff?text=No+Image')
+        if 'pictureURLLarge' in item:
+            image_url = item['pictureURLLarge']
+        elif 'pictureURLSuperSize' in item:
+            image_url = item['pictureURLSuperSize']
+        price_value = float(item['sellingStatus']['currentPrice']['value'])
+        currency = item['sellingStatus']['currentPrice']['_currencyId']
+        shipping_cost = item.get('shippingInfo', {}).get('shippingServiceCost', {}).get('value', '0.00')
+        shipping_cost_float = float(shipping_cost) if shipping_cost != 'Unknown' else 0.0
+        has_store = 'storeInfo' in item and 'storeName' in item['storeInfo']
+        product = {
+            'id': item_id,
+            'title': item['title'],
+            'price': f"${price_value:.2f}" if currency == 'USD' else f"{price_value:.2f} {currency}",
+            'price_value': price_value,
+            'currency': currency,
+            'image': image_url,
+            'url': tracking_url(item['viewItemURL'], item_id),
+            'location': item.get('location', 'Unknown'),
+            'condition': item.get('condition', {}).get('conditionDisplayName', 'New'),
+            'seller': item.get('sellerInfo', {}).get('sellerUserName', 'Unknown'),
+            'seller_rating': item.get('sellerInfo', {}).get('positiveFeedbackPercent', 'N/A'),
+            'shipping_type': item.get('shippingInfo', {}).get('shippingType', 'Standard'),
+            'shipping_cost': shipping_cost,
+            'free_shipping': shipping_cost_float <= 0,
+            'has_store': has_store,
+            'store_name': item.get('storeInfo', {}).get('storeName', '') if has_store else ''
+        }
+        seller_rating = item.get('sellerInfo', {}).get('positiveFeedbackPercent', 0)
+        try:
+            product['rating'] = min(5, max(0, float(seller_rating) / 20)) if seller_rating else 4.0
+        except (ValueError, TypeError):
+            product['rating'] = 4.0
+        product['reviews'] = 0
+        products.append(product)
+    return products
+
+
+def load_payload(path, items):
+    """Load the fixture and repeat its items up to the requested count."""
+    with open(path) as f:
+        payload = json.load(f)
+    recorded = payload['searchResult']['item']
+    payload['searchResult']['item'] = [recorded[i % len(recorded)] for i in range(items)]
+    return payload
+
+
+def per_100(fn, payload, rounds, items, number=20):
+    """Microseconds per 100 items, from the fastest of rounds batches of number calls."""
+    best = min(timeit.repeat(lambda: fn(payload), number=number, repeat=rounds)) / number
+    return best / items * 100 * 1e6
+
+
+def retained_bytes(build, payload):
+    """Bytes still allocated by what build(payload) returns."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build(payload)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the eBay response parser.")
+    parser.add_argument('--rounds', type=int, default=30, help="Timed batches (the fastest one is reported)")
+    parser.add_argument('--items', type=int, default=100, help="Items per parsed response")
+    parser.add_argument('--fixture', default=FIXTURE_PATH, help="Recorded response.dict() payload")
+    args = parser.parse_args(argv)
+
+    payload = load_payload(args.fixture, args.items)
+    parsed = parse_items(payload, tracking_url)
+    dicts = [product.to_dict() for product in parsed]
+    assert dicts == legacy_parse(payload), "parser output differs from the legacy loop"
+
+    timings = {
+        'parse (Product records)': lambda p: parse_items(p, tracking_url),
+        'serialize (to_dict)': lambda p: [product.to_dict() for product in parsed],
+        'parse + serialize': lambda p: [product.to_dict() for product in parse_items(p, tracking_url)],
+        'parse + serialize + JSON': lambda p: json.dumps([product.to_dict() for product in parse_items(p, tracking_url)]),
+        'legacy dict loop': legacy_parse,
+        'legacy dict loop + JSON': lambda p: json.dumps(legacy_parse(p)),
+    }
+    print(f"{len(parsed)} items, fastest of {args.rounds} batches, per 100 items:")
+    for name, fn in timings.items():
+        print(f"  {name:<28} {per_100(fn, payload, args.rounds, args.items):8.1f} us")
+
+    records = retained_bytes(lambda p: parse_items(p, tracking_url), payload)
+    legacy = retained_bytes(legacy_parse, payload)
+    scale = 100 / args.items
+    print("Memory held per 100 parsed items:")
+    print(f"  {'Product records':<28} {records * scale / 1024:8.1f} KiB")
+    print(f"  {'legacy dictionaries':<28} {legacy * scale / 1024:8.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
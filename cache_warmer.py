@@ -0,0 +1,183 @@
+"""
+eBay Cache Warmer for Fashion Style Analyzer
+
+Keeps the eBay result cache warm for the styles predicted most often
+recently, so their product searches are answered from cache instead of
+calling eBay inside a user request. Every CACHE_WARM_INTERVAL seconds one
+process on the host (whoever takes the warm lease) looks at the top styles
+and refreshes their base search, plus their most used refined searches
+still in the cache, if the cached results expire within CACHE_WARM_AHEAD
+seconds.
+
+Searches run at background priority, so they only spend rate limit tokens
+above the reserve kept for interactive requests, and stop for the round as
+soon as the limiter turns one away.
+
+worker.py runs the warmer in a thread; it can also be run on its own:
+    python cache_warmer.py --once
+"""
+
+import os
+import time
+import random
+import argparse
+import datetime
+import logging
+
+from dotenv import load_dotenv
+
+from disk_cache import DiskCache
+from ebay_manager import get_ebay_manager, product_cache, build_search, style_cache_prefix, product_cache_key
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+CACHE_WARM_ENABLED = os.environ.get('CACHE_WARM_ENABLED', 'true').lower() == 'true'
+CACHE_WARM_INTERVAL = int(os.environ.get('CACHE_WARM_INTERVAL', '600'))
+CACHE_WARM_TOP_STYLES = int(os.environ.get('CACHE_WARM_TOP_STYLES', '10'))
+# Refined (user comment) searches warmed per style, besides its base search
+CACHE_WARM_REFINEMENTS = int(os.environ.get('CACHE_WARM_REFINEMENTS', '3'))
+# Refresh results that expire within this many seconds (or already have)
+CACHE_WARM_AHEAD = int(os.environ.get('CACHE_WARM_AHEAD', str(CACHE_WARM_INTERVAL * 2)))
+# Days of predictions counted when ranking styles
+CACHE_WARM_WINDOW_DAYS = int(os.environ.get('CACHE_WARM_WINDOW_DAYS', '7'))
+# Most eBay searches made per round
+CACHE_WARM_MAX_SEARCHES = int(os.environ.get('CACHE_WARM_MAX_SEARCHES', '30'))
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Held by the process warming the cache this round
+warm_leases = DiskCache("cache_warmer", max_entries=10, ttl=max(1, CACHE_WARM_INTERVAL - 5))
+
+
+def searches_to_warm(style, refinements=CACHE_WARM_REFINEMENTS, ahead=CACHE_WARM_AHEAD, now=None):
+    """
+    List the searches of a style whose cached results are missing or expire soon.
+
+    Args:
+        style: Fashion style
+        refinements: Most recently used refined searches to consider
+        ahead: Seconds before expiry at which results are refreshed
+        now: Current time (defaults to time.time())
+
+    Returns:
+        List of (search, cached products or None) tuples, base search first
+    """
+    now = time.time() if now is None else now
+    base = build_search(style)
+    base_key = product_cache_key(*base)
+    candidates = {base_key: (base, None, 0)}
+
+    for key, entry, _ in product_cache.recent(style_cache_prefix(style), limit=refinements + 1):
+        if key == base_key:
+            candidates[key] = (base, entry['products'], entry['fresh_until'])
+        elif 'search' in entry and len(candidates) <= refinements:
+            candidates[key] = (tuple(entry['search']), entry['products'], entry['fresh_until'])
+
+    return [(search, products) for search, products, fresh_until in candidates.values()
+            if fresh_until - now <= ahead]
+
+
+def warm_styles(styles, ebay=None, max_searches=CACHE_WARM_MAX_SEARCHES):
+    """
+    Refresh the soon-to-expire searches of the given styles.
+
+    Args:
+        styles: Style names, most popular first
+        ebay: EbayManager (defaults to the process-wide one)
+        max_searches: Most eBay searches to make
+
+    Returns:
+        Dictionary counting warmed, empty and throttled searches
+    """
+    ebay = ebay or get_ebay_manager()
+    summary = {'styles': len(styles), 'warmed': 0, 'empty': 0, 'throttled': 0}
+    if product_cache is None or not ebay.connection_available:
+        return summary
+
+    searches = 0
+    for style in styles:
+        for search, stale in searches_to_warm(style):
+            if searches >= max_searches:
+                return summary
+            searches += 1
+            products = ebay.refresh(search, stale=stale)
+            if products is None:
+                # Out of background budget: leave the rest for the next round
+                summary['throttled'] += 1
+                return summary
+            summary['warmed' if products else 'empty'] += 1
+    return summary
+
+
+def warm_once(app, force=False):
+    """
+    Warm the cache for the top styles unless another process did this round.
+
+    Args:
+        app: Flask app (for the predictions database)
+        force: Warm even if another process holds the lease
+
+    Returns:
+        Summary dictionary, or None if skipped
+    """
+    if product_cache is None or (not force and not warm_leases.add('ebay', os.getpid())):
+        return None
+
+    from app import popular_styles
+
+    since = datetime.datetime.now() - datetime.timedelta(days=CACHE_WARM_WINDOW_DAYS)
+    with app.app_context():
+        styles = [row['style'] for row in popular_styles(CACHE_WARM_TOP_STYLES, since=since)]
+
+    start = time.monotonic()
+    summary = warm_styles(styles)
+    product_cache.count('warmed', summary['warmed'] + summary['empty'])
+    logger.info(f"Warmed eBay cache in {time.monotonic() - start:.1f}s: {summary}")
+    return summary
+
+
+def run(app, stop):
+    """
+    Warm the cache every CACHE_WARM_INTERVAL seconds until stop is set.
+
+    Args:
+        app: Flask app
+        stop: threading.Event ending the loop
+    """
+    # Stagger processes started together; the lease lets one of them warm each round
+    delay = CACHE_WARM_INTERVAL * random.uniform(0.1, 0.3)
+    while not stop.wait(delay):
+        try:
+            warm_once(app)
+        except Exception as e:
+            logger.error(f"Error warming the eBay cache: {e}")
+        delay = CACHE_WARM_INTERVAL * random.uniform(0.9, 1.1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm the eBay result cache for popular styles.")
+    parser.add_argument('--once', action='store_true', help="Warm once and exit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    from app import app
+
+    if args.once:
+        print(warm_once(app, force=True))
+        return
+
+    import signal
+    import threading
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    run(app, stop)
+
+
+if __name__ == '__main__':
+    main()
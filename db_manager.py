@@ -6,8 +6,10 @@ image metadata, and style analysis results.
 """
 
 import os
+import time
 import datetime
 import logging
+import threading
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure, OperationFailure
 from dotenv import load_dotenv
@@ -18,24 +20,54 @@ load_dotenv()
 # MongoDB connection string
 MONGODB_URI = os.environ.get('MONGODB_URI')
 MONGODB_DB = os.environ.get('MONGODB_DB', 'style')
+MONGODB_TIMEOUT_MS = int(os.environ.get('MONGODB_TIMEOUT_MS', '5000'))
+# Longest wait for a reply to a single operation
+MONGODB_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGODB_SOCKET_TIMEOUT_MS', '10000'))
+
+# Minimum seconds between connection attempts after a failure
+CONNECT_RETRY_INTERVAL = float(os.environ.get('CONNECT_RETRY_INTERVAL', '30'))
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class DatabaseManager:
-    """Manages MongoDB database operations for the Fashion Style Analyzer app."""
+    """
+    Manages MongoDB database operations for the Fashion Style Analyzer app.
+    
+    The connection is opened on first use rather than at construction, so
+    creating the manager never blocks; a failed connection is retried at most
+    every CONNECT_RETRY_INTERVAL seconds.
+    """
     
     def __init__(self):
+        """Create the manager without connecting."""
+        self._client = None
+        self._lock = threading.Lock()
+        self._last_attempt = None
+    
+    @property
+    def client(self):
+        """The MongoDB client, connecting on first use (None if unavailable)."""
+        if self._client is None and (self._last_attempt is None or
+                                     time.monotonic() - self._last_attempt >= CONNECT_RETRY_INTERVAL):
+            with self._lock:
+                if self._client is None:
+                    self._last_attempt = time.monotonic()
+                    self._connect()
+        return self._client
+    
+    def _connect(self):
         """Initialize the database connection."""
         try:
-            self.client = MongoClient(MONGODB_URI)
+            client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=MONGODB_TIMEOUT_MS,
+                                 connectTimeoutMS=MONGODB_TIMEOUT_MS, socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS)
             # Ping the database to verify connection
-            self.client.admin.command('ping')
+            client.admin.command('ping')
             logger.info("Successfully connected to MongoDB")
             
             # Set up database and collections
-            self.db = self.client[MONGODB_DB]
+            self.db = client[MONGODB_DB]
             self.feedback_collection = self.db['user_feedback']
             self.images_collection = self.db['image_metadata']
             self.style_predictions_collection = self.db['style_predictions']
@@ -45,12 +77,27 @@ class DatabaseManager:
             self.images_collection.create_index("image_id")
             self.style_predictions_collection.create_index("prediction_id")
             
+            self._client = client
+            
         except ConnectionFailure as e:
             logger.error(f"Failed to connect to MongoDB: {e}")
-            self.client = None
         except OperationFailure as e:
             logger.error(f"MongoDB authentication failed: {e}")
-            self.client = None
+        except Exception as e:
+            logger.error(f"Error connecting to MongoDB: {e}")
+    
+    def ping(self):
+        """
+        Check that MongoDB answers (used by the health probe).
+        
+        Returns:
+            Boolean indicating if the database is reachable
+        """
+        client = self.client
+        if not client:
+            return False
+        client.admin.command('ping')
+        return True
     
     def store_feedback(self, feedback_data):
         """
@@ -228,6 +275,21 @@ class DatabaseManager:
     
     def close(self):
         """Close the database connection."""
-        if self.client:
-            self.client.close()
-            logger.info("MongoDB connection closed")
\ No newline at end of file
+        if self._client:
+            self._client.close()
+            self._client = None
+            logger.info("MongoDB connection closed")
+
+
+# Process-wide manager shared by the app
+_instance = None
+_instance_lock = threading.Lock()
+
+def get_database_manager():
+    """Returns the process-wide DatabaseManager, creating it (without connecting) on first use."""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = DatabaseManager()
+    return _instance
@@ -0,0 +1,275 @@
+"""
+Disk Cache for Fashion Style Analyzer
+
+This module provides a small SQLite-backed key/value cache shared by every
+gunicorn worker on a host. The database runs in WAL mode so readers do not
+block writers. Each named cache has its own size bound (least recently used
+entries are evicted), a TTL, and hit/miss counters stored alongside the
+entries so they reflect all workers.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+# Directory holding the cache databases
+CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+CACHE_DB_PATH = os.environ.get('CACHE_DB_PATH', os.path.join(CACHE_DIR, 'cache.db'))
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_lru ON cache_entries (namespace, accessed_at);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    namespace TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (namespace, name)
+);
+"""
+
+class DiskCache:
+    """A named, size-bounded, TTL'd JSON cache stored in a shared SQLite database."""
+
+    # Only refresh an entry's LRU timestamp this often to keep reads cheap
+    _touch_interval = 60
+
+    def __init__(self, namespace, max_entries=10000, ttl=86400, path=None):
+        """
+        Open (and create if needed) a named cache.
+
+        Args:
+            namespace: Name separating this cache's entries from other caches in the same file
+            max_entries: Maximum number of entries kept before LRU eviction
+            ttl: Seconds an entry stays valid
+            path: SQLite database path (defaults to CACHE_DB_PATH)
+        """
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path or CACHE_DB_PATH
+        self._local = threading.local()
+        self.available = True
+
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._connection().executescript(_SCHEMA)
+        except Exception as e:
+            logger.error(f"Disk cache {namespace} unavailable: {e}")
+            self.available = False
+
+    def _connection(self):
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, conn, name, amount=1):
+        conn.execute(
+            "INSERT INTO cache_stats (namespace, name, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (namespace, name) DO UPDATE SET value = value + excluded.value",
+            (self.namespace, name, amount)
+        )
+
+    def get(self, key):
+        """
+        Look up a cached value.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached value, or None on a miss or expired entry
+        """
+        if not self.available:
+            return None
+
+        try:
+            conn = self._connection()
+            now = time.time()
+            row = conn.execute(
+                "SELECT value, created_at, accessed_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+                self._count(conn, 'misses')
+                return None
+
+            if now - row[2] > self._touch_interval:
+                conn.execute(
+                    "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, key)
+                )
+            self._count(conn, 'hits')
+            return json.loads(row[0])
+        except Exception as e:
+            logger.error(f"Error reading disk cache {self.namespace}: {e}")
+            return None
+
+    def set(self, key, value):
+        """
+        Store a JSON-serializable value and evict least recently used entries over the size bound.
+
+        Args:
+            key: Cache key
+            value: JSON-serializable value
+
+        Returns:
+            Boolean indicating if the value was stored
+        """
+        if not self.available:
+            return False
+
+        try:
+            conn = self._connection()
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), now, now)
+            )
+            evicted = conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                "SELECT key FROM cache_entries WHERE namespace = ? ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.max_entries)
+            ).rowcount
+            if evicted:
+                self._count(conn, 'evictions', evicted)
+            return True
+        except Exception as e:
+            logger.error(f"Error writing disk cache {self.namespace}: {e}")
+            return False
+
+    def add(self, key, value):
+        """
+        Store a value only if the key has no live entry, e.g. to take a lease
+        that one worker holds until it expires.
+
+        Args:
+            key: Cache key
+            value: JSON-serializable value
+
+        Returns:
+            Boolean indicating if the value was stored
+        """
+        if not self.available:
+            return False
+
+        try:
+            conn = self._connection()
+            now = time.time()
+            # Replace an expired entry, keep a live one
+            cursor = conn.execute(
+                "INSERT INTO cache_entries (namespace, key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, "
+                "created_at = excluded.created_at, accessed_at = excluded.accessed_at "
+                "WHERE cache_entries.created_at < ?",
+                (self.namespace, key, json.dumps(value), now, now, now - self.ttl)
+            )
+            return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Error adding to disk cache {self.namespace}: {e}")
+            return False
+
+    def recent(self, prefix='', limit=100):
+        """
+        List live entries whose key starts with prefix, most recently used first.
+        Does not count as hits or refresh the entries' LRU position.
+
+        Args:
+            prefix: Key prefix to match
+            limit: Maximum number of entries
+
+        Returns:
+            List of (key, value, created_at) tuples
+        """
+        if not self.available:
+            return []
+        try:
+            rows = self._connection().execute(
+                "SELECT key, value, created_at FROM cache_entries "
+                "WHERE namespace = ? AND substr(key, 1, ?) = ? AND created_at >= ? "
+                "ORDER BY accessed_at DESC LIMIT ?",
+                (self.namespace, len(prefix), prefix, time.time() - self.ttl, limit)
+            ).fetchall()
+            return [(key, json.loads(value), created_at) for key, value, created_at in rows]
+        except Exception as e:
+            logger.error(f"Error listing disk cache {self.namespace}: {e}")
+            return []
+
+    def count(self, name, amount=1):
+        """Add to a named counter reported by stats() (e.g. stale hits)."""
+        if not self.available:
+            return
+        try:
+            self._count(self._connection(), name, amount)
+        except Exception as e:
+            logger.error(f"Error updating disk cache counter {self.namespace}.{name}: {e}")
+
+    def delete(self, key):
+        """Remove an entry from the cache."""
+        if not self.available:
+            return
+        try:
+            self._connection().execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+            )
+        except Exception as e:
+            logger.error(f"Error deleting from disk cache {self.namespace}: {e}")
+
+    def stats(self):
+        """
+        Get cache statistics shared by all workers.
+
+        Returns:
+            Dictionary with entries, hits, misses, evictions, hit_ratio and
+            any counters added with count()
+        """
+        if not self.available:
+            return {"available": False}
+
+        try:
+            conn = self._connection()
+            counters = dict(conn.execute(
+                "SELECT name, value FROM cache_stats WHERE namespace = ?", (self.namespace,)
+            ).fetchall())
+            entries = conn.execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+            hits, misses = counters.pop('hits', 0), counters.pop('misses', 0)
+            evictions = counters.pop('evictions', 0)
+            return {
+                "available": True,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": hits,
+                "misses": misses,
+                "evictions": evictions,
+                "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0,
+                **counters
+            }
+        except Exception as e:
+            logger.error(f"Error reading disk cache stats {self.namespace}: {e}")
+            return {"available": False, "error": str(e)}
@@ -6,13 +6,26 @@ based on predicted fashion styles.
 """
 
 import os
+import copy
+import time
+import queue
 import logging
 import json
-import datetime
+import threading
+from contextlib import contextmanager
 from ebaysdk.finding import Connection as Finding
 from ebaysdk.exception import ConnectionError
+from ebaysdk.response import Response
 from dotenv import load_dotenv
 
+import outbound
+from rate_limiter import get_rate_limiter, INTERACTIVE, BACKGROUND
+from disk_cache import DiskCache
+from single_flight import SingleFlight
+from ebay_products import parse_items
+from product_catalog import get_product_catalog, refinement_tags, normalize_style
+from keyword_extractor import extract_keywords, keywords_query
+
 # Load environment variables
 load_dotenv()
 
@@ -21,40 +34,163 @@ EBAY_APP_ID = os.environ.get('EBAY_APP_ID')
 EBAY_CERT_ID = os.environ.get('EBAY_CERT_ID') 
 EBAY_DEV_ID = os.environ.get('EBAY_DEV_ID')
 
+# Finding API request timeout (seconds) and idle keep-alive connections kept per process
+EBAY_TIMEOUT = float(os.environ.get('EBAY_TIMEOUT', '10'))
+EBAY_POOL_SIZE = int(os.environ.get('EBAY_POOL_SIZE', '8'))
+
+# Price cap (USD) of searches without a price hint in the user's comments
+DEFAULT_MAX_PRICE = 200.0
+
+# Search result cache shared by all workers: results are fresh for EBAY_CACHE_TTL,
+# then served stale (while one worker refreshes them) for up to EBAY_CACHE_STALE_TTL
+# more; empty or failed searches are cached for EBAY_NEGATIVE_TTL
+EBAY_CACHE_ENABLED = os.environ.get('EBAY_CACHE_ENABLED', 'true').lower() == 'true'
+EBAY_CACHE_TTL = int(os.environ.get('EBAY_CACHE_TTL', '1800'))
+EBAY_CACHE_STALE_TTL = int(os.environ.get('EBAY_CACHE_STALE_TTL', '86400'))
+EBAY_NEGATIVE_TTL = int(os.environ.get('EBAY_NEGATIVE_TTL', '300'))
+# Seconds a worker holds the right to refresh a stale entry
+EBAY_REFRESH_LEASE = int(os.environ.get('EBAY_REFRESH_LEASE', '60'))
+
+# Over-fetch mode: the first search for a style that the catalog cannot answer also
+# fetches EBAY_OVERFETCH_PAGES pages of its base query at once (at most once per
+# EBAY_CACHE_TTL across workers), so later refined searches are answered locally
+EBAY_OVERFETCH_ENABLED = os.environ.get('EBAY_OVERFETCH_ENABLED', 'false').lower() == 'true'
+EBAY_OVERFETCH_PAGES = int(os.environ.get('EBAY_OVERFETCH_PAGES', '4'))
+EBAY_OVERFETCH_PER_PAGE = int(os.environ.get('EBAY_OVERFETCH_PER_PAGE', '50'))
+# Price cap of the candidate pool, wide enough for "premium" and "luxury" refinements
+EBAY_OVERFETCH_MAX_PRICE = float(os.environ.get('EBAY_OVERFETCH_MAX_PRICE', '1000'))
+
+# Error text of eBay's "call limit exceeded" responses (error 10001)
+QUOTA_ERROR_MARKERS = ('10001', 'exceeded the number of times', 'call limit', 'rate limit')
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+product_cache = DiskCache(
+    "ebay_products",
+    max_entries=int(os.environ.get('EBAY_CACHE_MAX_ENTRIES', '5000')),
+    ttl=EBAY_CACHE_TTL + EBAY_CACHE_STALE_TTL
+) if EBAY_CACHE_ENABLED else None
+
+refresh_leases = DiskCache("ebay_refresh", max_entries=1000, ttl=EBAY_REFRESH_LEASE) if EBAY_CACHE_ENABLED else None
+
+# Marks a search some worker is running, so other workers wait for its result instead
+# of repeating it; expires on its own if that worker dies mid-search
+inflight_leases = DiskCache("ebay_inflight", max_entries=1000, ttl=int(EBAY_TIMEOUT * 2)) if EBAY_CACHE_ENABLED else None
+
+# Styles whose candidate pool some worker fetched (or is fetching) within EBAY_CACHE_TTL
+pool_marks = DiskCache("ebay_pools", max_entries=1000, ttl=EBAY_CACHE_TTL) \
+    if EBAY_CACHE_ENABLED and EBAY_OVERFETCH_ENABLED else None
+
+# Seconds between checks on another worker's in-flight search
+INFLIGHT_POLL_INTERVAL = 0.1
+
+
+class KeepAliveFinding(Finding):
+    """
+    Finding API connection whose HTTP session stays open between calls.
+
+    ebaysdk closes the session after every response, which empties its
+    connection pool, so each call would open a new TCP and TLS connection.
+    """
+
+    def process_response(self, parse_response=True):
+        """Post-process the response as ebaysdk does, without closing the session."""
+        self.response = Response(self.response,
+                                 verb=self.verb,
+                                 list_nodes=self._list_nodes,
+                                 datetime_nodes=self.datetime_nodes,
+                                 parse_response=parse_response)
+        # set for backward compatibility
+        self._response_content = self.response.content
+
+        if self.response.status_code != 200:
+            self._response_error = self.response.reason
+
+
+def build_search(style, limit=6, keywords=None):
+    """
+    Build the parameters of a product search.
+
+    Args:
+        style: Primary fashion style to search for
+        limit: Maximum number of products to return
+        keywords: Optional keywords extracted from user comments (see keyword_extractor)
+
+    Returns:
+        Tuple of (style, limit, search_query, min_price, max_price)
+    """
+    refinement = keywords_query(keywords) if keywords else ''
+    min_price = keywords.get('min_price') if keywords else None
+    max_price = keywords.get('max_price') if keywords else None
+
+    # Create the search query with better keyword optimization for fashion
+    search_query = f"{style} clothing fashion"
+
+    # Enhance search with keywords from user comments if available
+    if refinement:
+        logger.info(f"Enhancing search with keywords from user comments: {refinement}")
+        search_query += f" {refinement}"
+
+    return (style, limit, search_query, min_price, max_price)
+
+
+def style_cache_prefix(style):
+    """Returns the prefix shared by the product cache keys of every search for a style."""
+    return ' '.join(str(style).lower().split()) + '|'
+
+
+def product_cache_key(style, limit, search_query, min_price, max_price):
+    """Returns the product cache key of a search, covering its whole normalized query."""
+    def price(value):
+        return '' if value is None else f"{float(value):.2f}"
+    query = " ".join(search_query.lower().split())
+    return f"{style_cache_prefix(style)}{limit}|{query}|{price(min_price)}|{price(max_price)}"
+
+
 class EbayManager:
-    """Manages eBay API operations for the Fashion Style Analyzer app."""
+    """
+    Manages eBay API operations for the Fashion Style Analyzer app.
+
+    One instance serves the whole process (see get_ebay_manager). Finding API
+    connections are not thread-safe, so each call checks one out of a small
+    pool; their HTTP sessions (kept open by KeepAliveFinding) reuse connections
+    to eBay across requests.
+    """
+
+    def __init__(self, pool_size=EBAY_POOL_SIZE, timeout=EBAY_TIMEOUT):
+        """
+        Initialize the eBay API client (no network call).
 
-    def __init__(self):
-        """Initialize the eBay API connection."""
+        Args:
+            pool_size: Idle Finding connections kept for reuse
+            timeout: Request timeout in seconds
+        """
         # eBay Partner Network (EPN) tracking information
         self.ebay_affiliate_id = os.environ.get('EBAY_AFFILIATE_ID', '12345678')
         self.ebay_affiliate_campaign_id = os.environ.get('EBAY_CAMPAIGN_ID', 'fashion-style')
         self.ebay_affiliate_custom_id = os.environ.get('EBAY_CUSTOM_ID', 'styledeeplearn')
 
-        # Rate limiting tracking
-        self.request_count = 0
-        self.last_request_time = datetime.datetime.now()
-        self.max_requests_per_hour = 5000  # eBay standard API limit
-        self.cooldown_active = False
-        self.cooldown_until = None
+        # Rate limiting is shared with every other process on the host
+        self.rate_limiter = get_rate_limiter()
+
+        # Concurrent identical searches in this process share one API call
+        self._flight = SingleFlight()
+
+        # Idle Finding connections, most recently used first so warm ones are reused
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._connections = queue.LifoQueue()
+        self.connections_created = 0
 
         # Debug eBay API credentials from environment 
         self._debug_ebay_credentials()
 
         try:
             # Initialize eBay Finding API client with production credentials
-            self.api = Finding(
-                domain='svcs.ebay.com',  # Always use production domain
-                appid=EBAY_APP_ID,
-                certid=EBAY_CERT_ID,
-                devid=EBAY_DEV_ID,
-                config_file=None,
-                siteid='EBAY-US'
-            )
+            self.api = self._new_connection()
+            self._connections.put(self.api)
             logger.info("Initialized eBay API client in production mode")
 
             # Skip test call to save API quota
@@ -70,6 +206,48 @@ class EbayManager:
             self.api = None
             self.connection_available = False
 
+    def _new_connection(self):
+        """Create a Finding API connection (its HTTP session opens sockets on first use)."""
+        connection = KeepAliveFinding(
+            domain='svcs.ebay.com',  # Always use production domain
+            appid=EBAY_APP_ID,
+            certid=EBAY_CERT_ID,
+            devid=EBAY_DEV_ID,
+            config_file=None,
+            siteid='EBAY-US',
+            timeout=self.timeout
+        )
+        self.connections_created += 1
+        return connection
+
+    @contextmanager
+    def _connection(self):
+        """
+        Check out a Finding connection for one call, returning it to the pool afterwards.
+        Inside an outbound task the request timeout is cut to the time left before its deadline.
+        """
+        try:
+            connection = self._connections.get_nowait()
+        except queue.Empty:
+            connection = self._new_connection()
+        connection.timeout = max(1.0, min(self.timeout, outbound.remaining(self.timeout)))
+        try:
+            yield connection
+        finally:
+            if self._connections.qsize() < self.pool_size:
+                self._connections.put(connection)
+            else:
+                connection.session.close()
+
+    def stats(self):
+        """Returns the remaining shared rate limit budget and connection pool usage."""
+        return {
+            'available': self.connection_available,
+            'rate_limit': self.rate_limiter.remaining('ebay'),
+            'idle_connections': self._connections.qsize(),
+            'connections_created': self.connections_created
+        }
+
     def _debug_ebay_credentials(self):
         """Debug eBay API credentials to identify configuration issues."""
         # Log credentials from environment variables (partial for security)
@@ -96,225 +274,353 @@ class EbayManager:
         logger.info(f"eBay credentials from environment: App ID: {masked_app_id}, Cert ID: {masked_cert_id}, Dev ID: {masked_dev_id}")
         logger.info(f"Using hard-coded production eBay credentials for reliability")
 
-    def _check_rate_limit(self):
+    def _check_rate_limit(self, priority=INTERACTIVE):
         """
-        Check if we're within API rate limits
+        Check if we're within API rate limits, taking a token from the budget
+        shared by all workers
+
+        Args:
+            priority: INTERACTIVE for user requests, BACKGROUND for refreshes and prefetches
 
         Returns:
             Boolean indicating if we can make another request
         """
-        now = datetime.datetime.now()
-
-        # If in cooldown period, check if it's finished
-        if self.cooldown_active and self.cooldown_until is not None:
-            if now < self.cooldown_until:
-                logger.warning(f"API in cooldown until {self.cooldown_until}")
-                return False
-            else:
-                # Cooldown period over, reset counters with longer cooldown
-                logger.info("API cooldown period ended, resetting counters with extended cooldown")
-                self.cooldown_active = False
-                self.request_count = 0 
-                self.last_request_time = now
-                self.max_requests_per_hour = max(100, self.max_requests_per_hour // 2)  # Reduce limit
-                logger.info(f"Adjusted rate limit to {self.max_requests_per_hour} requests per hour")
-
-        # Check if an hour has passed since the first request
-        hour_ago = now - datetime.timedelta(hours=1)
-        if self.last_request_time < hour_ago:
-            # Reset the counter if an hour has passed
-            self.request_count = 0
-            self.last_request_time = now
-
-        # Check if we've hit the limit
-        if self.request_count >= self.max_requests_per_hour:
-            logger.warning("API rate limit reached, entering cooldown")
-            # Implement exponential backoff with longer initial duration
-            if not hasattr(self, 'cooldown_duration'):
-                self.cooldown_duration = 15  # Start with 15 minutes
-            else:
-                self.cooldown_duration = min(120, self.cooldown_duration * 2)  # Double duration, max 2 hours
-
-            self.cooldown_active = True
-            self.cooldown_until = now + datetime.timedelta(minutes=self.cooldown_duration)
-            self.max_requests_per_hour = max(50, self.max_requests_per_hour // 2)  # Reduce hourly limit more aggressively
-            logger.warning(f"Rate limit reached. Entering {self.cooldown_duration}-minute cooldown. New hourly limit: {self.max_requests_per_hour}")
-            return False
+        return self.rate_limiter.acquire('ebay', priority=priority)
 
-        # Increment the counter and allow the request
-        self.request_count += 1
-        return True
+    def _report_quota_error(self, error):
+        """Slow the shared eBay budget down if an error says the call quota is exhausted."""
+        message = str(error).lower()
+        if any(marker in message for marker in QUOTA_ERROR_MARKERS):
+            self.rate_limiter.penalize('ebay')
 
-    # Simple in-memory cache for product searches
-    _cache = {}
-    _cache_ttl = 1800  # 30 minutes cache TTL
-
-    def search_products(self, style, user_comments='', limit=6):
+    def search_products(self, style, user_comments='', limit=6, keywords=None, style_info=None):
         """
-        Search for fashion products on eBay with caching.
+        Search for fashion products, locally if possible, on eBay otherwise.
+
+        The local product catalog answers first when it has enough recent
+        products matching the search (see product_catalog). Otherwise eBay
+        results are cached across workers by the full normalized query. A
+        stale entry is returned at once while one background search refreshes
+        it, and empty or failed searches are cached briefly so they are not
+        retried on every request.
 
         Args:
             style: Primary fashion style to search for  
             user_comments: Optional user comments for refining search
             limit: Maximum number of products to return
+            keywords: Optional keywords extracted from the comments (see
+                keyword_extractor); extracted here if not given
+            style_info: Optional prediction whose style tags and attributes
+                rank products served from the catalog
 
         Returns:
             List of product dictionaries with details
         """
+        if keywords is None and user_comments:
+            keywords = extract_keywords(user_comments)
+        search = build_search(style, limit, keywords)
+
+        products = self._search_catalog(search, keywords, style_info)
+        if products is not None:
+            return products
+
         if not self.connection_available or self.api is None:
             logger.error("eBay API connection not available")
             return []
 
-        # Generate cache key
-        cache_key = f"{style}:{limit}"
-        
-        # Check cache
-        now = datetime.datetime.now()
-        if cache_key in self._cache:
-            cached_time, cached_data = self._cache[cache_key]
-            if (now - cached_time).total_seconds() < self._cache_ttl:
-                logger.info(f"Returning cached results for {style}")
-                return cached_data
-
-        # Create the search query with better keyword optimization for fashion
-        search_query = f"{style} clothing fashion"
-
-        # Enhance search with keywords from user comments if available
-        if user_comments:
-            logger.info(f"Enhancing search with user comments: {user_comments}")
-            # Extract key terms from user comments
-            search_query += f" {user_comments}"
+        # Fetch the style's candidate pool into the catalog and try it again
+        if pool_marks is not None and self.fill_pool(style):
+            products = self._search_catalog(search, keywords, style_info)
+            if products is not None:
+                return products
+
+        cache_key = product_cache_key(*search)
+        entry = product_cache.get(cache_key) if product_cache is not None else None
+        if entry is not None:
+            if not entry['products']:
+                product_cache.count('negative_hits')
+            if time.time() >= entry['fresh_until']:
+                product_cache.count('stale_hits')
+                self._refresh_in_background(cache_key, search, entry['products'])
+            logger.info(f"Returning cached results for {style}")
+            return entry['products']
+
+        # Identical searches already running here or in another worker are waited for, not repeated
+        products, shared = self._flight.do(cache_key, self._search_once, cache_key, search,
+                                           timeout=outbound.remaining(EBAY_TIMEOUT * 2))
+        if shared:
+            if product_cache is not None:
+                product_cache.count('coalesced')
+            products = copy.deepcopy(products)
+        return products or []
+
+    def _search_catalog(self, search, keywords, style_info):
+        """
+        Answer a search from the local product catalog, refreshing the style's
+        products in the background if the newest are older than EBAY_CACHE_TTL.
 
-        logger.info(f"Searching eBay for: {search_query}")
+        Returns:
+            List of products, or None if the catalog has too few matches
+        """
+        catalog = get_product_catalog()
+        if catalog is None:
+            return None
+        style, limit, _, min_price, max_price = search
+        # Same price cap as the live search
+        if max_price is None and min_price is None:
+            max_price = DEFAULT_MAX_PRICE
+        products, newest = catalog.search(style, keywords, style_info, limit, min_price, max_price)
+        if products is None:
+            return None
+
+        if time.time() - newest >= EBAY_CACHE_TTL and self.connection_available and product_cache is not None:
+            base = build_search(style, limit)
+            self._refresh_in_background(product_cache_key(*base), base, None)
+        logger.info(f"Returning {len(products)} catalog products for {style}")
+        return products
+
+    def fill_pool(self, style, priority=INTERACTIVE):
+        """
+        Over-fetch a style's candidate pool into the catalog unless a worker
+        already did within EBAY_CACHE_TTL. Concurrent calls for the same style
+        in this process wait for the first one.
+
+        Args:
+            style: Fashion style
+            priority: Rate limiter priority of the first page (the others are background)
 
+        Returns:
+            True if this call (or one it waited for) fetched products
+        """
+        if pool_marks is None or get_product_catalog() is None:
+            return False
+        key = normalize_style(style)
         try:
-            # Check rate limiting before making request
-            if not self._check_rate_limit():
-                logger.warning("Rate limit reached, skipping eBay API call")
-                return []
+            filled, _ = self._flight.do(f"pool|{key}", self._fill_pool_once, style, key, priority,
+                                        timeout=outbound.remaining(EBAY_TIMEOUT * 2))
+        except Exception as e:
+            # The pool mark stays, so the pool is not fetched again before EBAY_CACHE_TTL
+            logger.error(f"Error fetching the candidate pool for {style}: {e}")
+            self._report_quota_error(e)
+            return False
+        return filled
 
-            # Make the API call to eBay Finding API with improved parameters
-            response = self.api.execute('findItemsAdvanced', {
+    def _fill_pool_once(self, style, key, priority):
+        """Fetch the candidate pool if no worker holds the style's pool mark."""
+        if not pool_marks.add(key, {'pid': os.getpid(), 'started_at': time.time()}):
+            return False
+        products = self._fetch_pool(style, priority)
+        if products is None:
+            # Rate limited: let a later request try again
+            pool_marks.delete(key)
+            return False
+        pool_marks.set(key, {'products': len(products), 'fetched_at': time.time()})
+        if product_cache is not None:
+            product_cache.count('pools')
+        get_product_catalog().add_products(style, products)
+        return bool(products)
+
+    def _fetch_pool(self, style, priority=INTERACTIVE):
+        """
+        Fetch EBAY_OVERFETCH_PAGES pages of a style's base query at once. The
+        first page runs here; the rest run on the outbound executor, at
+        background priority so they never spend the interactive reserve.
+
+        Returns:
+            Products of every page that arrived in time, without duplicates,
+            or None if the rate limit skipped the first page
+        """
+        _, _, search_query, _, _ = build_search(style)
+        search = (style, EBAY_OVERFETCH_PER_PAGE, search_query, None, EBAY_OVERFETCH_MAX_PRICE)
+
+        futures = []
+        for page in range(2, EBAY_OVERFETCH_PAGES + 1):
+            try:
+                futures.append(outbound.outbound_executor.submit(
+                    self._find_products, *search, priority=BACKGROUND, page=page,
+                    name='ebay_page', timeout=EBAY_TIMEOUT * 2))
+            except outbound.ExecutorSaturated:
+                break
+
+        try:
+            pages = [self._find_products(*search, priority=priority, page=1)]
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+        if pages[0] is None:
+            for future in futures:
+                future.cancel()
+            return None
+
+        for page, future in enumerate(futures, start=2):
+            try:
+                pages.append(future.result(timeout=outbound.remaining(EBAY_TIMEOUT * 2)))
+            except Exception as e:
+                logger.warning(f"Skipping page {page} of the {style} candidate pool: {e}")
+                self._report_quota_error(e)
+
+        products, seen = [], set()
+        for page_products in pages:
+            for product in page_products or []:
+                if product['id'] not in seen:
+                    seen.add(product['id'])
+                    products.append(product)
+        logger.info(f"Fetched {len(products)} candidates for {style} from {len(pages)} pages")
+        return products
+
+    def refresh(self, search, stale=None, priority=BACKGROUND):
+        """
+        Run a search and cache its results, e.g. to warm the cache ahead of requests.
+
+        Args:
+            search: (style, limit, search_query, min_price, max_price), see build_search
+            stale: Products currently cached for the search, kept if it fails
+            priority: Rate limiter priority class (background by default)
+
+        Returns:
+            List of products, or None if the rate limit skipped the search
+        """
+        return self._search_and_cache(product_cache_key(*search), tuple(search), stale=stale, priority=priority)
+
+    def _search_once(self, cache_key, search):
+        """
+        Run a search unless another worker is already running it, in which case
+        wait for that worker to cache its results and return those.
+
+        Returns:
+            List of products, or None if the rate limit skipped the search
+        """
+        if inflight_leases is None:
+            return self._search_and_cache(cache_key, search)
+
+        if not inflight_leases.add(cache_key, os.getpid()):
+            deadline = time.monotonic() + outbound.remaining(EBAY_TIMEOUT * 2)
+            while time.monotonic() < deadline and inflight_leases.get(cache_key) is not None:
+                time.sleep(INFLIGHT_POLL_INTERVAL)
+            entry = product_cache.get(cache_key)
+            if entry is not None:
+                product_cache.count('coalesced_remote')
+                return entry['products']
+            # The other worker failed, was rate limited or is too slow: search here
+            logger.info("No result from another worker's search, searching eBay directly")
+            return self._search_and_cache(cache_key, search)
+
+        try:
+            return self._search_and_cache(cache_key, search)
+        finally:
+            inflight_leases.delete(cache_key)
+
+    def _search_and_cache(self, cache_key, search, stale=None, priority=INTERACTIVE):
+        """
+        Run a search and cache its results (an empty list for a failed search).
+
+        Args:
+            cache_key: Product cache key of the search
+            search: (style, limit, search_query, min_price, max_price)
+            stale: Products of the stale entry being refreshed, kept if the search fails
+            priority: Rate limiter priority class of the search
+
+        Returns:
+            List of products, or None if the rate limit skipped the search
+        """
+        try:
+            products = self._find_products(*search, priority=priority)
+        except Exception as e:
+            logger.error(f"Error searching eBay products: {e}")
+            self._report_quota_error(e)
+            if stale:
+                # Keep serving the stale results; the refresh lease delays the next try
+                return stale
+            products = []
+        if products is None:
+            return None
+
+        if product_cache is not None:
+            ttl = EBAY_CACHE_TTL if products else EBAY_NEGATIVE_TTL
+            product_cache.set(cache_key, {'products': products, 'fresh_until': time.time() + ttl,
+                                          'search': list(search)})
+            logger.info(f"Cached {len(products)} products for {search[0]}")
+        catalog = get_product_catalog()
+        if catalog is not None and products:
+            catalog.add_products(search[0], products, refinement_tags(search[0], search[2]))
+        return products
+
+    def _refresh_in_background(self, cache_key, search, stale):
+        """Refresh a stale cache entry on the outbound executor unless another worker already is."""
+        if refresh_leases is None or not refresh_leases.add(cache_key, os.getpid()):
+            return
+        product_cache.count('refreshes')
+        try:
+            outbound.outbound_executor.submit(self._search_and_cache, cache_key, search, stale=stale, priority=BACKGROUND,
+                                              name='ebay_refresh', timeout=EBAY_TIMEOUT * 2)
+        except outbound.ExecutorSaturated:
+            # Try again on a later request
+            refresh_leases.delete(cache_key)
+
+    def _find_products(self, style, limit, search_query, min_price, max_price, priority=INTERACTIVE, page=1):
+        """
+        Run one Finding API search.
+
+        Args:
+            style, limit, search_query, min_price, max_price: See build_search
+            priority: Rate limiter priority class
+            page: Result page to fetch (pages hold limit items)
+
+        Returns:
+            List of products (empty if nothing matched), or None if the rate limit skipped the search
+
+        Raises:
+            ConnectionError or other exceptions from the eBay API
+        """
+        logger.info(f"Searching eBay for: {search_query}")
+
+        # Check rate limiting before making request
+        if not self._check_rate_limit(priority):
+            logger.warning("Rate limit reached, skipping eBay API call")
+            return None
+
+        item_filters = [
+            {'name': 'Condition', 'value': 'New'},
+            {'name': 'ListingType', 'value': 'FixedPrice'},
+            {'name': 'AvailableTo', 'value': 'US'},  # Focus on US shipping
+            {'name': 'FreeShippingOnly', 'value': 'true'}  # Prefer free shipping
+        ]
+        # Reasonable price cap, unless the user asked for other price bounds
+        if max_price is None and min_price is None:
+            max_price = DEFAULT_MAX_PRICE
+        if max_price is not None:
+            item_filters.append({'name': 'MaxPrice', 'value': f"{max_price:.1f}",
+                                 'paramName': 'Currency', 'paramValue': 'USD'})
+        if min_price is not None:
+            item_filters.append({'name': 'MinPrice', 'value': f"{min_price:.1f}",
+                                 'paramName': 'Currency', 'paramValue': 'USD'})
+
+        # Make the API call to eBay Finding API with improved parameters
+        with self._connection() as api:
+            response = api.execute('findItemsAdvanced', {
                 'keywords': search_query,
                 'categoryId': '11450',  # eBay category ID for Clothing, Shoes & Accessories
                 'sortOrder': 'BestMatch',
                 'paginationInput': {
                     'entriesPerPage': limit,
-                    'pageNumber': 1
+                    'pageNumber': page
                 },
-                'itemFilter': [
-                    {'name': 'Condition', 'value': 'New'},
-                    {'name': 'ListingType', 'value': 'FixedPrice'},
-                    {'name': 'AvailableTo', 'value': 'US'},  # Focus on US shipping
-                    {'name': 'FreeShippingOnly', 'value': 'true'},  # Prefer free shipping
-                    {'name': 'MaxPrice', 'value': '200.0', 'paramName': 'Currency', 'paramValue': 'USD'}  # Reasonable price cap
-                ],
+                'itemFilter': item_filters,
                 'outputSelector': ['SellerInfo', 'GalleryInfo', 'StoreInfo', 'ShippingInfo']
             })
 
-            # Parse the response
+            # Parse the response while the connection is checked out
             response_dict = response.dict()
 
-            # Check if any items were found
-            if 'searchResult' not in response_dict or 'item' not in response_dict['searchResult']:
-                logger.warning(f"No items found for query: {search_query}")
-                return []
-
-            # Extract items from the response
-            items = response_dict['searchResult']['item']
-            logger.info(f"Found {len(items)} items for {search_query}")
-
-            # Format products for our application
-            products = []
-            for item in items:
-                try:
-                    # Extract product details and add affiliate tracking to URL
-                    item_id = item['itemId']
-                    original_url = item['viewItemURL']
-                    affiliate_url = self.add_affiliate_tracking(original_url, item_id, style)
-
-                    # Extract higher quality images when available
-                    image_url = item.get('galleryURL', 'https://placehold.co/200x150/2a2a2a/ffffff?text=No+Image')
-                    if 'pictureURLLarge' in item:
-                        image_url = item['pictureURLLarge']
-                    elif 'pictureURLSuperSize' in item:
-                        image_url = item['pictureURLSuperSize']
-
-                    # Format price with currency symbol
-                    price_value = float(item['sellingStatus']['currentPrice']['value'])
-                    currency = item['sellingStatus']['currentPrice']['_currencyId']
-                    formatted_price = f"${price_value:.2f}" if currency == 'USD' else f"{price_value:.2f} {currency}"
-
-                    # Get shipping information
-                    shipping_cost = item.get('shippingInfo', {}).get('shippingServiceCost', {}).get('value', '0.00')
-                    shipping_cost_float = float(shipping_cost) if shipping_cost != 'Unknown' else 0.0
-                    free_shipping = shipping_cost_float <= 0
-
-                    # Check if there's a store
-                    has_store = 'storeInfo' in item and 'storeName' in item['storeInfo']
-                    store_name = item.get('storeInfo', {}).get('storeName', '') if has_store else ''
-
-                    # Enhanced product object
-                    product = {
-                        'id': item_id,
-                        'title': item['title'],
-                        'price': formatted_price,
-                        'price_value': price_value,
-                        'currency': currency,
-                        'image': image_url,
-                        'url': affiliate_url,  # Use URL with affiliate tracking
-                        'location': item.get('location', 'Unknown'),
-                        'condition': item.get('condition', {}).get('conditionDisplayName', 'New'),
-                        'seller': item.get('sellerInfo', {}).get('sellerUserName', 'Unknown'),
-                        'seller_rating': item.get('sellerInfo', {}).get('positiveFeedbackPercent', 'N/A'),
-                        'shipping_type': item.get('shippingInfo', {}).get('shippingType', 'Standard'),
-                        'shipping_cost': shipping_cost,
-                        'free_shipping': free_shipping,
-                        'has_store': has_store,
-                        'store_name': store_name
-                    }
-
-                    # Add star rating (hardcoded since eBay doesn't provide this in the Finding API)
-                    seller_rating = item.get('sellerInfo', {}).get('positiveFeedbackPercent', 0)
-                    if seller_rating:
-                        try:
-                            rating = float(seller_rating) / 20  # Convert percent to 0-5 scale
-                            product['rating'] = min(5, max(0, rating))
-                        except (ValueError, TypeError):
-                            product['rating'] = 4.0  # Default rating
-                    else:
-                        product['rating'] = 4.0  # Default rating
-
-                    # Add reviews count (not available in eBay API, using dummy value)
-                    product['reviews'] = 0
-
-                    products.append(product)
-                except Exception as e:
-                    logger.error(f"Error parsing product data: {e}")
-                    continue
-
-            # Cache successful results
-            if products:
-                self._cache[cache_key] = (now, products)
-                logger.info(f"Cached {len(products)} products for {style}")
-            return products
-
-        except ConnectionError as e:
-            logger.error(f"eBay API connection error: {e}")
-            # Return cached results if available when API fails
-            if cache_key in self._cache:
-                _, cached_data = self._cache[cache_key]
-                logger.info("Returning cached results due to API error")
-                return cached_data
-            return []
-        except Exception as e:
-            logger.error(f"Error searching eBay products: {e}")
-            # Return cached results if available when API fails
-            if cache_key in self._cache:
-                _, cached_data = self._cache[cache_key]
-                logger.info("Returning cached results due to error")
-                return cached_data
+        # Parse the items into product records, with affiliate tracking on their URLs
+        products = parse_items(response_dict, lambda url, item_id: self.add_affiliate_tracking(url, item_id, style))
+        if not products:
+            logger.warning(f"No items found for query: {search_query}")
             return []
+        logger.info(f"Found {len(products)} items for {search_query}")
+
+        return [product.to_dict() for product in products]
 
     def add_affiliate_tracking(self, url, item_id=None, style=None):
         """
@@ -383,93 +689,50 @@ class EbayManager:
                 return []
 
             # Make the API call to eBay Finding API with improved parameters
-            response = self.api.execute('findItemsByProduct', {
-                'productId': item_id,
-                'paginationInput': {
-                    'entriesPerPage': limit,
-                    'pageNumber': 1
-                },
-                'itemFilter': [
-                    {'name': 'Condition', 'value': 'New'},
-                    {'name': 'AvailableTo', 'value': 'US'},
-                    {'name': 'ListingType', 'value': 'FixedPrice'}
-                ],
-                'outputSelector': ['SellerInfo', 'GalleryInfo', 'ShippingInfo']
-            })
-
-            # Parse the response
-            response_dict = response.dict()
-
-            # Check if any items were found
-            if 'searchResult' not in response_dict or 'item' not in response_dict['searchResult']:
+            with self._connection() as api:
+                response = api.execute('findItemsByProduct', {
+                    'productId': item_id,
+                    'paginationInput': {
+                        'entriesPerPage': limit,
+                        'pageNumber': 1
+                    },
+                    'itemFilter': [
+                        {'name': 'Condition', 'value': 'New'},
+                        {'name': 'AvailableTo', 'value': 'US'},
+                        {'name': 'ListingType', 'value': 'FixedPrice'}
+                    ],
+                    'outputSelector': ['SellerInfo', 'GalleryInfo', 'ShippingInfo']
+                })
+
+                # Parse the response while the connection is checked out
+                response_dict = response.dict()
+
+            # Parse the items into product records, with affiliate tracking on their URLs
+            products = parse_items(response_dict, self.add_affiliate_tracking)
+            if not products:
                 logger.warning(f"No similar items found for item ID: {item_id}")
                 return []
+            logger.info(f"Found {len(products)} similar items for {item_id}")
 
-            # Extract items from the response
-            items = response_dict['searchResult']['item']
-            logger.info(f"Found {len(items)} similar items for {item_id}")
-
-            # Format products for our application
-            products = []
-            for item in items:
-                try:
-                    # Extract product details and add affiliate tracking to URL
-                    similar_item_id = item['itemId']
-                    original_url = item['viewItemURL']
-                    affiliate_url = self.add_affiliate_tracking(original_url, similar_item_id, None)
-
-                    # Extract higher quality images when available
-                    image_url = item.get('galleryURL', 'https://placehold.co/200x150/2a2a2a/ffffff?text=No+Image')
-                    if 'pictureURLLarge' in item:
-                        image_url = item['pictureURLLarge']
-                    elif 'pictureURLSuperSize' in item:
-                        image_url = item['pictureURLSuperSize']
-
-                    # Format price with currency symbol
-                    price_value = float(item['sellingStatus']['currentPrice']['value'])
-                    currency = item['sellingStatus']['currentPrice']['_currencyId']
-                    formatted_price = f"${price_value:.2f}" if currency == 'USD' else f"{price_value:.2f} {currency}"
-
-                    # Get shipping information
-                    shipping_cost = item.get('shippingInfo', {}).get('shippingServiceCost', {}).get('value', '0.00')
-                    shipping_cost_float = float(shipping_cost) if shipping_cost != 'Unknown' else 0.0
-                    free_shipping = shipping_cost_float <= 0
-
-                    # Check if there's a store
-                    has_store = 'storeInfo' in item and 'storeName' in item['storeInfo']
-                    store_name = item.get('storeInfo', {}).get('storeName', '') if has_store else ''
-
-                    # Enhanced product object
-                    product = {
-                        'id': similar_item_id,
-                        'title': item['title'],
-                        'price': formatted_price,
-                        'price_value': price_value,
-                        'currency': currency,
-                        'image': image_url,
-                        'url': affiliate_url,  # Use URL with affiliate tracking
-                        'location': item.get('location', 'Unknown'),
-                        'condition': item.get('condition', {}).get('conditionDisplayName', 'New'),
-                        'seller': item.get('sellerInfo', {}).get('sellerUserName', 'Unknown'),
-                        'seller_rating': item.get('sellerInfo', {}).get('positiveFeedbackPercent', 'N/A'),
-                        'shipping_type': item.get('shippingInfo', {}).get('shippingType', 'Standard'),
-                        'shipping_cost': shipping_cost,
-                        'free_shipping': free_shipping,
-                        'has_store': has_store,
-                        'store_name': store_name,
-                        'rating': 4.0,  # Default rating (not available in eBay API)
-                        'reviews': 0  # Default reviews count (not available in eBay API)
-                    }
-                    products.append(product)
-                except Exception as e:
-                    logger.error(f"Error parsing similar product data: {e}")
-                    continue
-
-            return products
+            return [product.to_dict() for product in products]
 
         except ConnectionError as e:
             logger.error(f"eBay API connection error: {e}")
+            self._report_quota_error(e)
             return []
         except Exception as e:
             logger.error(f"Error finding similar items: {e}")
-            return []
\ No newline at end of file
+            return []
+
+
+_instance = None
+_instance_lock = threading.Lock()
+
+def get_ebay_manager():
+    """Returns the process-wide EbayManager, creating it (without connecting) on first use."""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = EbayManager()
+    return _instance
@@ -0,0 +1,162 @@
+"""
+eBay Product Records for Fashion Style Analyzer
+
+This module turns Finding API search results into compact Product records
+and serializes them into the product dictionaries the app caches and sends
+to the client. Both findItemsAdvanced and findItemsByProduct results go
+through the same parser.
+"""
+
+import logging
+from dataclasses import dataclass
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Shown for items without a gallery picture
+NO_IMAGE_URL = 'https://placehold.co/200x150/2a2a2a/ffffff?text=No+Image'
+
+# eBay does not rate items, so products without a seller feedback score get this
+DEFAULT_RATING = 4.0
+
+_EMPTY = {}
+
+
+@dataclass(slots=True)
+class Product:
+    """
+    One eBay listing, holding only what the product dictionary needs.
+    Derived values (the formatted price, free shipping) are computed once
+    when parsing so to_dict() only copies fields.
+    """
+
+    id: str
+    title: str
+    price: str
+    price_value: float
+    currency: str
+    image: str
+    url: str
+    location: str = 'Unknown'
+    condition: str = 'New'
+    seller: str = 'Unknown'
+    seller_rating: str = 'N/A'
+    shipping_type: str = 'Standard'
+    shipping_cost: str = '0.00'
+    free_shipping: bool = True
+    store_name: str = ''
+    rating: float = DEFAULT_RATING
+    reviews: int = 0
+
+    def to_dict(self):
+        """Returns the product dictionary cached and sent to the client."""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'price': self.price,
+            'price_value': self.price_value,
+            'currency': self.currency,
+            'image': self.image,
+            'url': self.url,
+            'location': self.location,
+            'condition': self.condition,
+            'seller': self.seller,
+            'seller_rating': self.seller_rating,
+            'shipping_type': self.shipping_type,
+            'shipping_cost': self.shipping_cost,
+            'free_shipping': self.free_shipping,
+            'has_store': bool(self.store_name),
+            'store_name': self.store_name,
+            'rating': self.rating,
+            'reviews': self.reviews
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a Product from a dictionary made by to_dict (e.g. a cached one)."""
+        return cls(**{name: data[name] for name in cls.__slots__ if name in data})
+
+
+def _free_shipping(shipping_cost):
+    """Whether a shipping cost is free (unknown costs count as free)."""
+    try:
+        return float(shipping_cost) <= 0
+    except ValueError:
+        return True
+
+
+def _seller_rating(feedback_percent):
+    """Convert a seller's positive feedback percentage into a 0-5 star rating."""
+    if not feedback_percent:
+        return DEFAULT_RATING
+    try:
+        return min(5.0, max(0.0, float(feedback_percent) / 20))
+    except (ValueError, TypeError):
+        return DEFAULT_RATING
+
+
+def parse_item(item, tracking_url):
+    """
+    Turn one Finding API item into a Product.
+
+    Args:
+        item: Item dictionary from response.dict()
+        tracking_url: Callable (url, item_id) returning the URL with affiliate tracking
+
+    Returns:
+        Product
+    """
+    item_id = item['itemId']
+    current_price = item['sellingStatus']['currentPrice']
+    seller = item.get('sellerInfo') or _EMPTY
+    shipping = item.get('shippingInfo') or _EMPTY
+    feedback_percent = seller.get('positiveFeedbackPercent')
+    price_value = float(current_price['value'])
+    currency = current_price['_currencyId']
+    shipping_cost = (shipping.get('shippingServiceCost') or _EMPTY).get('value', '0.00')
+
+    # Positional arguments in field order: keyword arguments make this measurably slower
+    return Product(
+        item_id,
+        item['title'],
+        f"${price_value:.2f}" if currency == 'USD' else f"{price_value:.2f} {currency}",
+        price_value,
+        currency,
+        # Prefer higher quality pictures when available
+        item.get('pictureURLLarge') or item.get('pictureURLSuperSize') or item.get('galleryURL') or NO_IMAGE_URL,
+        tracking_url(item['viewItemURL'], item_id),
+        item.get('location', 'Unknown'),
+        (item.get('condition') or _EMPTY).get('conditionDisplayName', 'New'),
+        seller.get('sellerUserName', 'Unknown'),
+        feedback_percent or 'N/A',
+        shipping.get('shippingType', 'Standard'),
+        shipping_cost,
+        _free_shipping(shipping_cost),
+        (item.get('storeInfo') or _EMPTY).get('storeName', ''),
+        _seller_rating(feedback_percent)
+    )
+
+
+def parse_items(response_dict, tracking_url):
+    """
+    Parse the items of a Finding API response, skipping malformed ones.
+
+    Args:
+        response_dict: response.dict() of a findItems* call
+        tracking_url: Callable (url, item_id) returning the URL with affiliate tracking
+
+    Returns:
+        List of Products (empty if the response has no items)
+    """
+    items = (response_dict.get('searchResult') or _EMPTY).get('item') or []
+    if isinstance(items, dict):
+        # A single result may not be wrapped in a list
+        items = [items]
+
+    products = []
+    for item in items:
+        try:
+            products.append(parse_item(item, tracking_url))
+        except Exception as e:
+            logger.error(f"Error parsing product data: {e}")
+    return products
@@ -3,7 +3,7 @@ Hybrid Style Classification System
 
 This module implements a multi-model approach to fashion style classification:
 1. ChatGPT-4o mini (Primary) - High-level style categorization and context awareness
-2. CLIP (Secondary) - Image-text similarity matching for style verification
+2. Local classifier (Secondary) - Offline image-feature/prototype matching for style verification
 3. Attribute detection (Tertiary) - Detailed clothing item recognition
 
 The system combines these models with appropriate weighting to provide
@@ -11,19 +11,31 @@ comprehensive style analysis, recommendations, and outfit generation.
 Using GPT-4o mini for cost efficiency as lengthy outputs aren't necessary.
 """
 
+import asyncio
 import base64
+import copy
+import functools
+import datetime
+import hashlib
 import io
 import json
 import logging
 import os
 from PIL import Image
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from openai import OpenAI
 
-# This will be initialized from app.py
-# The hybrid_classifier module uses the OpenAI client from the app module
-openai_client = None
+import llm_client
+from metrics import registry
+from pipeline import Pipeline, Stage
+from disk_cache import DiskCache
+from local_classifier import LocalStyleClassifier, extract_features
+from image_artifact import API_MAX_SIZE, as_artifact
+from payload_policy import build_payload, image_content
+
+# OpenAI stages are coroutines awaiting the shared AsyncOpenAI client (see llm_client);
+# openai_client tells whether a key is configured, and app.py can replace it with
+# set_openai_client
+openai_client = llm_client.shared_client
 
 def set_openai_client(client):
     """
@@ -49,59 +61,147 @@ STYLE_CATEGORIES = [
     "Whimsigoth", "Regencycore", "Fantasy", "Military-Inspired"
 ]
 
+# Secondary, offline stage: nearest-prototype classifier over local image features.
+# Prototypes are rebuilt from stored predictions with `python local_classifier.py`.
+local_classifier = LocalStyleClassifier(STYLE_CATEGORIES)
+local_classifier.load()
+
+# Analysis mode: "multi" makes separate style, attribute and outfit calls;
+# "single" asks for everything in one structured-output call so the image
+# is uploaded only once
+ANALYSIS_MODES = ("multi", "single", "cascade")
+DEFAULT_ANALYSIS_MODE = os.environ.get("CLASSIFIER_MODE", "multi").lower()
+
+# Cascade mode answers locally when the local classifier's top-1 margin over
+# the runner-up clears this threshold, and escalates to GPT-4o mini otherwise
+CASCADE_MARGIN_THRESHOLD = float(os.environ.get("CASCADE_MARGIN_THRESHOLD", "0.05"))
+
+# Cascade decisions and the local margins behind them, exported on /metrics so the
+# escalation rate can be summed across workers and tuned against feedback accuracy
+CASCADE_OUTCOMES = ("local", "escalated", "unavailable")
+CASCADE_DECISIONS = registry.counter(
+    'cascade_decisions_total', 'Cascade requests answered locally or escalated to GPT', ('outcome',))
+CASCADE_MARGIN = registry.histogram(
+    'cascade_local_margin', "Local classifier's top-1 margin on cascade requests", ('outcome',),
+    (0.01, 0.02, 0.03, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.5))
+
+# Content-addressed cache of combined analyses, shared by all workers
+CLASSIFICATION_CACHE_ENABLED = os.environ.get("CLASSIFICATION_CACHE_ENABLED", "true").lower() == "true"
+classification_cache = DiskCache(
+    "classification",
+    max_entries=int(os.environ.get("CLASSIFICATION_CACHE_MAX_ENTRIES", "20000")),
+    ttl=int(os.environ.get("CLASSIFICATION_CACHE_TTL", str(7 * 86400)))
+) if CLASSIFICATION_CACHE_ENABLED else None
+
+# Outfit ideas are generated from the style summary alone (no image) when
+# OUTFIT_TEXT_ONLY is set; those results depend only on the style, garment,
+# season and top tags, so they are memoized across users and workers
+OUTFIT_TEXT_ONLY = os.environ.get("OUTFIT_TEXT_ONLY", "true").lower() == "true"
+OUTFIT_CACHE_ENABLED = os.environ.get("OUTFIT_CACHE_ENABLED", "true").lower() == "true"
+OUTFIT_CACHE_TAGS = int(os.environ.get("OUTFIT_CACHE_TAGS", "3"))
+outfit_cache = DiskCache(
+    "outfits",
+    max_entries=int(os.environ.get("OUTFIT_CACHE_MAX_ENTRIES", "5000")),
+    ttl=int(os.environ.get("OUTFIT_CACHE_TTL", str(7 * 86400)))
+) if OUTFIT_TEXT_ONLY and OUTFIT_CACHE_ENABLED else None
+
+# Per-stage timeouts (seconds) for the classification pipeline
+STAGE_TIMEOUTS = {
+    "preprocess": float(os.environ.get("PREPROCESS_STAGE_TIMEOUT", "10")),
+    "style": float(os.environ.get("STYLE_STAGE_TIMEOUT", "30")),
+    "attributes": float(os.environ.get("ATTRIBUTES_STAGE_TIMEOUT", "30")),
+    "outfits": float(os.environ.get("OUTFITS_STAGE_TIMEOUT", "30")),
+    "single_pass": float(os.environ.get("SINGLE_PASS_STAGE_TIMEOUT", "45")),
+    "cache": float(os.environ.get("CACHE_STAGE_TIMEOUT", "2")),
+    "local": float(os.environ.get("LOCAL_STAGE_TIMEOUT", "2")),
+}
+
+# Fallback used when no OpenAI client is configured
+FALLBACK_STYLE_ANALYSIS = {
+    "primary_style": "Contemporary Casual",
+    "style_tags": ["versatile", "modern", "everyday"],
+    "confidence_score": 0.7,
+    "style_description": "A contemporary casual style with versatile appeal.",
+    "styling_tips": "Pair with minimal accessories for an effortless look.",
+    "key_attributes": ["Clean lines", "Modern silhouette", "Versatile design"]
+}
+
+# Fallback used when the style analysis call fails or times out
+ERROR_STYLE_ANALYSIS = {
+    "primary_style": "Modern Casual",
+    "style_tags": ["versatile", "timeless", "clean-cut", "contemporary"],
+    "confidence_score": 0.75,
+    "style_description": "A modern take on casual wear with clean lines and contemporary elements, suitable for various everyday settings.",
+    "styling_tips": "Accessorize with minimalist jewelry and a quality watch to enhance the look without overwhelming it.",
+    "key_attributes": ["Clean silhouette", "Balanced proportions", "Neutral palette"]
+}
+
+# Fallback used when attribute detection fails or times out
+FALLBACK_ATTRIBUTES = {
+    "garment_type": "unknown",
+    "silhouette": "unknown",
+    "neckline": "unknown",
+    "sleeve_type": "unknown",
+    "pattern": "unknown",
+    "color_palette": [],
+    "texture": "unknown",
+    "hem_style": "unknown",
+    "occasion": "unknown"
+}
+
+# Fallback for the whole classification when the image cannot be processed
+FALLBACK_CLASSIFICATION = {
+    "primary_style": "Contemporary Casual",
+    "style_tags": ["versatile", "modern", "everyday"],
+    "confidence_score": 70,
+    "style_description": "A modern casual style with contemporary elements, featuring clean lines and versatile appeal.",
+    "styling_tips": "Can be paired with both casual and semi-formal accessories for different occasions.",
+    "attributes": {
+        "garment_type": "casual wear",
+        "occasion": "everyday"
+    },
+    "outfit_combinations": []
+}
+
 def preprocess_image(image):
     """
     Preprocesses an image for model input.
+    The resized image and its encoding are memoized on the image artifact,
+    so repeated calls during a request do not re-encode it.
     
     Args:
-        image: PIL Image object
+        image: PIL Image object or ImageArtifact
         
     Returns:
         Processed image and base64 encoding for API calls
     """
     try:
-        if not isinstance(image, Image.Image):
-            raise ValueError("Invalid image format")
-            
+        artifact = as_artifact(image)
+        
         # Resize image if needed (OpenAI API accepts any size)
-        max_size = 1024
-        if max(image.size) > max_size:
-            ratio = max_size / max(image.size)
-            new_size = tuple([int(s * ratio) for s in image.size])
-            image = image.resize(new_size, Image.LANCZOS)
+        resized = artifact.resized(API_MAX_SIZE)
     except Exception as e:
         print(f"Error preprocessing image: {e}")
         raise
     
     # Convert to base64 for API calls
-    buffered = io.BytesIO()
-    image.save(buffered, format="JPEG")
-    base64_image = base64.b64encode(buffered.getvalue()).decode('utf-8')
-    
-    return image, base64_image
+    return resized, artifact.base64(API_MAX_SIZE)
 
-def analyze_with_gpt4o(base64_image):
+async def analyze_with_gpt4o(base64_image):
     """
     Primary analyzer using ChatGPT-4o mini vision capabilities with hybrid model integration.
     Falls back to basic classification if OpenAI API is unavailable.
     Uses GPT-4o mini for cost efficiency as lengthy outputs aren't necessary.
     
     Args:
-        base64_image: Base64-encoded image string
+        base64_image: Base64-encoded image string or ImagePayload
         
     Returns:
         Dictionary with detailed style analysis
     """
     if not openai_client:
         # Fallback to basic classification
-        return {
-            "primary_style": "Contemporary Casual",
-            "style_tags": ["versatile", "modern", "everyday"],
-            "confidence_score": 0.7,
-            "style_description": "A contemporary casual style with versatile appeal.",
-            "styling_tips": "Pair with minimal accessories for an effortless look.",
-            "key_attributes": ["Clean lines", "Modern silhouette", "Versatile design"]
-        }
+        return copy.deepcopy(FALLBACK_STYLE_ANALYSIS)
         
     if not base64_image:
         raise ValueError("No image data provided")
@@ -110,7 +210,7 @@ def analyze_with_gpt4o(base64_image):
         logging.info("Starting GPT-4o mini analysis")
         # Using GPT-4o mini for cost efficiency as lengthy outputs aren't necessary
         # This model is sufficient for our style classification needs
-        response = openai_client.chat.completions.create(
+        response = await llm_client.chat_completion_async(llm_client.get_async_client(), "style_analysis",
             model="gpt-4o-mini",
             messages=[
                 {
@@ -135,12 +235,7 @@ def analyze_with_gpt4o(base64_image):
                             "type": "text", 
                             "text": "Analyze this fashion item/outfit and classify its style. Be specific and unrestricted in your style categorization."
                         },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            }
-                        }
+                        image_content(base64_image)
                     ]
                 }
             ],
@@ -152,23 +247,16 @@ def analyze_with_gpt4o(base64_image):
         return style_data
     except Exception as e:
         logging.error(f"Error in GPT-4o mini analysis: {e}")
-        return {
-            "primary_style": "Modern Casual",
-            "style_tags": ["versatile", "timeless", "clean-cut", "contemporary"],
-            "confidence_score": 0.75,
-            "style_description": "A modern take on casual wear with clean lines and contemporary elements, suitable for various everyday settings.",
-            "styling_tips": "Accessorize with minimalist jewelry and a quality watch to enhance the look without overwhelming it.",
-            "key_attributes": ["Clean silhouette", "Balanced proportions", "Neutral palette"]
-        }
+        return copy.deepcopy(ERROR_STYLE_ANALYSIS)
 
-def extract_attributes(base64_image):
+async def extract_attributes(base64_image):
     """
     Extracts detailed clothing attributes using a DeepFashion-like approach.
     Currently uses GPT-4o mini for attribute detection, but can be replaced with 
     a specialized model in the future. Uses mini variant for cost efficiency.
     
     Args:
-        base64_image: Base64-encoded image string
+        base64_image: Base64-encoded image string or ImagePayload
         
     Returns:
         Dictionary with detailed clothing attributes
@@ -176,7 +264,7 @@ def extract_attributes(base64_image):
     try:
         # Using GPT-4o mini for cost efficiency as lengthy outputs aren't necessary
         # This model is sufficient for our style classification needs
-        response = openai_client.chat.completions.create(
+        response = await llm_client.chat_completion_async(llm_client.get_async_client(), "attribute_analysis",
             model="gpt-4o-mini",
             messages=[
                 {
@@ -204,12 +292,7 @@ def extract_attributes(base64_image):
                             "type": "text", 
                             "text": "Extract detailed clothing attributes from this fashion item/outfit."
                         },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            }
-                        }
+                        image_content(base64_image)
                     ]
                 }
             ],
@@ -219,17 +302,7 @@ def extract_attributes(base64_image):
         return json.loads(response.choices[0].message.content)
     except Exception as e:
         print(f"Error in attribute detection: {e}")
-        return {
-            "garment_type": "unknown",
-            "silhouette": "unknown",
-            "neckline": "unknown",
-            "sleeve_type": "unknown",
-            "pattern": "unknown",
-            "color_palette": [],
-            "texture": "unknown",
-            "hem_style": "unknown",
-            "occasion": "unknown"
-        }
+        return copy.deepcopy(FALLBACK_ATTRIBUTES)
 
 def combine_analysis(gpt4o_analysis, attribute_analysis):
     """
@@ -265,27 +338,77 @@ def combine_analysis(gpt4o_analysis, attribute_analysis):
     
     return combined_result
 
-def generate_outfit_combinations(style_analysis, base64_image):
+def current_season(date=None):
+    """Returns the current (Northern Hemisphere) season name."""
+    month = (date or datetime.date.today()).month
+    if 3 <= month <= 5:
+        return "Spring"
+    if 6 <= month <= 8:
+        return "Summer"
+    if 9 <= month <= 11:
+        return "Fall"
+    return "Winter"
+
+def _normalize(text):
+    return " ".join(str(text).lower().split())
+
+def outfit_cache_key(style_analysis, season):
+    """
+    Returns the memo key of text-only outfit ideas: the normalized primary
+    style, garment type, season and top style tags (order-insensitive).
+    """
+    tags = sorted(_normalize(tag) for tag in style_analysis.get('style_tags', [])[:OUTFIT_CACHE_TAGS])
+    return "|".join([
+        _normalize(style_analysis.get('primary_style', '')),
+        _normalize(style_analysis.get('attributes', {}).get('garment_type', 'clothing item')),
+        season.lower(),
+        ",".join(tags)
+    ])
+
+async def generate_outfit_combinations(style_analysis, base64_image=None):
     """
     Generates more concise outfit combination suggestions to optimize token usage.
     Uses GPT-4o mini for cost efficiency and more concise outputs.
     
+    Without an image the ideas are generated from the style summary alone and
+    memoized in the shared outfit cache, so repeat combinations skip the API.
+    
     Args:
         style_analysis: Combined style analysis dictionary
-        base64_image: Base64-encoded image of the original item
+        base64_image: Base64-encoded image (or ImagePayload) of the original item,
+            or None for text-only generation
         
     Returns:
         List of outfit combinations with descriptions and components
     """
+    season = current_season()
+    cache_key = None
+    if base64_image is None and outfit_cache is not None:
+        cache_key = outfit_cache_key(style_analysis, season)
+        cached = outfit_cache.get(cache_key)
+        if cached:
+            logging.info(f"Outfit cache hit: {cache_key}")
+            return cached
+    
     try:
         # Create a minimal prompt with essential style information
         style_prompt = f"""Style: {style_analysis['primary_style']}
         Tags: {', '.join(style_analysis['style_tags'][:3])}
-        Item: {style_analysis['attributes'].get('garment_type', 'clothing item')}"""
+        Item: {style_analysis['attributes'].get('garment_type', 'clothing item')}
+        Season: {season}"""
+        
+        user_content = [
+            {
+                "type": "text", 
+                "text": f"Create 3 outfit ideas for this item. Style info:\n{style_prompt}"
+            }
+        ]
+        if base64_image is not None:
+            user_content.append(image_content(base64_image))
         
         # Using GPT-4o mini for cost efficiency as lengthy outputs aren't necessary
         # This model is sufficient for our style classification needs
-        response = openai_client.chat.completions.create(
+        response = await llm_client.chat_completion_async(llm_client.get_async_client(), "outfit_result",
             model="gpt-4o-mini",
             messages=[
                 {
@@ -303,18 +426,7 @@ def generate_outfit_combinations(style_analysis, base64_image):
                 },
                 {
                     "role": "user",
-                    "content": [
-                        {
-                            "type": "text", 
-                            "text": f"Create 3 outfit ideas for this item. Style info:\n{style_prompt}"
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            }
-                        }
-                    ]
+                    "content": user_content
                 }
             ],
             response_format={"type": "json_object"},
@@ -322,55 +434,336 @@ def generate_outfit_combinations(style_analysis, base64_image):
         )
         
         result = json.loads(response.choices[0].message.content)
+        if cache_key is not None and result.get('outfits'):
+            outfit_cache.set(cache_key, result)
         return result
     except Exception as e:
         print(f"Error generating outfit combinations: {e}")
         return []
 
-def classify_fashion_style(image):
+async def _payload(image, stage):
+    """Builds a stage's image payload off the event loop, since resizing and encoding are CPU work."""
+    return await asyncio.to_thread(build_payload, image, stage)
+
+async def _outfit_image(image):
+    """The outfit stage's image payload, or None in text-only mode."""
+    return None if OUTFIT_TEXT_ONLY else await _payload(image, "outfits")
+
+# Structured-output schema for single-pass analysis; it is the union of the
+# style, attribute and outfit responses of the multi-call path
+SINGLE_PASS_SCHEMA = {
+    "name": "fashion_analysis",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "additionalProperties": False,
+        "required": ["primary_style", "style_tags", "confidence_score", "style_description",
+                     "styling_tips", "key_attributes", "attributes", "outfits"],
+        "properties": {
+            "primary_style": {"type": "string"},
+            "style_tags": {"type": "array", "items": {"type": "string"}},
+            "confidence_score": {"type": "number"},
+            "style_description": {"type": "string"},
+            "styling_tips": {"type": "string"},
+            "key_attributes": {"type": "array", "items": {"type": "string"}},
+            "attributes": {
+                "type": "object",
+                "additionalProperties": False,
+                "required": ["garment_type", "silhouette", "neckline", "sleeve_type", "pattern",
+                             "color_palette", "texture", "hem_style", "occasion"],
+                "properties": {
+                    "garment_type": {"type": "string"},
+                    "silhouette": {"type": "string"},
+                    "neckline": {"type": "string"},
+                    "sleeve_type": {"type": "string"},
+                    "pattern": {"type": "string"},
+                    "color_palette": {"type": "array", "items": {"type": "string"}},
+                    "texture": {"type": "string"},
+                    "hem_style": {"type": "string"},
+                    "occasion": {"type": "string"}
+                }
+            },
+            "outfits": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "additionalProperties": False,
+                    "required": ["name", "components", "styling_tip"],
+                    "properties": {
+                        "name": {"type": "string"},
+                        "components": {"type": "array", "items": {"type": "string"}},
+                        "styling_tip": {"type": "string"}
+                    }
+                }
+            }
+        }
+    }
+}
+
+async def analyze_single_pass(base64_image):
     """
-    Main function for classifying fashion style using the hybrid approach.
-    Uses GPT-4o mini across all model functions for cost efficiency.
+    Single-pass analyzer that returns style, attributes and outfits from one
+    GPT-4o mini call, so the image is uploaded once instead of three times.
     
     Args:
-        image: PIL Image object
+        base64_image: Base64-encoded image string or ImagePayload
         
     Returns:
-        Dictionary with comprehensive style analysis
+        Dictionary matching SINGLE_PASS_SCHEMA
     """
-    try:
-        if not image:
-            raise ValueError("No image provided")
-            
-        # Preprocess the image
-        _, base64_image = preprocess_image(image)
+    if not openai_client:
+        raise ValueError("OpenAI client not available")
         
-        # Step 1: Get primary analysis from GPT-4o mini (highest weight)
-        gpt4o_analysis = analyze_with_gpt4o(base64_image)
-    except Exception as e:
-        print(f"Error in classify_fashion_style: {e}")
-        # Even when there's an error, provide a reasonable fallback style instead of "Unclassified"
-        return {
-            "primary_style": "Contemporary Casual",
-            "style_tags": ["versatile", "modern", "everyday"],
-            "confidence_score": 70,
-            "style_description": "A modern casual style with contemporary elements, featuring clean lines and versatile appeal.",
-            "styling_tips": "Can be paired with both casual and semi-formal accessories for different occasions.",
-            "attributes": {
-                "garment_type": "casual wear",
-                "occasion": "everyday"
+    if not base64_image:
+        raise ValueError("No image data provided")
+    
+    logging.info("Starting single-pass GPT-4o mini analysis")
+    response = await llm_client.chat_completion_async(llm_client.get_async_client(), "single_pass",
+        model="gpt-4o-mini",
+        messages=[
+            {
+                "role": "system",
+                "content": """You are a fashion style expert with deep knowledge of global fashion trends, 
+                historical styles, and niche fashion subcultures. Analyze the provided fashion image in one pass:
+                
+                - primary_style: The main style category (be specific and creative, don't use generic terms)
+                - style_tags: 3-5 descriptive style tags
+                - confidence_score: Float between 0-1 representing confidence level
+                - style_description: Detailed description of the style (2-3 sentences)
+                - styling_tips: Suggestions on how to accessorize or enhance this look (2-3 sentences)
+                - key_attributes: Notable fashion attributes (colors, patterns, silhouettes, materials)
+                - attributes: Factual garment traits of the main item (garment_type, silhouette, neckline,
+                  sleeve_type, pattern, color_palette, texture, hem_style, occasion)
+                - outfits: 3 concise outfit combinations, each with a short name (max 3 words),
+                  3-4 components including the original item, and a styling_tip (max 10 words)
+                """
             },
-            "outfit_combinations": []
-        }
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text", 
+                        "text": "Analyze this fashion item/outfit: classify its style, extract its attributes and suggest outfits."
+                    },
+                    image_content(base64_image)
+                ]
+            }
+        ],
+        response_format={"type": "json_schema", "json_schema": SINGLE_PASS_SCHEMA}
+    )
+    
+    analysis = json.loads(response.choices[0].message.content)
+    logging.info(f"Single-pass analysis complete: {analysis.get('primary_style')}")
+    return analysis
+
+def split_single_pass(analysis):
+    """
+    Splits a single-pass result into the (style, attributes, outfits) parts
+    produced by the multi-call path, so combine_analysis can consume it.
+    
+    Args:
+        analysis: Result of analyze_single_pass (or None if it failed)
+        
+    Returns:
+        Tuple of (style analysis, attribute analysis, outfit result)
+    """
+    if not analysis:
+        if not openai_client:
+            return copy.deepcopy(FALLBACK_STYLE_ANALYSIS), copy.deepcopy(FALLBACK_ATTRIBUTES), []
+        return copy.deepcopy(ERROR_STYLE_ANALYSIS), copy.deepcopy(FALLBACK_ATTRIBUTES), []
+    
+    style_analysis = {key: value for key, value in analysis.items() if key not in ("attributes", "outfits")}
+    attribute_analysis = analysis.get("attributes") or copy.deepcopy(FALLBACK_ATTRIBUTES)
+    return style_analysis, attribute_analysis, {"outfits": analysis.get("outfits", [])}
+
+def _require_image(base64_image):
+    """Raise if preprocessing produced no image, so dependent stages use their fallback."""
+    if not base64_image:
+        raise ValueError("No preprocessed image available")
+
+def _preprocess_stage(image):
+    if not image:
+        raise ValueError("No image provided")
+    _, base64_image = preprocess_image(image)
+    return base64_image
+
+def _local_features_stage(image):
+    if not image:
+        raise ValueError("No image provided")
+    return extract_features(as_artifact(image).resized(API_MAX_SIZE))
+
+def _local_analysis_stage(features):
+    if features is None:
+        return None
+    return local_classifier.predict(features)
+
+def local_style_analysis(local_analysis):
+    """
+    Builds a style analysis in the shape returned by analyze_with_gpt4o
+    from a local classifier prediction.
+    
+    Args:
+        local_analysis: Result of LocalStyleClassifier.predict
+        
+    Returns:
+        Dictionary with style analysis
+    """
+    style = local_analysis["primary_style"]
+    return {
+        "primary_style": style,
+        "style_tags": [category.lower() for category, _ in local_analysis["top_styles"]],
+        "confidence_score": local_analysis["confidence_score"],
+        "style_description": f"Classified as {style} from the image's colors, textures and silhouette.",
+        "styling_tips": "",
+        "key_attributes": [],
+        "analysis_source": "local"
+    }
+
+def should_escalate(local_analysis, threshold=None):
+    """
+    Decides whether a cascade request needs GPT-4o mini, and records the decision.
     
-    # Step 2: Extract detailed attributes 
-    attribute_analysis = extract_attributes(base64_image)
+    Args:
+        local_analysis: Result of LocalStyleClassifier.predict (None if unavailable)
+        threshold: Optional margin threshold override
+        
+    Returns:
+        True if the request should be escalated
+    """
+    threshold = CASCADE_MARGIN_THRESHOLD if threshold is None else threshold
+    if not local_analysis or not local_classifier.ready:
+        outcome = "unavailable"
+    elif local_analysis["margin"] >= threshold:
+        outcome = "local"
+    else:
+        outcome = "escalated"
     
-    # Step 3: Combine the analyses with appropriate weighting
-    combined_analysis = combine_analysis(gpt4o_analysis, attribute_analysis)
+    CASCADE_DECISIONS.inc(outcome=outcome)
+    if outcome != "unavailable":
+        CASCADE_MARGIN.observe(local_analysis["margin"], outcome=outcome)
+    return outcome != "local"
+
+def get_cascade_stats():
+    """
+    Returns cascade counters for this worker and the resulting escalation rate
+    (sum cascade_decisions_total on /metrics over workers for the fleet). Requests
+    escalated because the local model has no prototypes yet are counted
+    separately as "unavailable".
+    """
+    counts = {outcome: int(CASCADE_DECISIONS.value(outcome=outcome)) for outcome in CASCADE_OUTCOMES}
+    total = sum(counts.values())
+    return {
+        **counts,
+        "total": total,
+        "threshold": CASCADE_MARGIN_THRESHOLD,
+        "escalation_rate": round((counts["escalated"] + counts["unavailable"]) / total, 4) if total else 0
+    }
+
+def _cascade_escalate_stage(cached_analysis, local_analysis):
+    if cached_analysis:
+        # None tells the later stages there is nothing to do
+        return None
+    return should_escalate(local_analysis)
+
+async def _cascade_style_stage(escalate, local_analysis, base64_image, image):
+    if escalate is None:
+        return None
+    if not escalate:
+        return local_style_analysis(local_analysis)
+    _require_image(base64_image)
+    return await analyze_with_gpt4o(await _payload(image, "style"))
+
+async def _cascade_attribute_stage(include_attributes, escalate, base64_image, image):
+    if escalate is None or not (escalate or include_attributes):
+        return copy.deepcopy(FALLBACK_ATTRIBUTES)
+    _require_image(base64_image)
+    return await extract_attributes(await _payload(image, "attributes"))
+
+async def _cascade_outfit_stage(escalate, style_analysis, attribute_analysis, base64_image, image):
+    if escalate is None:
+        return []
+    if not escalate:
+        # Local answers get text-only outfit ideas, which are memoized per style
+        return await generate_outfit_combinations(combine_analysis(style_analysis, attribute_analysis))
+    _require_image(base64_image)
+    return await generate_outfit_combinations(combine_analysis(style_analysis, attribute_analysis),
+                                              await _outfit_image(image))
+
+async def _style_stage(cached_analysis, base64_image, image):
+    if cached_analysis:
+        return None
+    _require_image(base64_image)
+    return await analyze_with_gpt4o(await _payload(image, "style"))
+
+async def _attribute_stage(cached_analysis, base64_image, image):
+    if cached_analysis:
+        return None
+    _require_image(base64_image)
+    return await extract_attributes(await _payload(image, "attributes"))
+
+async def _single_pass_stage(cached_analysis, base64_image, image):
+    if cached_analysis:
+        return None
+    _require_image(base64_image)
+    return await analyze_single_pass(await _payload(image, "single_pass"))
+
+async def _outfit_stage(cached_analysis, style_analysis, attribute_analysis, base64_image, image):
+    if cached_analysis:
+        return None
+    _require_image(base64_image)
+    return await generate_outfit_combinations(combine_analysis(style_analysis, attribute_analysis),
+                                              await _outfit_image(image))
+
+def classification_cache_key(base64_image, mode):
+    """
+    Returns the cache key for a preprocessed image.
     
-    # Step 4: Generate outfit combinations based on the item and style
-    outfit_result = generate_outfit_combinations(combined_analysis, base64_image)
+    The key hashes the normalized JPEG produced by preprocess_image, so the
+    same upload maps to the same entry in every worker. The analysis mode is
+    part of the key so the two modes can be compared independently.
+    """
+    digest = hashlib.sha256(base64.b64decode(base64_image)).hexdigest()
+    return f"{mode}:{digest}"
+
+def get_cached_analysis(base64_image, mode):
+    """Returns the cached combined analysis for a preprocessed image, or None."""
+    if classification_cache is None or not base64_image:
+        return None
+    cached = classification_cache.get(classification_cache_key(base64_image, mode))
+    if cached:
+        logging.info(f"Classification cache hit: {cached.get('primary_style')}")
+    return cached
+
+def _is_complete_analysis(style_analysis, attribute_analysis, outfit_result):
+    """
+    True if no stage fell back to a placeholder result, so the analysis is safe to cache.
+    A local cascade answer skips attribute extraction, so it is complete without attributes.
+    """
+    local = isinstance(style_analysis, dict) and style_analysis.get("analysis_source") == "local"
+    return (
+        style_analysis not in (FALLBACK_STYLE_ANALYSIS, ERROR_STYLE_ANALYSIS)
+        and (local or attribute_analysis != FALLBACK_ATTRIBUTES)
+        and bool(outfit_result)
+    )
+
+def assemble_style_info(base64_image, style_analysis, attribute_analysis, outfit_result):
+    """
+    Builds the final classification result from the individual stage results.
+    
+    Args:
+        base64_image: Preprocessed image (None if preprocessing failed)
+        style_analysis: Result of the style analysis stage
+        attribute_analysis: Result of the attribute detection stage
+        outfit_result: Result of the outfit generation stage
+        
+    Returns:
+        Dictionary with comprehensive style analysis
+    """
+    if not base64_image:
+        # Even when there's an error, provide a reasonable fallback style instead of "Unclassified"
+        return copy.deepcopy(FALLBACK_CLASSIFICATION)
+    
+    combined_analysis = combine_analysis(style_analysis, attribute_analysis)
     
     # Add outfit combinations to the final result
     if isinstance(outfit_result, dict) and 'outfits' in outfit_result:
@@ -380,4 +773,144 @@ def classify_fashion_style(image):
     else:
         combined_analysis['outfit_combinations'] = []
     
-    return combined_analysis
\ No newline at end of file
+    return combined_analysis
+
+def resolve_analysis_mode(mode=None):
+    """Returns a valid analysis mode, falling back to the configured default."""
+    mode = (mode or DEFAULT_ANALYSIS_MODE or "multi").lower()
+    if mode not in ANALYSIS_MODES:
+        logging.warning(f"Unknown analysis mode {mode!r}, using multi-call analysis")
+        mode = "multi"
+    return mode
+
+def is_complete_result(result):
+    """
+    True if a classification pipeline result is a real analysis (served from
+    cache, or produced without any stage falling back), so it can be reused.
+    
+    Args:
+        result: PipelineResult from a run of classification_stages()
+    """
+    if result.get("cached_analysis"):
+        return True
+    return bool(result.get("base64_image")) and _is_complete_analysis(
+        result.get("style_analysis"), result.get("attribute_analysis"), result.get("outfit_result")
+    )
+
+def classification_stages(mode=None, known_analysis=None, include_attributes=False):
+    """
+    Returns the pipeline stages of the hybrid classifier.
+    
+    The stages expect an initial "image" value (ImageArtifact) and produce
+    "style_info", the final combined analysis. A hit in the classification
+    cache skips every OpenAI stage. In multi-call mode style
+    analysis and attribute extraction run concurrently and outfit generation
+    waits for both; in single-pass mode one call produces all three. In
+    cascade mode the local classifier answers when it is confident enough
+    and the image is only sent to OpenAI for escalated requests; local
+    answers get text-only outfit ideas. Each OpenAI
+    stage sends the image sized for it by the payload policy, and the
+    payloads are recorded on the image artifact (see payload_report). The
+    OpenAI stages are coroutines, so they hold no outbound thread while
+    waiting for the API.
+    Callers can add their own stages that depend on any of these results.
+    
+    Args:
+        mode: "multi" or "single" (defaults to CLASSIFIER_MODE)
+        known_analysis: Optional analysis already known for this image (e.g. from a
+            near-duplicate upload); when given, it is used like a cache hit
+        include_attributes: In cascade mode, run attribute extraction even when the
+            local classifier answers
+        
+    Returns:
+        List of Stage objects
+    """
+    mode = resolve_analysis_mode(mode)
+    stages = [
+        Stage("base64_image", _preprocess_stage, inputs=("image",),
+              timeout=STAGE_TIMEOUTS["preprocess"]),
+        Stage("cached_analysis", lambda base64_image: known_analysis or get_cached_analysis(base64_image, mode),
+              inputs=("base64_image",), timeout=STAGE_TIMEOUTS["cache"]),
+        Stage("local_features", _local_features_stage, inputs=("image",),
+              timeout=STAGE_TIMEOUTS["local"]),
+        Stage("local_analysis", _local_analysis_stage, inputs=("local_features",),
+              timeout=STAGE_TIMEOUTS["local"]),
+    ]
+    
+    if mode == "single":
+        stages += [
+            Stage("single_pass", _single_pass_stage, inputs=("cached_analysis", "base64_image", "image"),
+                  timeout=STAGE_TIMEOUTS["single_pass"]),
+            Stage("style_analysis", lambda analysis: split_single_pass(analysis)[0], inputs=("single_pass",),
+                  fallback=ERROR_STYLE_ANALYSIS),
+            Stage("attribute_analysis", lambda analysis: split_single_pass(analysis)[1], inputs=("single_pass",),
+                  fallback=FALLBACK_ATTRIBUTES),
+            Stage("outfit_result", lambda analysis: split_single_pass(analysis)[2], inputs=("single_pass",),
+                  fallback=[]),
+        ]
+    elif mode == "cascade":
+        stages += [
+            Stage("escalate", _cascade_escalate_stage, inputs=("cached_analysis", "local_analysis"),
+                  fallback=True),
+            Stage("style_analysis", _cascade_style_stage,
+                  inputs=("escalate", "local_analysis", "base64_image", "image"),
+                  timeout=STAGE_TIMEOUTS["style"], fallback=ERROR_STYLE_ANALYSIS),
+            Stage("attribute_analysis", functools.partial(_cascade_attribute_stage, include_attributes),
+                  inputs=("escalate", "base64_image", "image"),
+                  timeout=STAGE_TIMEOUTS["attributes"], fallback=FALLBACK_ATTRIBUTES),
+            Stage("outfit_result", _cascade_outfit_stage,
+                  inputs=("escalate", "style_analysis", "attribute_analysis", "base64_image", "image"),
+                  timeout=STAGE_TIMEOUTS["outfits"], fallback=[]),
+        ]
+    else:
+        stages += [
+            Stage("style_analysis", _style_stage, inputs=("cached_analysis", "base64_image", "image"),
+                  timeout=STAGE_TIMEOUTS["style"], fallback=ERROR_STYLE_ANALYSIS),
+            Stage("attribute_analysis", _attribute_stage, inputs=("cached_analysis", "base64_image", "image"),
+                  timeout=STAGE_TIMEOUTS["attributes"], fallback=FALLBACK_ATTRIBUTES),
+            Stage("outfit_result", _outfit_stage,
+                  inputs=("cached_analysis", "style_analysis", "attribute_analysis", "base64_image", "image"),
+                  timeout=STAGE_TIMEOUTS["outfits"], fallback=[]),
+        ]
+    
+    def style_info_stage(base64_image, cached_analysis, style_analysis, attribute_analysis, outfit_result,
+                         local_analysis):
+        if cached_analysis:
+            return cached_analysis
+        style_info = dict(assemble_style_info(base64_image, style_analysis, attribute_analysis, outfit_result),
+                          analysis_mode=mode)
+        if base64_image:
+            style_info["analysis_source"] = (style_analysis or {}).get("analysis_source", "gpt")
+        if local_analysis:
+            style_info["local_analysis"] = local_analysis
+        if classification_cache is not None and base64_image and \
+                _is_complete_analysis(style_analysis, attribute_analysis, outfit_result):
+            classification_cache.set(classification_cache_key(base64_image, mode), style_info)
+        return style_info
+    
+    stages.append(
+        Stage("style_info", style_info_stage,
+              inputs=("base64_image", "cached_analysis", "style_analysis", "attribute_analysis", "outfit_result",
+                      "local_analysis"),
+              fallback=dict(FALLBACK_CLASSIFICATION, analysis_mode=mode))
+    )
+    return stages
+
+def classify_fashion_style(image, mode=None):
+    """
+    Main function for classifying fashion style using the hybrid approach.
+    Uses GPT-4o mini across all model functions for cost efficiency.
+    Independent stages run concurrently through the stage pipeline.
+    
+    Args:
+        image: PIL Image object or ImageArtifact
+        mode: "multi", "single" or "cascade" (defaults to CLASSIFIER_MODE)
+        
+    Returns:
+        Dictionary with comprehensive style analysis
+    """
+    # Wrap the image once so every stage shares its decoded and encoded forms
+    if isinstance(image, Image.Image):
+        image = as_artifact(image)
+    result = Pipeline(classification_stages(mode)).run(image=image)
+    return result["style_info"]
@@ -0,0 +1,224 @@
+"""
+Image Artifact for Fashion Style Analyzer
+
+This module wraps one uploaded image for the lifetime of a request. The
+upload is decoded once, EXIF orientation and color mode are normalized once,
+and every derivative the request needs (the API-sized JPEG, its base64
+string, the bytes stored in B2) is produced lazily the first time it is asked
+for and then reused by every other consumer.
+"""
+
+import io
+import base64
+import threading
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# Default size of the image sent to the vision API
+API_MAX_SIZE = 1024
+
+# Background trimming: a pixel is foreground when it differs from the border
+# color by more than this (0-255, per channel), and a crop is only used when
+# it removes at least MIN_CROP_TRIM of the image area
+FOREGROUND_THRESHOLD = 30
+CROP_PADDING = 0.05
+MIN_CROP_TRIM = 0.1
+
+
+def foreground_box(image, threshold=FOREGROUND_THRESHOLD, padding=CROP_PADDING):
+    """
+    Find the bounding box of the subject on a plain background.
+
+    The background color is the median of the border pixels of a thumbnail;
+    busy backgrounds (where the border itself varies) are left uncropped.
+
+    Args:
+        image: RGB PIL Image object
+        threshold: Per-channel difference from the background that counts as foreground
+        padding: Margin added around the subject, as a fraction of its size
+
+    Returns:
+        (left, top, right, bottom) box in image coordinates; the full image when
+        there is nothing worth trimming
+    """
+    width, height = image.size
+    full = (0, 0, width, height)
+
+    thumb = image.copy()
+    thumb.thumbnail((128, 128))
+    pixels = np.asarray(thumb, dtype=np.int16)
+    border = np.concatenate([pixels[0], pixels[-1], pixels[:, 0], pixels[:, -1]])
+    background = np.median(border, axis=0)
+    if (np.abs(border - background).max(axis=1) > threshold).mean() > 0.2:
+        return full
+
+    mask = np.abs(pixels - background).max(axis=2) > threshold
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if not rows.size:
+        return full
+
+    scale_x, scale_y = width / pixels.shape[1], height / pixels.shape[0]
+    pad_x = (cols[-1] - cols[0] + 1) * scale_x * padding
+    pad_y = (rows[-1] - rows[0] + 1) * scale_y * padding
+    box = (
+        max(0, int(cols[0] * scale_x - pad_x)),
+        max(0, int(rows[0] * scale_y - pad_y)),
+        min(width, int((cols[-1] + 1) * scale_x + pad_x)),
+        min(height, int((rows[-1] + 1) * scale_y + pad_y)),
+    )
+    if (box[2] - box[0]) * (box[3] - box[1]) > (1 - MIN_CROP_TRIM) * width * height:
+        return full
+    return box
+
+
+class ImageArtifact:
+    """A decoded, normalized image with memoized derivatives. Safe to share between threads."""
+
+    def __init__(self, image):
+        """
+        Wrap an already opened image.
+
+        Args:
+            image: PIL Image object
+        """
+        if not isinstance(image, Image.Image):
+            raise ValueError("Invalid image format")
+        self.source_format = image.format
+        self._raw = image
+        self._image = None
+        self._derivatives = {}
+        self._lock = threading.RLock()
+        self._key_locks = {}
+
+        # API payloads built for this image, by pipeline stage (see payload_policy)
+        self.payloads = {}
+
+    def __getstate__(self):
+        """
+        Pickle only the encoded derivatives and payloads, not the pixels, so a
+        prepared artifact can be sent cheaply from a worker process.
+        """
+        return {
+            'source_format': self.source_format,
+            'size': self.size,
+            'derivatives': {key: value for key, value in self._derivatives.items()
+                            if not isinstance(value, Image.Image)},
+            'payloads': dict(self.payloads),
+        }
+
+    def __setstate__(self, state):
+        self.source_format = state['source_format']
+        self._size = state['size']
+        self._raw = None
+        self._image = None
+        self._derivatives = state['derivatives']
+        self._lock = threading.RLock()
+        self._key_locks = {}
+        self.payloads = state['payloads']
+
+    @classmethod
+    def from_file(cls, file):
+        """
+        Decode an uploaded file (path or file-like object).
+
+        Args:
+            file: Path or file-like object containing an image
+
+        Returns:
+            ImageArtifact
+        """
+        image = Image.open(file)
+        image.load()
+        return cls(image)
+
+    @property
+    def image(self):
+        """The full-resolution image, EXIF-rotated and converted to RGB."""
+        if self._image is None:
+            with self._lock:
+                if self._image is None:
+                    if self._raw is None:
+                        raise ValueError("Image pixels are not available in an unpickled artifact")
+                    image = ImageOps.exif_transpose(self._raw)
+                    if image.mode != 'RGB':
+                        image = image.convert('RGB')
+                    self._image = image
+                    self._raw = None
+        return self._image
+
+    @property
+    def size(self):
+        if self._image is None and self._raw is None:
+            return self._size
+        return self.image.size
+
+    def _memoize(self, key, build):
+        """Build a derivative once, even when several threads ask for it at the same time."""
+        value = self._derivatives.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            value = self._derivatives.get(key)
+            if value is None:
+                value = build()
+                self._derivatives[key] = value
+        return value
+
+    def foreground_box(self):
+        """Bounding box of the subject (see foreground_box)."""
+        return self._memoize('foreground_box', lambda: foreground_box(self.image))
+
+    def resized(self, max_size=API_MAX_SIZE, crop=False):
+        """
+        The image scaled down so its longest side is at most max_size.
+
+        Args:
+            max_size: Longest side in pixels
+            crop: Trim plain background around the subject first
+        """
+        def build():
+            image = self.image
+            if crop:
+                box = self.foreground_box()
+                if box != (0, 0) + image.size:
+                    image = image.crop(box)
+            if max(image.size) <= max_size:
+                return image
+            ratio = max_size / max(image.size)
+            new_size = tuple([int(s * ratio) for s in image.size])
+            return image.resize(new_size, Image.LANCZOS)
+        return self._memoize(('resized', max_size, crop), build)
+
+    def jpeg_bytes(self, max_size=API_MAX_SIZE, quality=75, crop=False):
+        """JPEG encoding of the resized image."""
+        def build():
+            buffered = io.BytesIO()
+            self.resized(max_size, crop).save(buffered, format="JPEG", quality=quality)
+            return buffered.getvalue()
+        return self._memoize(('jpeg', max_size, quality, crop), build)
+
+    def base64(self, max_size=API_MAX_SIZE, quality=75, crop=False):
+        """Base64 string of jpeg_bytes, for data URLs in API calls."""
+        return self._memoize(
+            ('base64', max_size, quality, crop),
+            lambda: base64.b64encode(self.jpeg_bytes(max_size, quality, crop)).decode('utf-8')
+        )
+
+    def storage_bytes(self, image_format='JPEG'):
+        """Full-resolution encoding used for cloud storage."""
+        def build():
+            buffered = io.BytesIO()
+            self.image.save(buffered, format=image_format)
+            return buffered.getvalue()
+        return self._memoize(('storage', image_format.upper()), build)
+
+
+def as_artifact(image):
+    """Return an ImageArtifact for a PIL image, or the artifact itself."""
+    if isinstance(image, ImageArtifact):
+        return image
+    return ImageArtifact(image)
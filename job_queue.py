@@ -0,0 +1,288 @@
+"""
+Job Queue for Fashion Style Analyzer
+
+This module provides a durable work queue stored in a local SQLite database,
+so the web tier can accept an upload, hand it to separate worker processes
+(see worker.py) and answer right away. No external broker is needed; the web
+and worker processes only have to share the database file.
+
+Workers claim a job under a lease. A job whose worker dies is claimed again
+once its lease expires, up to JOB_MAX_ATTEMPTS times. Finished jobs keep
+their result for JOB_RETENTION seconds so clients can poll for it.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from collections import namedtuple
+
+from disk_cache import CACHE_DIR
+
+# Configuration
+JOB_QUEUE_DB_PATH = os.environ.get('JOB_QUEUE_DB_PATH', os.path.join(CACHE_DIR, 'jobs.db'))
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '300'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETENTION = int(os.environ.get('JOB_RETENTION', '86400'))
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    payload BLOB,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+"""
+
+# A claimed job: params is a dictionary, payload the raw bytes given to enqueue
+Job = namedtuple('Job', ['id', 'kind', 'params', 'payload', 'attempts'])
+
+# Job states
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+class JobQueue:
+    """A durable FIFO job queue shared by every process on a host."""
+
+    def __init__(self, path=None, lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS):
+        """
+        Open (and create if needed) the job queue.
+
+        Args:
+            path: SQLite database path (defaults to JOB_QUEUE_DB_PATH)
+            lease_seconds: Seconds a worker owns a claimed job before it may be claimed again
+            max_attempts: Claims allowed per job before it is marked failed
+        """
+        self.path = path or JOB_QUEUE_DB_PATH
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self):
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def enqueue(self, kind, params=None, payload=None):
+        """
+        Add a job to the queue.
+
+        Args:
+            kind: Job type, e.g. "predict"
+            params: JSON-serializable dictionary of job parameters
+            payload: Optional bytes (e.g. the uploaded image)
+
+        Returns:
+            The new job's id
+        """
+        job_id = str(uuid.uuid4())
+        self._connection().execute(
+            "INSERT INTO jobs (id, kind, status, params, payload, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, QUEUED, json.dumps(params or {}), payload, time.time())
+        )
+        logger.debug(f"Enqueued {kind} job {job_id}")
+        return job_id
+
+    def claim(self, worker):
+        """
+        Claim the oldest queued job, or a running job whose lease expired.
+
+        Args:
+            worker: Name of the claiming worker
+
+        Returns:
+            Job, or None if there is nothing to do
+        """
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Give up on jobs whose workers keep dying
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, payload = NULL, finished_at = ? "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, 'Job abandoned by its worker too many times', now, RUNNING, now, self.max_attempts)
+            )
+            row = conn.execute(
+                "SELECT id, kind, params, payload, attempts FROM jobs "
+                "WHERE status = ? OR (status = ? AND lease_expires < ?) ORDER BY created_at LIMIT 1",
+                (QUEUED, RUNNING, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, lease_expires = ?, "
+                "started_at = ? WHERE id = ?",
+                (RUNNING, worker, now + self.lease_seconds, now, row[0])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return Job(row[0], row[1], json.loads(row[2]), row[3], row[4] + 1)
+
+    def complete(self, job_id, worker, result):
+        """
+        Store a job's JSON-serializable result and drop its payload.
+
+        Args:
+            job_id: Job id
+            worker: Name of the worker that claimed the job
+            result: Result to store
+
+        Returns:
+            False if the worker no longer holds the job (its lease expired and
+            another worker claimed it), in which case nothing is stored
+        """
+        stored = self._connection().execute(
+            "UPDATE jobs SET status = ?, result = ?, payload = NULL, lease_expires = NULL, finished_at = ? "
+            "WHERE id = ? AND worker = ? AND status = ?",
+            (DONE, json.dumps(result, default=str), time.time(), job_id, worker, RUNNING)
+        ).rowcount > 0
+        if not stored:
+            logger.warning(f"{worker} lost its lease on job {job_id}; discarding its result")
+        return stored
+
+    def fail(self, job_id, worker, error, retry=False):
+        """
+        Record a failed attempt.
+
+        Args:
+            job_id: Job id
+            worker: Name of the worker that claimed the job
+            error: Error message shown to the client
+            retry: Put the job back in the queue if it has attempts left
+
+        Returns:
+            False if the worker no longer holds the job, in which case nothing is recorded
+        """
+        conn = self._connection()
+        if retry and conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, worker = NULL, lease_expires = NULL "
+            "WHERE id = ? AND worker = ? AND status = ? AND attempts < ?",
+            (QUEUED, error, job_id, worker, RUNNING, self.max_attempts)
+        ).rowcount:
+            return True
+        recorded = conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, payload = NULL, lease_expires = NULL, finished_at = ? "
+            "WHERE id = ? AND worker = ? AND status = ?",
+            (FAILED, error, time.time(), job_id, worker, RUNNING)
+        ).rowcount > 0
+        if not recorded:
+            logger.warning(f"{worker} lost its lease on job {job_id}; discarding its failure")
+        return recorded
+
+    def get(self, job_id):
+        """
+        Look up a job's state.
+
+        Returns:
+            Dictionary with job_id, status, attempts, timestamps and the result or
+            error once finished, or None if the job does not exist
+        """
+        row = self._connection().execute(
+            "SELECT id, kind, status, result, error, attempts, created_at, started_at, finished_at "
+            "FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        job = {
+            'job_id': row[0],
+            'kind': row[1],
+            'status': row[2],
+            'attempts': row[5],
+            'created_at': row[6],
+            'started_at': row[7],
+            'finished_at': row[8]
+        }
+        if row[2] == DONE:
+            job['result'] = json.loads(row[3])
+        elif row[2] == FAILED:
+            job['error'] = row[4]
+        elif row[2] == QUEUED:
+            job['position'] = self._connection().execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < ?", (QUEUED, row[6])
+            ).fetchone()[0]
+        return job
+
+    def wait(self, job_id, timeout, poll_interval=0.5):
+        """
+        Wait until a job finishes or the timeout passes.
+
+        Returns:
+            The job's state as returned by get()
+        """
+        deadline = time.monotonic() + timeout
+        job = self.get(job_id)
+        while job is not None and job['status'] in (QUEUED, RUNNING) and time.monotonic() < deadline:
+            time.sleep(min(poll_interval, max(0, deadline - time.monotonic())))
+            job = self.get(job_id)
+        return job
+
+    def purge(self, older_than=JOB_RETENTION):
+        """
+        Delete finished jobs older than the given age.
+
+        Returns:
+            Number of jobs deleted
+        """
+        return self._connection().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (DONE, FAILED, time.time() - older_than)
+        ).rowcount
+
+    def stats(self):
+        """
+        Returns the number of jobs in each state and the age of the oldest queued job.
+        """
+        conn = self._connection()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        oldest = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+        return {
+            'queued': counts.get(QUEUED, 0),
+            'running': counts.get(RUNNING, 0),
+            'done': counts.get(DONE, 0),
+            'failed': counts.get(FAILED, 0),
+            'oldest_queued_seconds': round(time.time() - oldest, 1) if oldest else 0
+        }
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Returns the process-wide JobQueue, opening it on first use."""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue()
+    return _job_queue
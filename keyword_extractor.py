@@ -0,0 +1,302 @@
+"""
+Keyword Extractor for Fashion Style Analyzer
+
+This module turns a user's free-text comment into eBay search keywords
+without an LLM call. Colors, materials, garment types, fits, occasions,
+sizes and price hints are matched against the vocabularies below (edit them
+to tune the search). Negated terms ("no leather", "not black") become
+exclusions.
+
+Only long comments the vocabularies barely cover fall back to gpt-4o-mini.
+Results are cached by normalized comment in a DiskCache shared by all
+workers, so a repeated comment costs nothing.
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+
+import llm_client
+from disk_cache import DiskCache
+
+# Configuration
+KEYWORD_LLM_FALLBACK = os.environ.get('KEYWORD_LLM_FALLBACK', 'true').lower() == 'true'
+KEYWORD_LLM_MIN_WORDS = int(os.environ.get('KEYWORD_LLM_MIN_WORDS', '25'))
+KEYWORD_LLM_MIN_TERMS = int(os.environ.get('KEYWORD_LLM_MIN_TERMS', '2'))
+KEYWORD_CACHE_ENABLED = os.environ.get('KEYWORD_CACHE_ENABLED', 'true').lower() == 'true'
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Vocabularies, by keyword category. Multi-word terms are matched as phrases;
+# plural forms ("jeans", "boots") are matched by the trailing-s rule.
+LEXICONS = {
+    "colors": [
+        "black", "white", "grey", "gray", "charcoal", "navy", "blue", "light blue", "teal", "turquoise",
+        "green", "olive", "sage", "emerald", "forest green", "khaki", "yellow", "mustard", "gold",
+        "orange", "rust", "red", "burgundy", "maroon", "wine", "pink", "blush", "hot pink", "purple",
+        "lavender", "lilac", "plum", "brown", "chocolate", "tan", "camel", "beige", "cream", "ivory",
+        "off white", "silver", "neon", "pastel", "neutral", "multicolor"
+    ],
+    "materials": [
+        "cotton", "organic cotton", "linen", "silk", "satin", "wool", "merino", "cashmere", "alpaca",
+        "mohair", "denim", "leather", "faux leather", "vegan leather", "suede", "faux fur", "velvet",
+        "corduroy", "tweed", "flannel", "fleece", "sherpa", "chiffon", "lace", "mesh", "tulle", "knit",
+        "crochet", "jersey", "polyester", "nylon", "spandex", "rayon", "viscose", "modal", "bamboo",
+        "canvas", "sequin", "patent leather", "waxed cotton", "gore-tex"
+    ],
+    "garments": [
+        "t-shirt", "tee", "shirt", "button down", "blouse", "tank top", "crop top", "camisole", "polo",
+        "sweater", "cardigan", "turtleneck", "hoodie", "sweatshirt", "vest", "blazer", "jacket",
+        "bomber jacket", "denim jacket", "leather jacket", "coat", "trench coat", "overcoat", "parka",
+        "puffer", "raincoat", "dress", "maxi dress", "midi dress", "mini dress", "slip dress", "skirt",
+        "maxi skirt", "midi skirt", "mini skirt", "jeans", "trousers", "pants", "chinos", "cargo pants",
+        "joggers", "leggings", "shorts", "jumpsuit", "romper", "overalls", "suit", "tuxedo", "kimono",
+        "boots", "ankle boots", "chelsea boots", "combat boots", "loafers", "oxfords", "sneakers",
+        "trainers", "heels", "pumps", "flats", "sandals", "mules", "clogs", "bag", "tote", "handbag",
+        "backpack", "crossbody bag", "belt", "scarf", "hat", "beanie", "beret", "cap", "gloves",
+        "sunglasses", "necklace", "earrings", "bracelet", "ring", "watch", "tie"
+    ],
+    "fits": [
+        "oversized", "fitted", "slim fit", "skinny", "straight leg", "wide leg", "bootcut", "flared",
+        "relaxed fit", "loose", "baggy", "cropped", "high waisted", "high rise", "low rise", "mid rise",
+        "a-line", "bodycon", "wrap", "pleated", "tailored", "double breasted", "longline", "sleeveless",
+        "long sleeve", "short sleeve", "v-neck", "crew neck", "off shoulder", "vintage", "retro", "y2k"
+    ],
+    "occasions": [
+        "wedding", "wedding guest", "office", "work", "business", "interview", "party", "cocktail",
+        "date night", "brunch", "beach", "vacation", "resort", "festival", "concert", "gym", "workout",
+        "hiking", "travel", "formal", "black tie", "prom", "graduation", "casual", "everyday", "winter",
+        "summer", "fall", "spring", "rainy"
+    ],
+}
+
+# Words that negate the term that follows within a couple of words
+NEGATIONS = ("no", "not", "without", "avoid", "except", "hate", "dislike", "don't want", "dont want",
+             "never", "anything but")
+
+# Price words mapped to (min price, max price) in USD
+PRICE_TIERS = {
+    "cheap": (None, 40.0), "budget": (None, 40.0), "inexpensive": (None, 40.0),
+    "affordable": (None, 60.0), "bargain": (None, 40.0),
+    "mid range": (40.0, 150.0), "mid-range": (40.0, 150.0),
+    "premium": (100.0, None), "luxury": (150.0, None), "designer": (150.0, None),
+    "high end": (150.0, None), "high-end": (150.0, None),
+}
+
+_NUMBER = r"\$?\s?(\d+(?:\.\d{1,2})?)\s?(?:\$|usd|dollars|bucks)?"
+PRICE_PATTERNS = [
+    (re.compile(r"(?:between|from)\s+" + _NUMBER + r"\s+(?:and|to|-)\s+" + _NUMBER), "range"),
+    (re.compile(r"\$\s?(\d+(?:\.\d{1,2})?)\s?(?:-|to)\s?\$?\s?(\d+(?:\.\d{1,2})?)"), "range"),
+    (re.compile(r"(?:under|below|less than|max(?:imum)?|at most|up to|no more than|cheaper than)\s+" + _NUMBER), "max"),
+    (re.compile(r"(?:over|above|more than|at least|min(?:imum)?)\s+" + _NUMBER), "min"),
+]
+
+SIZE_PATTERNS = [
+    re.compile(r"\b(xxs|xs|xl|xxl|xxxl|[2-5]xl)\b"),
+    re.compile(r"\b(size\s+(?:xx?s|s|m|l|xx?l|small|medium|large|\d{1,2}(?:\.5)?))\b"),
+    re.compile(r"\b(\d{2}\s?x\s?\d{2})\b"),
+    re.compile(r"\b(w\d{2}\s?l\d{2})\b"),
+    re.compile(r"\b(petite|plus size|tall|maternity|big and tall)\b"),
+]
+
+# Categories in the order their terms appear in a search query
+QUERY_ORDER = ("garments", "colors", "materials", "fits", "occasions", "sizes", "terms")
+
+# eBay keyword queries are limited to 350 characters
+MAX_QUERY_LENGTH = 350
+
+# Changing a vocabulary invalidates cached extractions
+_LEXICON_VERSION = hashlib.sha1(
+    json.dumps([LEXICONS, NEGATIONS, PRICE_TIERS], sort_keys=True).encode()
+).hexdigest()[:8]
+
+
+def _term_pattern(term):
+    escaped = re.escape(term).replace(r"\ ", r"[\s-]+")
+    return re.compile(rf"(?<![\w-]){escaped}(?:e?s)?(?![\w-])")
+
+
+# Longest terms first, so "faux leather" is claimed before "leather"
+_TERM_PATTERNS = sorted(
+    ((category, term, _term_pattern(term)) for category, terms in LEXICONS.items() for term in terms),
+    key=lambda entry: -len(entry[1])
+)
+_NEGATION_PATTERN = re.compile(
+    r"(?:^|\W)(?:" + "|".join(re.escape(word) for word in NEGATIONS) + r")(?:\s+\w+)?\s*$"
+)
+
+keyword_cache = DiskCache(
+    "keywords",
+    max_entries=int(os.environ.get('KEYWORD_CACHE_MAX_ENTRIES', '20000')),
+    ttl=int(os.environ.get('KEYWORD_CACHE_TTL', str(30 * 86400)))
+) if KEYWORD_CACHE_ENABLED else None
+
+
+def normalize_comment(comment):
+    """Lowercase a comment and collapse punctuation and whitespace."""
+    text = comment.lower().replace("’", "'")
+    text = re.sub(r"[^\w\s$.'-]", " ", text)
+    return " ".join(text.split())
+
+
+def _empty_keywords(source):
+    keywords = {category: [] for category in QUERY_ORDER}
+    keywords.update({"exclude": [], "min_price": None, "max_price": None, "source": source})
+    return keywords
+
+
+def _extract_prices(text, keywords):
+    for pattern, kind in PRICE_PATTERNS:
+        match = pattern.search(text)
+        if not match:
+            continue
+        if kind == "range":
+            low, high = sorted(float(value) for value in match.groups())
+            keywords["min_price"], keywords["max_price"] = low, high
+            return
+        value = float(match.group(1))
+        if kind == "max" and keywords["max_price"] is None:
+            keywords["max_price"] = value
+        elif kind == "min" and keywords["min_price"] is None:
+            keywords["min_price"] = value
+
+    if keywords["min_price"] is None and keywords["max_price"] is None:
+        for word, (low, high) in PRICE_TIERS.items():
+            if re.search(rf"(?<![\w-]){re.escape(word)}(?![\w-])", text):
+                keywords["min_price"], keywords["max_price"] = low, high
+                return
+
+
+def extract_with_lexicon(comment):
+    """
+    Extract keywords from a comment using the vocabularies only.
+
+    Args:
+        comment: Free-text user comment
+
+    Returns:
+        Keyword dictionary (see extract_keywords)
+    """
+    text = normalize_comment(comment)
+    keywords = _empty_keywords("lexicon")
+    claimed = []
+
+    for category, term, pattern in _TERM_PATTERNS:
+        for match in pattern.finditer(text):
+            span = match.span()
+            if any(start < span[1] and span[0] < end for start, end in claimed):
+                continue
+            claimed.append(span)
+            target = "exclude" if _NEGATION_PATTERN.search(text[:span[0]]) else category
+            if term not in keywords[target]:
+                keywords[target].append(term)
+
+    for pattern in SIZE_PATTERNS:
+        for match in pattern.finditer(text):
+            size = " ".join(match.group(1).split())
+            if size not in keywords["sizes"]:
+                keywords["sizes"].append(size)
+
+    _extract_prices(text, keywords)
+    return keywords
+
+
+def term_count(keywords):
+    """Number of search terms (and price bounds) found."""
+    count = sum(len(keywords.get(category, [])) for category in QUERY_ORDER)
+    return count + (keywords.get("min_price") is not None) + (keywords.get("max_price") is not None)
+
+
+def _extract_with_llm(comment, client):
+    response = llm_client.chat_completion(client, "product_keywords",
+        model="gpt-4o-mini",  # Using GPT-4o mini for cost efficiency as lengthy outputs aren't necessary
+        messages=[
+            {"role": "system", "content": """You are a fashion search query expert.
+            Extract relevant fashion search keywords from user comments.
+            Focus on extracting:
+            - Specific item types (jeans, dresses, etc.)
+            - Size preferences or measurements
+            - Color preferences
+            - Material preferences
+            - Occasion needs
+            - Brand preferences
+            - Price preferences
+            - Specific style elements
+            Return only the most relevant keywords as a comma-separated list."""},
+            {"role": "user", "content": f"Extract fashion search keywords from this comment: {comment}"}
+        ],
+        max_tokens=100
+    )
+    content = response.choices[0].message.content or ""
+    return [term.strip().lower() for term in content.split(",") if term.strip()][:8]
+
+
+def extract_keywords(comment, client=None):
+    """
+    Extract eBay search keywords from a user comment.
+
+    The vocabularies handle most comments; a long comment they barely cover
+    is sent to gpt-4o-mini (if KEYWORD_LLM_FALLBACK is set and a client is
+    available). Results are cached by normalized comment.
+
+    Args:
+        comment: Free-text user comment
+        client: OpenAI client for the fallback (defaults to the shared client)
+
+    Returns:
+        Dictionary with garments, colors, materials, fits, occasions, sizes and
+        terms (free-form LLM keywords) lists, exclude (negated terms), min_price
+        and max_price (USD or None) and source ("lexicon", "llm" or "empty")
+    """
+    text = normalize_comment(comment or "")
+    if not text:
+        return _empty_keywords("empty")
+
+    cache_key = f"{_LEXICON_VERSION}:{text}"
+    if keyword_cache is not None:
+        cached = keyword_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    keywords = extract_with_lexicon(text)
+
+    client = client if client is not None else llm_client.shared_client
+    if KEYWORD_LLM_FALLBACK and client and len(text.split()) >= KEYWORD_LLM_MIN_WORDS \
+            and term_count(keywords) < KEYWORD_LLM_MIN_TERMS:
+        try:
+            keywords["terms"] = [term for term in _extract_with_llm(comment, client)
+                                 if term not in keywords["exclude"]]
+            keywords["source"] = "llm"
+        except Exception as e:
+            # Keep the lexicon result (uncached, so a later request can retry)
+            logger.error(f"Error extracting keywords with the LLM: {e}")
+            return keywords
+
+    logger.debug(f"Extracted keywords ({keywords['source']}): {keywords}")
+    if keyword_cache is not None:
+        keyword_cache.set(cache_key, keywords)
+    return keywords
+
+
+def keywords_query(keywords):
+    """
+    Returns the search terms of extracted keywords as an eBay keyword string,
+    with negated terms as exclusions (e.g. "blazer navy wool -leather").
+    """
+    terms = []
+    for category in QUERY_ORDER:
+        for term in keywords.get(category, []):
+            if term not in terms:
+                terms.append(term)
+    excluded = [f'-"{term}"' if " " in term else f"-{term}" for term in keywords.get("exclude", [])]
+
+    query = ""
+    for part in terms + excluded:
+        candidate = f"{query} {part}".strip()
+        if len(candidate) > MAX_QUERY_LENGTH:
+            break
+        query = candidate
+    return query
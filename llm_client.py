@@ -0,0 +1,375 @@
+"""
+LLM Client for Fashion Style Analyzer
+
+This module owns the process-wide OpenAI clients used by the app, the hybrid
+classifier and the batch runner. Clients are built lazily on first use with
+a tunable httpx connection pool (keep-alive, and HTTP/2 when the `h2` package
+is installed), so concurrent calls share a few warm connections instead of
+each opening its own.
+
+The classifier's OpenAI stages use the AsyncOpenAI client through
+`chat_completion_async`. They run as coroutines on the outbound executor's
+event loop (see outbound.py), so many LLM calls can be in flight from one
+worker without holding a thread each.
+
+API key validation is lazy: nothing touches the network at import time, and
+`validate_key` caches its outcome for OPENAI_KEY_VALIDATION_TTL seconds.
+Even the openai package is only imported when the first client is built;
+`shared_client` stands in for the client until then.
+
+Every chat completion goes through `chat_completion`, which records the
+model, token usage, estimated cost, latency, request size and retries of
+each call per stage in the /metrics registry.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+import importlib.util
+
+import httpx
+from dotenv import load_dotenv
+
+import outbound
+from metrics import registry, BYTES_BUCKETS
+from rate_limiter import get_rate_limiter, RateLimited, INTERACTIVE
+
+# Load environment variables
+load_dotenv()
+
+# Connection pool configuration
+OPENAI_MAX_CONNECTIONS = int(os.environ.get('OPENAI_MAX_CONNECTIONS', '100'))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('OPENAI_MAX_KEEPALIVE_CONNECTIONS', '20'))
+OPENAI_KEEPALIVE_EXPIRY = float(os.environ.get('OPENAI_KEEPALIVE_EXPIRY', '30'))
+OPENAI_TIMEOUT = float(os.environ.get('OPENAI_TIMEOUT', '60'))
+OPENAI_HTTP2 = os.environ.get('OPENAI_HTTP2', 'true').lower() == 'true' and \
+    importlib.util.find_spec('h2') is not None
+OPENAI_KEY_VALIDATION_TTL = int(os.environ.get('OPENAI_KEY_VALIDATION_TTL', '3600'))
+# Longest wait (seconds) for the shared request budget before a call fails
+OPENAI_RATE_LIMIT_WAIT = float(os.environ.get('OPENAI_RATE_LIMIT_WAIT', '10'))
+
+# Price per million tokens as (prompt, completion) in USD, for cost accounting
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Per-stage accounting of chat completion calls
+LLM_REQUESTS = registry.counter(
+    'openai_requests_total', 'OpenAI chat completion calls', ('stage', 'model', 'status'))
+LLM_TOKENS = registry.counter(
+    'openai_tokens_total', 'Tokens used by OpenAI chat completions', ('stage', 'model', 'type'))
+LLM_COST = registry.counter(
+    'openai_cost_usd_total', 'Estimated cost of OpenAI chat completions in USD', ('stage', 'model'))
+LLM_RETRIES = registry.counter(
+    'openai_retries_total', 'Retries made by the OpenAI client', ('stage', 'model'))
+LLM_LATENCY = registry.histogram(
+    'openai_request_duration_seconds', 'Wall time of OpenAI chat completions, retries included',
+    ('stage', 'model'))
+LLM_REQUEST_BYTES = registry.histogram(
+    'openai_request_bytes', 'Size of OpenAI chat completion request bodies', ('stage',), BYTES_BUCKETS)
+LLM_PROMPT_TOKENS = registry.histogram(
+    'openai_prompt_tokens', 'Prompt tokens per OpenAI chat completion', ('stage', 'model'),
+    (250, 500, 1000, 2500, 5000, 10000, 20000, 40000))
+
+_lock = threading.Lock()
+_client = None
+_async_client = None
+
+# Cached outcome of validate_key: {"valid": bool, "error": str or None, "checked_at": float}
+_key_status = None
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+    )
+
+
+def api_key():
+    """Returns the configured OpenAI API key, or None."""
+    return os.environ.get('OPENAI_API_KEY') or None
+
+
+def get_client():
+    """
+    Returns the shared synchronous OpenAI client, creating it on first use.
+
+    Returns:
+        OpenAI client, or None if OPENAI_API_KEY is not set
+    """
+    global _client
+    if _client is not None:
+        return _client
+
+    with _lock:
+        if _client is None:
+            key = api_key()
+            if not key:
+                logger.warning("OPENAI_API_KEY is not set. AI-based style prediction will be unavailable.")
+                return None
+            from openai import OpenAI
+            _client = OpenAI(
+                api_key=key,
+                timeout=OPENAI_TIMEOUT,
+                http_client=httpx.Client(limits=_limits(), http2=OPENAI_HTTP2, timeout=OPENAI_TIMEOUT,
+                                         follow_redirects=True)
+            )
+            logger.info(f"Created OpenAI client (pool of {OPENAI_MAX_CONNECTIONS}, http2={OPENAI_HTTP2})")
+    return _client
+
+
+class _SharedClient:
+    """
+    Proxy for the shared synchronous client. It is truthy when a key is
+    configured and builds the client on first attribute access, so modules
+    can hold a reference at import time without importing openai.
+    """
+
+    def __bool__(self):
+        return api_key() is not None
+
+    def __getattr__(self, name):
+        client = get_client()
+        if client is None:
+            raise AttributeError(f"OpenAI client not available (OPENAI_API_KEY is not set): {name}")
+        return getattr(client, name)
+
+
+shared_client = _SharedClient()
+
+
+def get_async_client():
+    """
+    Returns the shared AsyncOpenAI client, creating it on first use. Its pool
+    belongs to the outbound event loop, so only await it from coroutine tasks
+    running there (pipeline stages written as coroutine functions).
+
+    Returns:
+        AsyncOpenAI client, or None if OPENAI_API_KEY is not set
+    """
+    global _async_client
+    if _async_client is not None:
+        return _async_client
+
+    with _lock:
+        if _async_client is None:
+            key = api_key()
+            if not key:
+                return None
+            from openai import AsyncOpenAI
+            _async_client = AsyncOpenAI(
+                api_key=key,
+                timeout=OPENAI_TIMEOUT,
+                http_client=httpx.AsyncClient(limits=_limits(), http2=OPENAI_HTTP2, timeout=OPENAI_TIMEOUT,
+                                              follow_redirects=True)
+            )
+            logger.info(f"Created async OpenAI client (pool of {OPENAI_MAX_CONNECTIONS}, http2={OPENAI_HTTP2})")
+    return _async_client
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Returns the estimated USD cost of a call, or 0 for models without a known price."""
+    # Dated snapshots (e.g. gpt-4o-mini-2024-07-18) bill like their base model;
+    # the longest matching name wins so gpt-4o-mini is not priced as gpt-4o
+    for name in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model == name or model.startswith(name + '-'):
+            prompt_price, completion_price = MODEL_PRICES[name]
+            return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+    return 0.0
+
+
+def _request_bytes(raw, kwargs):
+    try:
+        return len(raw.http_request.content)
+    except Exception:
+        return len(json.dumps(kwargs.get('messages', []), default=str))
+
+
+def _call_timeout(kwargs):
+    """Inside an outbound task, give up on the request when the task's deadline passes."""
+    time_left = outbound.remaining()
+    if time_left is not None and 'timeout' not in kwargs:
+        kwargs['timeout'] = max(1.0, min(OPENAI_TIMEOUT, time_left))
+
+
+def _record_error(limiter, stage, model, error, elapsed):
+    LLM_REQUESTS.inc(stage=stage, model=model, status='error')
+    LLM_LATENCY.observe(elapsed, stage=stage, model=model)
+    if getattr(error, 'status_code', None) == 429:
+        # Out of quota (after the client's own retries): slow every process down
+        limiter.penalize('openai')
+
+
+def _record_success(stage, model, raw, response, kwargs, elapsed):
+    retries = getattr(raw, 'retries_taken', 0) or 0
+    request_bytes = _request_bytes(raw, kwargs)
+    usage = getattr(response, 'usage', None)
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+    cost = estimate_cost(getattr(response, 'model', None) or model, prompt_tokens, completion_tokens)
+
+    LLM_REQUESTS.inc(stage=stage, model=model, status='ok')
+    LLM_TOKENS.inc(prompt_tokens, stage=stage, model=model, type='prompt')
+    LLM_TOKENS.inc(completion_tokens, stage=stage, model=model, type='completion')
+    LLM_COST.inc(cost, stage=stage, model=model)
+    LLM_LATENCY.observe(elapsed, stage=stage, model=model)
+    LLM_REQUEST_BYTES.observe(request_bytes, stage=stage)
+    LLM_PROMPT_TOKENS.observe(prompt_tokens, stage=stage, model=model)
+    if retries:
+        LLM_RETRIES.inc(retries, stage=stage, model=model)
+
+    logger.debug(f"OpenAI {stage}: {model}, {prompt_tokens}+{completion_tokens} tokens, "
+                 f"${cost:.5f}, {elapsed:.2f}s, {request_bytes} bytes, {retries} retries")
+
+
+def chat_completion(client, stage, priority=INTERACTIVE, **kwargs):
+    """
+    Call client.chat.completions.create and record the call in the metrics registry.
+
+    Args:
+        client: OpenAI client (or a wrapper exposing chat.completions.create)
+        stage: Name of the calling stage, used as the metrics label
+        priority: Rate limiter priority class of the call
+        **kwargs: Arguments for chat.completions.create (the timeout defaults to the
+            time left before the calling outbound task's deadline)
+
+    Returns:
+        The chat completion response
+
+    Raises:
+        RateLimited: If the shared request budget stayed empty for OPENAI_RATE_LIMIT_WAIT
+    """
+    model = kwargs.get('model', 'unknown')
+    # Wait for the request budget shared by all processes, within the task's deadline
+    limiter = get_rate_limiter()
+    if not limiter.acquire('openai', priority=priority,
+                           timeout=min(OPENAI_RATE_LIMIT_WAIT, outbound.remaining(OPENAI_RATE_LIMIT_WAIT))):
+        LLM_REQUESTS.inc(stage=stage, model=model, status='throttled')
+        raise RateLimited(f"OpenAI request budget exhausted for {stage}")
+    _call_timeout(kwargs)
+    completions = client.chat.completions
+    raw_api = getattr(completions, 'with_raw_response', None)
+    raw = None
+    start = time.monotonic()
+    try:
+        if raw_api is not None:
+            # The raw response also tells how many retries the call needed
+            raw = raw_api.create(**kwargs)
+            response = raw.parse()
+        else:
+            response = completions.create(**kwargs)
+    except Exception as e:
+        _record_error(limiter, stage, model, e, time.monotonic() - start)
+        raise
+    _record_success(stage, model, raw, response, kwargs, time.monotonic() - start)
+    return response
+
+
+async def chat_completion_async(client, stage, priority=INTERACTIVE, **kwargs):
+    """
+    Await client.chat.completions.create on an AsyncOpenAI client and record
+    the call like chat_completion does.
+
+    Args:
+        client: AsyncOpenAI client (see get_async_client)
+        stage: Name of the calling stage, used as the metrics label
+        priority: Rate limiter priority class of the call
+        **kwargs: Arguments for chat.completions.create
+
+    Returns:
+        The chat completion response
+
+    Raises:
+        RateLimited: If the shared request budget stayed empty for OPENAI_RATE_LIMIT_WAIT
+    """
+    model = kwargs.get('model', 'unknown')
+    limiter = get_rate_limiter()
+    wait = min(OPENAI_RATE_LIMIT_WAIT, outbound.remaining(OPENAI_RATE_LIMIT_WAIT))
+    if not await limiter.acquire_async('openai', priority=priority, timeout=wait):
+        LLM_REQUESTS.inc(stage=stage, model=model, status='throttled')
+        raise RateLimited(f"OpenAI request budget exhausted for {stage}")
+    _call_timeout(kwargs)
+    completions = client.chat.completions
+    raw_api = getattr(completions, 'with_raw_response', None)
+    raw = None
+    start = time.monotonic()
+    try:
+        if raw_api is not None:
+            raw = await raw_api.create(**kwargs)
+            response = raw.parse()
+        else:
+            response = await completions.create(**kwargs)
+    except asyncio.CancelledError:
+        # The calling stage passed its deadline or was abandoned
+        LLM_REQUESTS.inc(stage=stage, model=model, status='cancelled')
+        raise
+    except Exception as e:
+        _record_error(limiter, stage, model, e, time.monotonic() - start)
+        raise
+    _record_success(stage, model, raw, response, kwargs, time.monotonic() - start)
+    return response
+
+
+def validate_key(force=False):
+    """
+    Check the API key with a lightweight call, at most once per
+    OPENAI_KEY_VALIDATION_TTL seconds unless forced.
+
+    Args:
+        force: Ignore the cached outcome
+
+    Returns:
+        Dictionary with valid, error and checked_at
+    """
+    global _key_status
+    status = _key_status
+    if status is not None and not force and time.time() - status["checked_at"] < OPENAI_KEY_VALIDATION_TTL:
+        return status
+
+    client = get_client()
+    if client is None:
+        status = {"valid": False, "error": "OPENAI_API_KEY is not set", "checked_at": time.time()}
+    else:
+        try:
+            client.models.retrieve("gpt-4o-mini")
+            status = {"valid": True, "error": None, "checked_at": time.time()}
+            logger.info("Validated OpenAI API key")
+        except Exception as e:
+            if "insufficient_quota" in str(e):
+                logger.error(f"OpenAI API key has insufficient quota: {str(e)}")
+            else:
+                logger.error(f"OpenAI API key validation failed: {str(e)}")
+            status = {"valid": False, "error": str(e), "checked_at": time.time()}
+
+    _key_status = status
+    return status
+
+
+def key_status():
+    """Returns the cached validation outcome without making a call (None if never validated)."""
+    return _key_status
+
+
+def reset():
+    """
+    Drop the shared clients so the next call picks up a changed OPENAI_API_KEY.
+    No request is made; calls already in flight finish on the old clients,
+    whose pools are released when they are garbage collected.
+
+    Returns:
+        The new synchronous client, or None if no key is set
+    """
+    global _client, _async_client, _key_status
+    with _lock:
+        _client = _async_client = None
+        _key_status = None
+    return get_client()
@@ -0,0 +1,312 @@
+"""
+Local Style Classifier for Fashion Style Analyzer
+
+This module implements the secondary, offline stage of the hybrid
+classifier. It computes a compact feature vector from the image (color
+histograms, edge and texture statistics and a downsampled thumbnail) and
+scores it against one prototype vector per style category with a single
+matrix product. Prototypes are the averaged features of stored predictions,
+weighted by user feedback, so the model improves as the app is used.
+
+Everything runs on the CPU with NumPy and takes a few milliseconds per image.
+"""
+
+import os
+import base64
+import logging
+import threading
+
+import numpy as np
+from PIL import Image
+
+# Configuration
+LOCAL_MODEL_PATH = os.environ.get(
+    'LOCAL_MODEL_PATH',
+    os.path.join(os.environ.get('CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')),
+                 'style_prototypes.npz')
+)
+LOCAL_MIN_EXAMPLES = int(os.environ.get('LOCAL_MIN_EXAMPLES', '5'))
+
+# Feature layout
+THUMBNAIL_SIZE = 64
+HUE_BINS, SATURATION_BINS, VALUE_BINS = 12, 3, 3
+ORIENTATION_BINS = 8
+GRAY_GRID = 8
+
+# Feedback weights used when averaging prototypes
+ACCURATE_WEIGHT = 2.0
+UNRATED_WEIGHT = 1.0
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+def extract_features(image):
+    """
+    Compute the feature vector of an image.
+
+    Args:
+        image: PIL Image object
+
+    Returns:
+        float32 NumPy array of unit length
+    """
+    small = image.convert('RGB').resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.BILINEAR, reducing_gap=2.0)
+    rgb = np.asarray(small, dtype=np.float32) / 255.0
+    hsv = np.asarray(small.convert('HSV'), dtype=np.float32) / 255.0
+
+    # Joint hue/saturation/value histogram
+    h = np.minimum((hsv[..., 0] * HUE_BINS).astype(np.int32), HUE_BINS - 1)
+    s = np.minimum((hsv[..., 1] * SATURATION_BINS).astype(np.int32), SATURATION_BINS - 1)
+    v = np.minimum((hsv[..., 2] * VALUE_BINS).astype(np.int32), VALUE_BINS - 1)
+    color_bins = (h * SATURATION_BINS + s) * VALUE_BINS + v
+    color_hist = np.bincount(color_bins.ravel(), minlength=HUE_BINS * SATURATION_BINS * VALUE_BINS)
+    color_hist = color_hist.astype(np.float32) / color_bins.size
+
+    # Channel means and spreads
+    channel_stats = np.concatenate([rgb.mean(axis=(0, 1)), rgb.std(axis=(0, 1)),
+                                    hsv[..., 1:].mean(axis=(0, 1))])
+
+    # Edge and texture statistics from image gradients
+    gray = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    gx = np.zeros_like(gray)
+    gy = np.zeros_like(gray)
+    gx[:, 1:-1] = gray[:, 2:] - gray[:, :-2]
+    gy[1:-1, :] = gray[2:, :] - gray[:-2, :]
+    magnitude = np.hypot(gx, gy)
+    orientation = (np.arctan2(gy, gx) % np.pi) / np.pi
+    orientation_bins = np.minimum((orientation * ORIENTATION_BINS).astype(np.int32), ORIENTATION_BINS - 1)
+    orientation_hist = np.bincount(orientation_bins.ravel(), weights=magnitude.ravel(),
+                                   minlength=ORIENTATION_BINS).astype(np.float32)
+    orientation_hist /= orientation_hist.sum() or 1.0
+    laplacian = gray[1:-1, 1:-1] * 4 - gray[:-2, 1:-1] - gray[2:, 1:-1] - gray[1:-1, :-2] - gray[1:-1, 2:]
+    texture_stats = np.array([magnitude.mean(), magnitude.std(), (magnitude > 0.1).mean(),
+                              laplacian.var()], dtype=np.float32)
+
+    # Coarse layout from a downsampled grayscale grid
+    cell = THUMBNAIL_SIZE // GRAY_GRID
+    grid = gray.reshape(GRAY_GRID, cell, GRAY_GRID, cell).mean(axis=(1, 3)).ravel()
+    grid = grid - grid.mean()
+
+    features = np.concatenate([
+        color_hist * 4.0,
+        channel_stats,
+        orientation_hist,
+        texture_stats * 4.0,
+        grid * 0.5,
+    ]).astype(np.float32)
+    norm = np.linalg.norm(features)
+    return features / norm if norm else features
+
+
+def encode_features(features):
+    """Serialize a feature vector compactly (float16, base64) for database storage."""
+    return base64.b64encode(np.asarray(features, dtype=np.float16).tobytes()).decode('ascii')
+
+
+def decode_features(value):
+    """Parse a feature vector stored by encode_features."""
+    return np.frombuffer(base64.b64decode(value), dtype=np.float16).astype(np.float32)
+
+
+def match_style_category(style, categories):
+    """
+    Map a free-form style name (e.g. "Dark Academia Revival") to a known category.
+
+    Args:
+        style: Style name predicted by the primary model
+        categories: List of category names
+
+    Returns:
+        The matching category, or None
+    """
+    if not style:
+        return None
+    normalized = style.lower()
+    for category in categories:
+        if category.lower() == normalized:
+            return category
+    # Prefer the longest category name contained in the style, e.g. "Business Casual" over "Casual"
+    contained = [category for category in categories if category.lower() in normalized]
+    return max(contained, key=len) if contained else None
+
+
+class LocalStyleClassifier:
+    """Nearest-prototype style classifier over local image features."""
+
+    def __init__(self, categories):
+        """
+        Create a classifier without prototypes.
+
+        Args:
+            categories: List of style category names
+        """
+        self.categories = list(categories)
+        self.prototypes = None  # (categories, features) matrix of unit rows
+        self.example_counts = np.zeros(len(self.categories), dtype=np.int64)
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        """True once prototypes are available for at least two categories."""
+        return self.prototypes is not None and int((self.example_counts >= LOCAL_MIN_EXAMPLES).sum()) >= 2
+
+    def fit(self, examples):
+        """
+        Build per-category prototypes.
+
+        Args:
+            examples: Iterable of (features, category, weight) tuples
+
+        Returns:
+            Number of examples used
+        """
+        sums = None
+        counts = np.zeros(len(self.categories), dtype=np.int64)
+        index = {category: i for i, category in enumerate(self.categories)}
+        used = 0
+
+        for features, category, weight in examples:
+            position = index.get(category)
+            if position is None or weight <= 0:
+                continue
+            if sums is None:
+                sums = np.zeros((len(self.categories), len(features)), dtype=np.float64)
+            if len(features) != sums.shape[1]:
+                continue
+            sums[position] += weight * np.asarray(features, dtype=np.float64)
+            counts[position] += 1
+            used += 1
+
+        if sums is None:
+            return 0
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        prototypes = np.divide(sums, norms, out=np.zeros_like(sums), where=norms > 0).astype(np.float32)
+        # Categories with too few examples never win
+        prototypes[counts < LOCAL_MIN_EXAMPLES] = 0
+
+        with self._lock:
+            self.prototypes = prototypes
+            self.example_counts = counts
+        logger.info(f"Built local style prototypes from {used} examples "
+                    f"({int((counts >= LOCAL_MIN_EXAMPLES).sum())} categories)")
+        return used
+
+    def predict(self, features, top_k=3):
+        """
+        Score a feature vector against every prototype.
+
+        Args:
+            features: Vector from extract_features
+            top_k: Number of top categories to return
+
+        Returns:
+            Dictionary with primary_style, top_styles [(category, score)], margin and
+            confidence_score, or None if the classifier has no prototypes
+        """
+        with self._lock:
+            prototypes = self.prototypes
+        if prototypes is None or prototypes.shape[1] != len(features):
+            return None
+
+        scores = prototypes @ features
+        order = np.argsort(scores)[::-1][:max(top_k, 2)]
+        top_score = float(scores[order[0]])
+        margin = top_score - float(scores[order[1]])
+        return {
+            "primary_style": self.categories[order[0]],
+            "top_styles": [(self.categories[i], round(float(scores[i]), 4)) for i in order[:top_k]],
+            "margin": round(margin, 4),
+            "confidence_score": round(max(0.0, top_score), 4)
+        }
+
+    def save(self, path=LOCAL_MODEL_PATH):
+        """Persist the prototypes to an .npz file."""
+        with self._lock:
+            if self.prototypes is None:
+                return False
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            np.savez(path, prototypes=self.prototypes, counts=self.example_counts,
+                     categories=np.array(self.categories))
+        return True
+
+    def load(self, path=LOCAL_MODEL_PATH):
+        """
+        Load prototypes saved by save().
+
+        Returns:
+            Boolean indicating if prototypes were loaded
+        """
+        if not os.path.exists(path):
+            return False
+        try:
+            data = np.load(path)
+            if list(data['categories']) != self.categories:
+                logger.warning("Saved style prototypes use different categories; ignoring them")
+                return False
+            with self._lock:
+                self.prototypes = data['prototypes'].astype(np.float32)
+                self.example_counts = data['counts']
+            logger.info(f"Loaded local style prototypes from {path}")
+            return True
+        except Exception as e:
+            logger.error(f"Error loading local style prototypes: {e}")
+            return False
+
+
+def training_examples(session, prediction_model, feedback_model, categories):
+    """
+    Yield (features, category, weight) examples from stored predictions.
+
+    Predictions marked inaccurate are skipped, predictions confirmed accurate
+    count more than unrated ones.
+
+    Args:
+        session: SQLAlchemy session
+        prediction_model: The Prediction model class
+        feedback_model: The Feedback model class
+        categories: List of style category names
+    """
+    rows = session.query(
+        prediction_model.primary_style, prediction_model.local_features, feedback_model.is_accurate
+    ).outerjoin(
+        feedback_model, feedback_model.prediction_id == prediction_model.id
+    ).filter(prediction_model.local_features.isnot(None)).yield_per(1000)
+
+    for style, encoded, is_accurate in rows:
+        if is_accurate is False:
+            continue
+        category = match_style_category(style, categories)
+        if category is None:
+            continue
+        try:
+            features = decode_features(encoded)
+        except Exception:
+            continue
+        yield features, category, ACCURATE_WEIGHT if is_accurate else UNRATED_WEIGHT
+
+
+def rebuild_prototypes(classifier, session, prediction_model, feedback_model, path=LOCAL_MODEL_PATH):
+    """
+    Rebuild a classifier's prototypes from the database and save them.
+
+    Returns:
+        Number of examples used
+    """
+    used = classifier.fit(training_examples(session, prediction_model, feedback_model, classifier.categories))
+    if used:
+        classifier.save(path)
+    return used
+
+
+if __name__ == '__main__':
+    # Rebuild the prototype file from stored predictions and feedback:
+    #   python local_classifier.py
+    from app import app
+    from models import db, Prediction, Feedback
+    import hybrid_classifier
+
+    with app.app_context():
+        count = rebuild_prototypes(hybrid_classifier.local_classifier, db.session, Prediction, Feedback)
+        print(f"Rebuilt local style prototypes from {count} examples")
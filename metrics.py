@@ -0,0 +1,199 @@
+"""
+Metrics for Fashion Style Analyzer
+
+This module is a small in-process metrics registry rendered in the
+Prometheus text exposition format by the /metrics endpoint. It supports
+labelled counters, gauges and histograms, which is all the app needs, so
+there is no dependency on a Prometheus client library.
+
+Values are per process: with several gunicorn workers, each scrape sees the
+worker that answered it, so scrape every worker or sum in the dashboard.
+"""
+
+import math
+import logging
+import threading
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Default histogram buckets (seconds)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+# Buckets for request payload sizes (bytes)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _label_key(labelnames, labels):
+    missing = set(labelnames) - set(labels)
+    if missing:
+        raise ValueError(f"Missing metric labels: {', '.join(sorted(missing))}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """A monotonically increasing value per label set."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def total(self, **labels):
+        """Returns the sum over every label set matching the given (partial) labels."""
+        positions = [(self.labelnames.index(name), str(value)) for name, value in labels.items()]
+        with self._lock:
+            return sum(value for key, value in self._values.items()
+                       if all(key[i] == expected for i, expected in positions))
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    """A value per label set that can go up and down."""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets per label set."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def summary(self, **labels):
+        """Returns count, sum and mean of the observations for a label set."""
+        state = self._values.get(_label_key(self.labelnames, labels))
+        if state is None:
+            return {'count': 0, 'sum': 0.0, 'mean': 0.0}
+        return {'count': state['count'], 'sum': state['sum'], 'mean': state['sum'] / state['count']}
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, {'counts': list(state['counts']), 'sum': state['sum'], 'count': state['count']})
+                           for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                le = (('le', _format_value(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Registry:
+    """A set of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} is already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collect):
+        """Register a callable run before each render, e.g. to refresh gauges from a cache's stats."""
+        self._collectors.append(collect)
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        for collect in list(self._collectors):
+            try:
+                collect()
+            except Exception as e:
+                logger.error(f"Metrics collector {getattr(collect, '__name__', collect)} failed: {e}")
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+# Process-wide registry exposed at /metrics
+registry = Registry()
@@ -1,7 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text, Float
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import uuid
@@ -63,7 +63,12 @@ class Prediction(db.Model):
     primary_style = Column(String(100), nullable=False)
     style_tags = Column(Text, nullable=True)  # Stored as JSON string
     confidence_score = Column(Integer, nullable=True)
-    created_at = Column(DateTime, default=func.now())
+    created_at = Column(DateTime, default=func.now(), index=True)
+    image_phash = Column(String(16), nullable=True, index=True)  # 64-bit dHash as hex
+    analysis = Column(Text, nullable=True)  # Combined analysis stored as JSON string
+    local_features = Column(Text, nullable=True)  # Local classifier feature vector (base64 float16)
+    analysis_source = Column(String(20), nullable=True)  # 'gpt' or 'local' (cascade mode)
+    local_margin = Column(Float, nullable=True)  # Local classifier top-1 margin, for threshold tuning
     
     # Relationships
     user = relationship('User', back_populates='predictions')
@@ -86,4 +91,25 @@ class Feedback(db.Model):
     prediction = relationship('Prediction', back_populates='feedback')
     
     def __repr__(self):
-        return f'<Feedback {self.id} for Prediction {self.prediction_id}>'
\ No newline at end of file
+        return f'<Feedback {self.id} for Prediction {self.prediction_id}>'
+
+def add_missing_columns():
+    """
+    Add nullable columns that were introduced after a table was created.
+    db.create_all() only creates missing tables, so existing deployments
+    need this for new optional fields. Must run inside an app context.
+    """
+    inspector = db.inspect(db.engine)
+    existing_tables = inspector.get_table_names()
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
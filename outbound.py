@@ -0,0 +1,306 @@
+"""
+Outbound Executor for Fashion Style Analyzer
+
+This module owns the one process-wide, bounded thread pool that runs the
+work of every request: pipeline stages and with them every outbound call to
+OpenAI, eBay, Backblaze B2 and MongoDB. A fixed number of threads run tasks
+and a bounded number more may wait; once both are taken, new work is
+rejected with ExecutorSaturated instead of piling up.
+
+Each task may carry a deadline. A task still queued at its deadline is
+dropped without running, and a running task can read the time it has left
+(`remaining()`) to bound its own network calls, so a caller that gives up
+on a task also frees its thread soon after.
+
+Coroutine tasks (`submit_async`) run on one background event loop instead
+of a thread, so calls made through async clients (such as the OpenAI
+stages) can be in flight by the hundred without holding a thread each.
+They are bounded separately and cancelled at their deadline.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import registry
+
+# Configuration
+OUTBOUND_MAX_WORKERS = int(os.environ.get('OUTBOUND_MAX_WORKERS', '32'))
+OUTBOUND_MAX_QUEUE = int(os.environ.get('OUTBOUND_MAX_QUEUE', '64'))
+# Coroutine tasks allowed in flight on the event loop at once
+OUTBOUND_MAX_ASYNC = int(os.environ.get('OUTBOUND_MAX_ASYNC', '256'))
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+TASKS = registry.counter(
+    'outbound_tasks_total', 'Tasks submitted to the outbound executor', ('task', 'status'))
+TASK_DURATION = registry.histogram(
+    'outbound_task_duration_seconds', 'Run time of outbound executor tasks', ('task',))
+QUEUE_WAIT = registry.histogram(
+    'outbound_queue_wait_seconds', 'Time outbound tasks waited for a thread', ('task',),
+    (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10))
+RUNNING = registry.gauge('outbound_running', 'Outbound tasks running')
+QUEUED = registry.gauge('outbound_queued', 'Outbound tasks waiting for a thread')
+SATURATION = registry.gauge(
+    'outbound_saturation', 'Share of outbound executor capacity (threads plus queue) in use')
+ASYNC_RUNNING = registry.gauge('outbound_async_running', 'Outbound coroutine tasks in flight on the event loop')
+
+# Deadline of the current task; a context variable so both threads and coroutines see their own
+_deadline = contextvars.ContextVar('outbound_deadline', default=None)
+
+_loop_lock = threading.Lock()
+_loop = None
+
+
+class ExecutorSaturated(RuntimeError):
+    """Raised when the outbound executor has no free thread or queue slot."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised for a task whose deadline passed before it started."""
+
+
+def remaining(default=None):
+    """
+    Returns the seconds left before the current task's deadline.
+
+    Args:
+        default: Value returned outside a task or for a task without a deadline
+
+    Returns:
+        Seconds left (at least 0), or default
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    return max(0.0, deadline - time.monotonic())
+
+
+def event_loop():
+    """Returns the background event loop running coroutine tasks, starting its thread on first use."""
+    global _loop
+    if _loop is not None:
+        return _loop
+
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            started = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(started.set)
+                loop.run_forever()
+
+            threading.Thread(target=run, name='outbound-loop', daemon=True).start()
+            started.wait()
+            _loop = loop
+    return _loop
+
+
+def run_coroutine(coroutine, timeout=None):
+    """
+    Run a coroutine on the background event loop and wait for its result.
+    Must not be called from a coroutine task itself.
+
+    Args:
+        coroutine: Coroutine to run
+        timeout: Optional seconds to wait
+
+    Returns:
+        The coroutine's result
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, event_loop()).result(timeout)
+
+
+class OutboundExecutor:
+    """A bounded thread pool that rejects work when full and honours task deadlines."""
+
+    def __init__(self, max_workers=OUTBOUND_MAX_WORKERS, max_queue=OUTBOUND_MAX_QUEUE, max_async=OUTBOUND_MAX_ASYNC):
+        """
+        Create the executor; threads start on demand.
+
+        Args:
+            max_workers: Threads running tasks
+            max_queue: Tasks allowed to wait for a thread
+            max_async: Coroutine tasks allowed in flight on the event loop
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_async = max_async
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='outbound')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._async_slots = threading.BoundedSemaphore(max_async)
+        self._lock = threading.Lock()
+        self._running = 0
+        self._queued = 0
+        self._async_running = 0
+
+    def _adjust(self, running=0, queued=0, async_running=0):
+        with self._lock:
+            self._running += running
+            self._queued += queued
+            self._async_running += async_running
+
+    def submit(self, fn, *args, name='task', timeout=None, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the pool.
+
+        Args:
+            fn: Callable to run
+            name: Task name used in metrics
+            timeout: Optional seconds from now until the task's deadline
+
+        Returns:
+            concurrent.futures.Future with the result
+
+        Raises:
+            ExecutorSaturated: If every thread and queue slot is taken
+        """
+        if not self._slots.acquire(blocking=False):
+            TASKS.inc(task=name, status='rejected')
+            raise ExecutorSaturated(f"Outbound executor is full; rejected {name}")
+
+        submitted = time.monotonic()
+        deadline = submitted + timeout if timeout is not None else None
+        released = threading.Event()
+
+        def release():
+            # Exactly once, whether the task ran or was cancelled while queued
+            if not released.is_set():
+                released.set()
+                self._slots.release()
+
+        def run():
+            self._adjust(running=1, queued=-1)
+            started = time.monotonic()
+            QUEUE_WAIT.observe(started - submitted, task=name)
+            try:
+                if deadline is not None and started >= deadline:
+                    TASKS.inc(task=name, status='expired')
+                    raise DeadlineExceeded(f"{name} expired after waiting {started - submitted:.2f}s for a thread")
+                token = _deadline.set(deadline)
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception:
+                    TASKS.inc(task=name, status='error')
+                    raise
+                finally:
+                    _deadline.reset(token)
+                TASKS.inc(task=name, status='ok')
+                return result
+            finally:
+                TASK_DURATION.observe(time.monotonic() - started, task=name)
+                self._adjust(running=-1)
+                release()
+
+        def on_done(future):
+            if future.cancelled():
+                TASKS.inc(task=name, status='cancelled')
+                self._adjust(queued=-1)
+                release()
+
+        self._adjust(queued=1)
+        try:
+            future = self._pool.submit(run)
+        except Exception:
+            self._adjust(queued=-1)
+            release()
+            raise
+        future.add_done_callback(on_done)
+        return future
+
+    def submit_async(self, coroutine_fn, *args, name='task', timeout=None, **kwargs):
+        """
+        Run the coroutine coroutine_fn(*args, **kwargs) on the background event
+        loop. It holds no thread while it awaits, and it is cancelled when its
+        deadline passes or its future is cancelled.
+
+        Args:
+            coroutine_fn: Coroutine function to run
+            name: Task name used in metrics
+            timeout: Optional seconds from now until the task's deadline
+
+        Returns:
+            concurrent.futures.Future with the result
+
+        Raises:
+            ExecutorSaturated: If OUTBOUND_MAX_ASYNC coroutine tasks are already in flight
+        """
+        if not self._async_slots.acquire(blocking=False):
+            TASKS.inc(task=name, status='rejected')
+            raise ExecutorSaturated(f"Outbound event loop is full; rejected {name}")
+
+        submitted = time.monotonic()
+        deadline = submitted + timeout if timeout is not None else None
+
+        async def run():
+            self._adjust(async_running=1)
+            started = time.monotonic()
+            QUEUE_WAIT.observe(started - submitted, task=name)
+            _deadline.set(deadline)
+            try:
+                if deadline is None:
+                    result = await coroutine_fn(*args, **kwargs)
+                else:
+                    result = await asyncio.wait_for(coroutine_fn(*args, **kwargs), max(0.0, deadline - started))
+            except asyncio.CancelledError:
+                TASKS.inc(task=name, status='cancelled')
+                raise
+            except asyncio.TimeoutError:
+                TASKS.inc(task=name, status='expired')
+                raise DeadlineExceeded(f"{name} passed its deadline after {time.monotonic() - started:.2f}s")
+            except Exception:
+                TASKS.inc(task=name, status='error')
+                raise
+            finally:
+                TASK_DURATION.observe(time.monotonic() - started, task=name)
+                self._adjust(async_running=-1)
+            TASKS.inc(task=name, status='ok')
+            return result
+
+        try:
+            future = asyncio.run_coroutine_threadsafe(run(), event_loop())
+        except Exception:
+            self._async_slots.release()
+            raise
+        # Runs once whether the task finished, failed or was cancelled before it started
+        future.add_done_callback(lambda _: self._async_slots.release())
+        return future
+
+    def stats(self):
+        """
+        Returns running and queued task counts and the share of capacity in use.
+        """
+        with self._lock:
+            running, queued, async_running = self._running, self._queued, self._async_running
+        capacity = self.max_workers + self.max_queue
+        return {
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'running': running,
+            'queued': queued,
+            'saturation': round((running + queued) / capacity, 4) if capacity else 1.0,
+            'max_async': self.max_async,
+            'async_running': async_running
+        }
+
+
+# Process-wide executor for request work and outbound calls
+outbound_executor = OutboundExecutor()
+
+
+def _collect_stats():
+    stats = outbound_executor.stats()
+    RUNNING.set(stats['running'])
+    QUEUED.set(stats['queued'])
+    SATURATION.set(stats['saturation'])
+    ASYNC_RUNNING.set(stats['async_running'])
+
+
+registry.add_collector(_collect_stats)
@@ -0,0 +1,178 @@
+"""
+Vision Payload Policy for Fashion Style Analyzer
+
+This module decides, per pipeline stage, how the uploaded image is sent to
+the vision API: its resolution, JPEG quality, whether plain background is
+trimmed, and the `detail` level. Style classification and outfit ideas only
+need a low-detail thumbnail (a flat per-image cost); attribute extraction
+gets a cropped high-detail image so small garment details stay legible.
+
+Each payload records its size and an estimate of the image tokens it costs,
+so a request can report what it sent (see payload_report).
+"""
+
+import os
+import math
+from collections import namedtuple
+
+from image_artifact import API_MAX_SIZE, as_artifact
+
+# Configuration
+ADAPTIVE_PAYLOAD_ENABLED = os.environ.get('ADAPTIVE_PAYLOAD_ENABLED', 'true').lower() == 'true'
+LOW_DETAIL_IMAGE_SIZE = int(os.environ.get('LOW_DETAIL_IMAGE_SIZE', '512'))
+HIGH_DETAIL_IMAGE_SIZE = int(os.environ.get('HIGH_DETAIL_IMAGE_SIZE', '768'))
+
+# How an image is encoded for one stage
+PayloadSpec = namedtuple('PayloadSpec', ['max_size', 'quality', 'detail', 'crop'])
+
+# Per-stage policies. Low detail is billed as one flat block however large the
+# image is, so there is no point sending more than 512px.
+PAYLOAD_POLICIES = {
+    "style": PayloadSpec(LOW_DETAIL_IMAGE_SIZE, 70, "low", False),
+    "outfits": PayloadSpec(LOW_DETAIL_IMAGE_SIZE, 70, "low", False),
+    "attributes": PayloadSpec(HIGH_DETAIL_IMAGE_SIZE, 80, "high", True),
+    "single_pass": PayloadSpec(HIGH_DETAIL_IMAGE_SIZE, 75, "high", False),
+}
+
+# Previous behaviour: a 1024px image with the API's default detail level
+LEGACY_POLICY = PayloadSpec(API_MAX_SIZE, 75, "auto", False)
+
+# Image token costs as (base tokens, tokens per 512px tile) by model
+IMAGE_TOKEN_COSTS = {
+    "gpt-4o-mini": (2833, 5667),
+    "gpt-4o": (85, 170),
+}
+
+
+def payload_spec(stage):
+    """Returns the PayloadSpec used for a stage."""
+    if not ADAPTIVE_PAYLOAD_ENABLED:
+        return LEGACY_POLICY
+    return PAYLOAD_POLICIES.get(stage, LEGACY_POLICY)
+
+
+def estimate_image_tokens(width, height, detail, model="gpt-4o-mini"):
+    """
+    Estimate the input tokens an image costs.
+
+    High detail scales the image to fit 2048x2048, then its shortest side to
+    768px, and bills one block per 512px tile on top of the base cost. Low
+    detail bills only the base cost. "auto" is estimated as high detail.
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+        detail: "low", "high" or "auto"
+        model: Model name (see IMAGE_TOKEN_COSTS)
+
+    Returns:
+        Estimated number of tokens
+    """
+    base, per_tile = IMAGE_TOKEN_COSTS.get(model, IMAGE_TOKEN_COSTS["gpt-4o"])
+    if detail == "low":
+        return base
+
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return base + per_tile * tiles
+
+
+class ImagePayload:
+    """An encoded image ready to be sent to the vision API."""
+
+    def __init__(self, base64_image, detail, size, stage=None, model="gpt-4o-mini"):
+        """
+        Args:
+            base64_image: Base64-encoded JPEG
+            detail: "low", "high" or "auto"
+            size: (width, height) of the encoded image
+            stage: Pipeline stage the payload was built for
+            model: Model the payload is sent to (for the token estimate)
+        """
+        self.base64_image = base64_image
+        self.detail = detail
+        self.size = size
+        self.stage = stage
+        self.bytes = len(base64_image) * 3 // 4
+        self.estimated_tokens = estimate_image_tokens(size[0], size[1], detail, model)
+
+    def content(self):
+        """The `image_url` message content part for this payload."""
+        return {
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:image/jpeg;base64,{self.base64_image}",
+                "detail": self.detail
+            }
+        }
+
+    def to_dict(self):
+        return {
+            "detail": self.detail,
+            "width": self.size[0],
+            "height": self.size[1],
+            "bytes": self.bytes,
+            "estimated_tokens": self.estimated_tokens
+        }
+
+
+def build_payload(image, stage):
+    """
+    Build (or reuse) the payload of an image for a stage, and record it on the artifact.
+
+    Args:
+        image: PIL Image object or ImageArtifact
+        stage: Stage name (a key of PAYLOAD_POLICIES)
+
+    Returns:
+        ImagePayload
+    """
+    artifact = as_artifact(image)
+    payload = artifact.payloads.get(stage)
+    if payload is None:
+        spec = payload_spec(stage)
+        payload = ImagePayload(
+            artifact.base64(spec.max_size, spec.quality, spec.crop),
+            spec.detail,
+            artifact.resized(spec.max_size, spec.crop).size,
+            stage=stage
+        )
+        artifact.payloads[stage] = payload
+    return payload
+
+
+def image_content(image_payload):
+    """
+    The `image_url` content part for an ImagePayload or a plain base64 string.
+
+    Plain strings are sent without a detail level, as before.
+    """
+    if isinstance(image_payload, ImagePayload):
+        return image_payload.content()
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": f"data:image/jpeg;base64,{image_payload}"
+        }
+    }
+
+
+def payload_report(image):
+    """
+    Summarize the payloads built for an image during a request.
+
+    Args:
+        image: ImageArtifact
+
+    Returns:
+        Dictionary with per-stage payloads, total bytes and estimated image tokens
+    """
+    payloads = dict(getattr(image, 'payloads', {}))
+    return {
+        "stages": {stage: payload.to_dict() for stage, payload in payloads.items()},
+        "total_bytes": sum(payload.bytes for payload in payloads.values()),
+        "estimated_image_tokens": sum(payload.estimated_tokens for payload in payloads.values())
+    }
@@ -0,0 +1,243 @@
+"""
+Perceptual Hash Index for Fashion Style Analyzer
+
+This module computes a 64-bit difference hash (dHash) for every analyzed
+image and keeps an in-memory multi-index Hamming structure over the hashes
+of stored predictions. Re-encoded, resized or slightly cropped copies of an
+earlier upload hash within a few bits of the original, so their prediction
+can be reused instead of calling OpenAI again.
+
+Lookups use multi-index hashing: the hash is split into four 16-bit chunks
+with one table per chunk. By the pigeonhole principle any hash within
+distance r of the query matches at least one chunk within distance r // 4,
+so only a handful of buckets are probed regardless of index size.
+"""
+
+import os
+import logging
+import threading
+import itertools
+from array import array
+
+import numpy as np
+from PIL import Image
+
+# Configuration
+PHASH_ENABLED = os.environ.get('PHASH_ENABLED', 'true').lower() == 'true'
+PHASH_MAX_DISTANCE = int(os.environ.get('PHASH_MAX_DISTANCE', '6'))
+PHASH_REFRESH_INTERVAL = int(os.environ.get('PHASH_REFRESH_INTERVAL', '60'))
+PHASH_LOAD_BATCH_SIZE = int(os.environ.get('PHASH_LOAD_BATCH_SIZE', '5000'))
+
+HASH_BITS = 64
+CHUNK_BITS = 16
+NUM_CHUNKS = HASH_BITS // CHUNK_BITS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+def dhash(image, hash_size=8):
+    """
+    Compute a difference hash of an image.
+
+    Args:
+        image: PIL Image object
+        hash_size: Hash grid size (8 gives a 64-bit hash)
+
+    Returns:
+        The hash as an unsigned integer
+    """
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hash_to_hex(value):
+    """Format a hash for storage."""
+    return f"{value:016x}"
+
+
+def hex_to_hash(value):
+    """Parse a stored hash."""
+    return int(value, 16)
+
+
+def _flip_masks(radius):
+    """All CHUNK_BITS-wide masks with at most `radius` bits set."""
+    masks = [0]
+    for count in range(1, radius + 1):
+        for positions in itertools.combinations(range(CHUNK_BITS), count):
+            masks.append(sum(1 << p for p in positions))
+    return masks
+
+
+class PerceptualHashIndex:
+    """Multi-index Hamming structure mapping perceptual hashes to prediction IDs."""
+
+    def __init__(self, max_distance=PHASH_MAX_DISTANCE):
+        """
+        Create an empty index.
+
+        Args:
+            max_distance: Largest Hamming distance that counts as a near duplicate
+        """
+        self.max_distance = max_distance
+        self._flips = _flip_masks(max_distance // NUM_CHUNKS)
+        self._tables = [dict() for _ in range(NUM_CHUNKS)]
+        self._hashes = array('Q')
+        self._ids = []
+        self._indexed = set()
+        self._lock = threading.Lock()
+
+        # Position of the newest prediction loaded from the database
+        self._last_created_at = None
+        self._last_ids = set()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, value, prediction_id):
+        """
+        Add a hash to the index, unless its prediction is already indexed.
+
+        Args:
+            value: Perceptual hash (integer)
+            prediction_id: ID of the prediction the hash belongs to
+
+        Returns:
+            True if the hash was added
+        """
+        with self._lock:
+            # Predictions stored by this worker are added right away and again by the loader
+            if prediction_id in self._indexed:
+                return False
+            self._indexed.add(prediction_id)
+            position = len(self._ids)
+            self._hashes.append(value)
+            self._ids.append(prediction_id)
+            for chunk_index, table in enumerate(self._tables):
+                chunk = (value >> (chunk_index * CHUNK_BITS)) & CHUNK_MASK
+                bucket = table.get(chunk)
+                if bucket is None:
+                    table[chunk] = array('I', [position])
+                else:
+                    bucket.append(position)
+        return True
+
+    def lookup(self, value, max_distance=None):
+        """
+        Find the closest indexed hash within the maximum distance.
+
+        Args:
+            value: Perceptual hash (integer)
+            max_distance: Optional distance override (capped at the index's max_distance)
+
+        Returns:
+            Tuple of (prediction_id, distance), or None if nothing is close enough
+        """
+        limit = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        best = None
+        seen = set()
+
+        with self._lock:
+            for chunk_index, table in enumerate(self._tables):
+                chunk = (value >> (chunk_index * CHUNK_BITS)) & CHUNK_MASK
+                for mask in self._flips:
+                    bucket = table.get(chunk ^ mask)
+                    if not bucket:
+                        continue
+                    for position in bucket:
+                        if position in seen:
+                            continue
+                        seen.add(position)
+                        distance = (self._hashes[position] ^ value).bit_count()
+                        if distance <= limit and (best is None or distance < best[1]):
+                            best = (self._ids[position], distance)
+                            if distance == 0:
+                                return best
+        return best
+
+    def load_from_predictions(self, session, prediction_model):
+        """
+        Add predictions stored since the last load, in batches.
+
+        Args:
+            session: SQLAlchemy session
+            prediction_model: The Prediction model class
+
+        Returns:
+            Number of hashes added
+        """
+        from sqlalchemy import and_, or_
+
+        added = 0
+        cursor = None  # (created_at, id) of the last row of the previous page
+        while True:
+            query = session.query(
+                prediction_model.id, prediction_model.image_phash, prediction_model.created_at
+            ).filter(prediction_model.image_phash.isnot(None))
+            if cursor is not None:
+                query = query.filter(or_(
+                    prediction_model.created_at > cursor[0],
+                    and_(prediction_model.created_at == cursor[0], prediction_model.id > cursor[1])
+                ))
+            elif self._last_created_at is not None:
+                # Rows sharing the newest timestamp may still arrive from other workers
+                query = query.filter(prediction_model.created_at >= self._last_created_at)
+            rows = query.order_by(prediction_model.created_at, prediction_model.id) \
+                .limit(PHASH_LOAD_BATCH_SIZE).all()
+
+            for row in rows:
+                if row.created_at == self._last_created_at and row.id in self._last_ids:
+                    continue
+                try:
+                    if self.add(hex_to_hash(row.image_phash), row.id):
+                        added += 1
+                except ValueError:
+                    logger.warning(f"Skipping invalid perceptual hash for prediction {row.id}")
+
+                if row.created_at != self._last_created_at:
+                    self._last_created_at = row.created_at
+                    self._last_ids = set()
+                self._last_ids.add(row.id)
+
+            if len(rows) < PHASH_LOAD_BATCH_SIZE:
+                break
+            cursor = (rows[-1].created_at, rows[-1].id)
+
+        if added:
+            logger.info(f"Loaded {added} perceptual hashes (index size: {len(self)})")
+        return added
+
+    def start_background_loader(self, app, prediction_model, interval=PHASH_REFRESH_INTERVAL):
+        """
+        Load stored hashes in a background thread and keep polling for new ones,
+        so predictions made by other workers become visible.
+
+        Args:
+            app: Flask application (for the database app context)
+            prediction_model: The Prediction model class
+            interval: Seconds between polls
+        """
+        from models import db
+
+        def run():
+            stop = threading.Event()
+            while not stop.is_set():
+                try:
+                    with app.app_context():
+                        self.load_from_predictions(db.session, prediction_model)
+                        db.session.remove()
+                except Exception as e:
+                    logger.error(f"Error loading perceptual hash index: {e}")
+                stop.wait(interval)
+
+        thread = threading.Thread(target=run, name='phash-index-loader', daemon=True)
+        thread.start()
+        return thread
+
+
+# Process-wide index used by the web app
+phash_index = PerceptualHashIndex()
@@ -0,0 +1,205 @@
+"""
+Stage Pipeline Engine for Fashion Style Analyzer
+
+This module runs a small dependency graph of named stages. Each stage
+declares the inputs it needs (initial values such as the image, or the
+results of other stages), and every stage whose inputs are ready runs
+concurrently with the others. Each stage has its own timeout and fallback
+value, and the engine reports per-stage timings.
+
+Stages run on the shared outbound executor (see outbound.py). A stage's
+timeout is also its task deadline, so a stage that times out while queued
+never starts, and a running one can bound its calls with the time left. A
+stage the full executor rejects gets its fallback right away. A stage whose
+function is a coroutine function runs on the executor's event loop and holds
+no thread while it awaits.
+"""
+
+import copy
+import inspect
+import logging
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from metrics import registry
+from outbound import outbound_executor, ExecutorSaturated
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+STAGE_DURATION = registry.histogram(
+    'pipeline_stage_duration_seconds', 'Duration of pipeline stages (stage "total" is the whole run)',
+    ('stage', 'status'))
+
+
+class Stage:
+    """A single unit of work in a pipeline."""
+
+    def __init__(self, name, func, inputs=(), timeout=None, fallback=None):
+        """
+        Define a pipeline stage.
+
+        Args:
+            name: Unique stage name; its result is available to other stages under this name
+            func: Callable (or coroutine function) invoked with the declared inputs as positional arguments
+            inputs: Names of initial values or other stages this stage depends on
+            timeout: Seconds to wait for the stage before using its fallback (None waits forever)
+            fallback: Value used when the stage fails or times out (copied on use)
+        """
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.timeout = timeout
+        self.fallback = fallback
+
+
+class PipelineResult:
+    """Results and per-stage timings of a pipeline run."""
+
+    def __init__(self, values, timings):
+        self.values = values
+        self.timings = timings
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def get(self, name, default=None):
+        return self.values.get(name, default)
+
+    def stage_status(self, name):
+        """Return 'ok', 'error', 'timeout', 'rejected' or 'skipped' for a stage."""
+        return self.timings.get(name, {}).get('status', 'skipped')
+
+
+class Pipeline:
+    """Runs a set of stages concurrently, respecting their declared inputs."""
+
+    def __init__(self, stages, max_workers=None, on_complete=None, executor=None):
+        """
+        Build a pipeline and validate its dependency graph.
+
+        Args:
+            stages: Iterable of Stage objects
+            max_workers: Maximum number of stages running at once (defaults to the stage count)
+            on_complete: Optional callable (name, value, status) invoked as each stage
+                finishes, from the thread that called run()
+            executor: OutboundExecutor to run stages on (defaults to the shared one)
+        """
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage name: {stage.name}")
+            self.stages[stage.name] = stage
+        self.max_workers = max_workers or max(1, len(self.stages))
+        self.on_complete = on_complete
+        self.executor = executor or outbound_executor
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        """Raise ValueError if stage dependencies form a cycle."""
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done or name not in self.stages:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline stages form a cycle at: {name}")
+            visiting.add(name)
+            for dependency in self.stages[name].inputs:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def _notify(self, name, value, status):
+        if self.on_complete is None:
+            return
+        try:
+            self.on_complete(name, value, status)
+        except Exception as e:
+            logger.error(f"Pipeline completion callback failed for {name}: {e}")
+
+    def run(self, **initial):
+        """
+        Run every stage, starting each one as soon as its inputs are available.
+
+        Args:
+            **initial: Initial values that stages can declare as inputs
+
+        Returns:
+            PipelineResult with each stage's value (or fallback) and timings
+        """
+        values = dict(initial)
+        timings = {}
+        pending = dict(self.stages)
+        running = {}  # future -> (stage, start time)
+
+        for stage in pending.values():
+            missing = [name for name in stage.inputs if name not in values and name not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown inputs: {missing}")
+
+        pipeline_start = time.monotonic()
+        while pending or running:
+            # Start every stage whose inputs are all available
+            for name in [n for n, s in pending.items() if all(i in values for i in s.inputs)]:
+                if len(running) >= self.max_workers:
+                    break
+                stage = pending.pop(name)
+                args = [values[i] for i in stage.inputs]
+                submit = self.executor.submit_async if inspect.iscoroutinefunction(stage.func) else self.executor.submit
+                try:
+                    future = submit(stage.func, *args, name=stage.name, timeout=stage.timeout)
+                except ExecutorSaturated as e:
+                    logger.warning(f"Pipeline stage {stage.name} rejected, using fallback: {e}")
+                    values[stage.name] = copy.deepcopy(stage.fallback)
+                    timings[stage.name] = {'seconds': 0.0, 'status': 'rejected'}
+                    self._notify(stage.name, values[stage.name], 'rejected')
+                    continue
+                running[future] = (stage, time.monotonic())
+
+            if not running:
+                if pending and any(all(i in values for i in s.inputs) for s in pending.values()):
+                    # Rejected stages made more stages ready
+                    continue
+                # Nothing can make progress; this only happens with unknown inputs
+                break
+
+            # Wait for the next completion or the nearest stage deadline
+            now = time.monotonic()
+            deadlines = [start + stage.timeout - now for stage, start in running.values()
+                         if stage.timeout is not None]
+            wait_for = max(0, min(deadlines)) if deadlines else None
+            finished, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                stage, start = running.pop(future)
+                elapsed = time.monotonic() - start
+                try:
+                    values[stage.name] = future.result()
+                    timings[stage.name] = {'seconds': round(elapsed, 4), 'status': 'ok'}
+                except Exception as e:
+                    logger.error(f"Pipeline stage {stage.name} failed: {e}")
+                    values[stage.name] = copy.deepcopy(stage.fallback)
+                    timings[stage.name] = {'seconds': round(elapsed, 4), 'status': 'error'}
+                self._notify(stage.name, values[stage.name], timings[stage.name]['status'])
+
+            # Abandon stages that ran past their timeout; a queued one is cancelled, and
+            # a running one finishes in the background, bounded by its task deadline
+            now = time.monotonic()
+            for future, (stage, start) in list(running.items()):
+                if stage.timeout is not None and now - start >= stage.timeout:
+                    running.pop(future)
+                    future.cancel()
+                    logger.warning(f"Pipeline stage {stage.name} timed out after {stage.timeout}s, using fallback")
+                    values[stage.name] = copy.deepcopy(stage.fallback)
+                    timings[stage.name] = {'seconds': round(now - start, 4), 'status': 'timeout'}
+                    self._notify(stage.name, values[stage.name], 'timeout')
+
+        timings['total'] = {'seconds': round(time.monotonic() - pipeline_start, 4), 'status': 'ok'}
+        logger.info(f"Pipeline timings: {timings}")
+        for name, timing in timings.items():
+            STAGE_DURATION.observe(timing['seconds'], stage=name, status=timing['status'])
+        return PipelineResult(values, timings)
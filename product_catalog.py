@@ -0,0 +1,551 @@
+"""
+Local Product Catalog for Fashion Style Analyzer
+
+Every product an eBay search returns is kept in a local SQLite catalog
+shared by all processes on a host, filed under the style it was found for
+and tagged with the search's refinement terms (e.g. "red", "wool"). Each
+process holds an in-memory BM25 index over the title, style and tags of the
+catalog's products, catching up with rows other processes wrote every
+CATALOG_SYNC_INTERVAL seconds.
+
+A recommendation request is answered from the index when the catalog has
+enough recent products of the style that match every refinement term, the
+price bounds and the exclusions. They are ranked against the prediction's
+style tags and attributes. Otherwise the caller searches eBay live and
+adds the results to the catalog.
+
+Scoring runs on numpy views of the index arrays. The final pick is
+re-ranked with maximal marginal relevance (MMR) over title terms, so
+near-identical listings do not crowd out the rest of the results.
+"""
+
+import os
+import re
+import json
+import math
+import time
+import sqlite3
+import logging
+import threading
+from array import array
+
+import numpy as np
+
+from disk_cache import CACHE_DIR
+from metrics import registry
+
+# Configuration
+CATALOG_ENABLED = os.environ.get('CATALOG_ENABLED', 'true').lower() == 'true'
+CATALOG_DB_PATH = os.environ.get('CATALOG_DB_PATH', os.path.join(CACHE_DIR, 'catalog.db'))
+# Products last seen longer ago than this are not served (listings end)
+CATALOG_MAX_AGE = int(os.environ.get('CATALOG_MAX_AGE', '86400'))
+# Products not seen for this long are deleted
+CATALOG_RETENTION = int(os.environ.get('CATALOG_RETENTION', str(7 * 86400)))
+CATALOG_MAX_PRODUCTS = int(os.environ.get('CATALOG_MAX_PRODUCTS', '50000'))
+# Seconds between loads of rows written by other processes
+CATALOG_SYNC_INTERVAL = float(os.environ.get('CATALOG_SYNC_INTERVAL', '5'))
+# Weight of the prediction's style tags and attributes relative to refinement terms
+CATALOG_PROFILE_WEIGHT = float(os.environ.get('CATALOG_PROFILE_WEIGHT', '0.5'))
+# Trade-off between relevance (1.0) and title diversity (0.0) when picking results
+CATALOG_MMR_LAMBDA = float(os.environ.get('CATALOG_MMR_LAMBDA', '0.7'))
+# Best-scoring candidates the MMR re-ranking chooses from
+CATALOG_MMR_CANDIDATES = int(os.environ.get('CATALOG_MMR_CANDIDATES', '50'))
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Attribute values that say nothing about the garment
+_UNKNOWN = {'unknown', 'n/a', 'none', ''}
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog_products (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    style TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    price_value REAL,
+    product TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (style, item_id)
+);
+CREATE INDEX IF NOT EXISTS idx_catalog_products_updated ON catalog_products (updated_at);
+"""
+
+LOOKUPS = registry.counter('catalog_lookups_total', 'Local catalog lookups', ('result',))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_EXCLUSION = re.compile(r'-"[^"]*"|(?<!\S)-\S+')
+
+
+def normalize_style(style):
+    """Returns the catalog key of a style (lowercase, single spaces)."""
+    return ' '.join(str(style or '').lower().split())
+
+
+def tokenize(text):
+    """
+    Split text into index terms: lowercase words of two or more characters,
+    with plural endings dropped so "dresses" matches "dress".
+    """
+    tokens = []
+    for token in _TOKEN.findall(str(text).lower()):
+        if token.endswith('sses'):
+            token = token[:-2]
+        elif token.endswith('s') and not token.endswith('ss') and len(token) > 3:
+            token = token[:-1]
+        if len(token) > 1:
+            tokens.append(token)
+    return tokens
+
+
+def refinement_tags(style, search_query):
+    """
+    Returns the refinement terms of a search query built by ebay_manager.build_search,
+    i.e. its keywords after "<style> clothing fashion" without the exclusions.
+    """
+    prefix = f"{style} clothing fashion"
+    refinement = search_query[len(prefix):] if search_query.startswith(prefix) else search_query
+    return sorted(set(tokenize(_EXCLUSION.sub(' ', refinement))))
+
+
+def profile_terms(style_info):
+    """
+    Returns the style tags and attribute values of a prediction as index terms.
+
+    Args:
+        style_info: Prediction dictionary with style_tags and attributes
+
+    Returns:
+        List of terms (may repeat, so common ones weigh more)
+    """
+    if not style_info:
+        return []
+    values = list(style_info.get('style_tags') or [])
+    for value in (style_info.get('attributes') or {}).values():
+        values.extend(value if isinstance(value, list) else [value])
+    return [token for value in values if isinstance(value, str) and value.strip().lower() not in _UNKNOWN
+            for token in tokenize(value)]
+
+
+def diversify(term_sets, relevance, limit, mmr_lambda=CATALOG_MMR_LAMBDA):
+    """
+    Pick results by maximal marginal relevance: each pick maximizes
+    mmr_lambda * relevance - (1 - mmr_lambda) * (highest title similarity to
+    an earlier pick), with cosine similarity over title terms.
+
+    Args:
+        term_sets: Title terms of each candidate, best candidate first
+        relevance: Relevance of each candidate (any non-negative scale)
+        limit: Number of candidates to pick
+        mmr_lambda: 1.0 ranks by relevance alone, lower values favour diversity
+
+    Returns:
+        Indexes of the picked candidates, in pick order
+    """
+    count = len(term_sets)
+    if count <= 1 or mmr_lambda >= 1.0:
+        return list(range(min(limit, count)))
+
+    vocabulary = {}
+    rows, columns = [], []
+    for row, terms in enumerate(term_sets):
+        for term in terms:
+            rows.append(row)
+            columns.append(vocabulary.setdefault(term, len(vocabulary)))
+    vectors = np.zeros((count, max(1, len(vocabulary))), dtype=np.float32)
+    vectors[rows, columns] = 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.where(norms > 0, norms, 1.0)
+    similarity = vectors @ vectors.T
+
+    relevance = np.asarray(relevance, dtype=np.float32)
+    top = relevance.max()
+    relevance = relevance / top if top > 0 else np.zeros(count, dtype=np.float32)
+
+    picked = []
+    closest = np.zeros(count, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    for _ in range(min(limit, count)):
+        # argmax takes the first of equal scores, so ties keep the candidates' order
+        scores = np.where(available, mmr_lambda * relevance - (1 - mmr_lambda) * closest, -np.inf)
+        choice = int(np.argmax(scores))
+        picked.append(choice)
+        available[choice] = False
+        np.maximum(closest, similarity[choice], out=closest)
+    return picked
+
+
+class CatalogIndex:
+    """
+    In-memory BM25 index over catalog products. Documents are only appended;
+    a product seen again replaces its older document, which is skipped from
+    then on (the index is rebuilt once most documents are dead). Per-document
+    values and postings are kept in typed arrays so searches can score them
+    through numpy views without copying.
+    """
+
+    def __init__(self):
+        self.postings = {}  # term -> (array of positions, array of term frequencies)
+        self.lengths = array('f')
+        self.updated = array('d')
+        self.prices = array('d')
+        self.alive = array('B')
+        self.products = []
+        self.titles = []  # title terms of each document, for diversity re-ranking
+        self.by_key = {}  # (style, item_id) -> position
+        self.by_style = {}  # style -> array of positions
+        self.total_length = 0
+        self.live = 0
+
+    def __len__(self):
+        return self.live
+
+    def add(self, style, item_id, title, tags, price_value, product, updated_at):
+        """Index one product, replacing its earlier document if it had one."""
+        position = len(self.products)
+        previous = self.by_key.get((style, item_id))
+        if previous is not None and self.alive[previous]:
+            self.alive[previous] = 0
+            self.total_length -= self.lengths[previous]
+            self.live -= 1
+
+        title_terms = tokenize(title)
+        terms = title_terms + tokenize(style) + list(tags)
+        frequencies = {}
+        for term in terms:
+            frequencies[term] = frequencies.get(term, 0) + 1
+        for term, count in frequencies.items():
+            entry = self.postings.get(term)
+            if entry is None:
+                entry = self.postings[term] = (array('I'), array('f'))
+            entry[0].append(position)
+            entry[1].append(count)
+
+        self.lengths.append(len(terms))
+        self.updated.append(updated_at)
+        self.prices.append(float('nan') if price_value is None else price_value)
+        self.alive.append(1)
+        self.products.append(product)
+        self.titles.append(frozenset(title_terms))
+        self.by_key[(style, item_id)] = position
+        self.by_style.setdefault(style, array('I')).append(position)
+        self.total_length += len(terms)
+        self.live += 1
+
+    def search(self, style, required=(), excluded=(), boost=(), boost_weight=1.0, limit=6,
+               min_price=None, max_price=None, newer_than=0.0, mmr_lambda=CATALOG_MMR_LAMBDA):
+        """
+        Rank the products of a style with BM25, then pick diverse results among the best.
+
+        Args:
+            style: Normalized style
+            required: Terms every result must contain (scored with weight 1)
+            excluded: Terms no result may contain
+            boost: Terms that only raise the score (repeated terms count more)
+            boost_weight: Weight of each boost term occurrence
+            limit: Most results to return
+            min_price: Optional lowest price
+            max_price: Optional highest price
+            newer_than: Skip products last seen before this time
+            mmr_lambda: Relevance/diversity trade-off (see diversify)
+
+        Returns:
+            List of (position, score) in result order
+        """
+        positions = self.by_style.get(style)
+        if not positions:
+            return []
+
+        alive = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+        updated = np.frombuffer(self.updated, dtype=np.float64)
+        prices = np.frombuffer(self.prices, dtype=np.float64)
+        lengths = np.frombuffer(self.lengths, dtype=np.float32)
+
+        mask = np.zeros(len(self.products), dtype=bool)
+        mask[np.frombuffer(positions, dtype=np.uint32)] = True
+        mask &= alive & (updated >= newer_than)
+        # Comparisons with NaN (unknown price) are False, so those products drop out
+        if min_price is not None:
+            mask &= prices >= min_price
+        if max_price is not None:
+            mask &= prices <= max_price
+
+        weights = {}
+        for term in required:
+            weights[term] = weights.get(term, 0.0) + 1.0
+        for term in boost:
+            weights[term] = weights.get(term, 0.0) + boost_weight
+
+        count = max(1, self.live)
+        average_length = self.total_length / count if self.total_length else 1.0
+        scores = np.zeros(len(self.products), dtype=np.float32)
+        matched = np.zeros(len(self.products), dtype=np.int16)
+        required = set(required)
+
+        for term, weight in weights.items():
+            entry = self.postings.get(term)
+            if entry is None:
+                if term in required:
+                    return []
+                continue
+            # Each term lists a document once, so fancy-indexed += is safe
+            documents = np.frombuffer(entry[0], dtype=np.uint32)
+            frequencies = np.frombuffer(entry[1], dtype=np.float32)
+            document_frequency = int(alive[documents].sum())
+            idf = math.log(1 + (count - document_frequency + 0.5) / (document_frequency + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[documents] / average_length)
+            scores[documents] += weight * idf * frequencies * (BM25_K1 + 1) / (frequencies + norm)
+            if term in required:
+                matched[documents] += 1
+
+        for term in excluded:
+            entry = self.postings.get(term)
+            if entry is not None:
+                mask[np.frombuffer(entry[0], dtype=np.uint32)] = False
+        if required:
+            mask &= matched >= len(required)
+
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return []
+        # Best score first; ties keep the most recently found products first, in eBay's order
+        order = np.lexsort((candidates, -updated[candidates], -scores[candidates]))
+        best = candidates[order[:max(limit, CATALOG_MMR_CANDIDATES)]]
+
+        picks = diversify([self.titles[position] for position in best], scores[best], limit, mmr_lambda)
+        return [(int(best[pick]), float(scores[best[pick]])) for pick in picks]
+
+    def newest(self, style):
+        """Returns when the most recently seen product of a style was found (0 if none)."""
+        return max((self.updated[position] for position in self.by_style.get(style, ())
+                    if self.alive[position]), default=0.0)
+
+
+class ProductCatalog:
+    """Products found on eBay, stored in SQLite and searched through an in-memory BM25 index."""
+
+    def __init__(self, path=None, sync_interval=CATALOG_SYNC_INTERVAL):
+        """
+        Open (and create if needed) the catalog database.
+
+        Args:
+            path: SQLite database path (defaults to CATALOG_DB_PATH)
+            sync_interval: Seconds between loads of rows other processes added
+        """
+        self.path = path or CATALOG_DB_PATH
+        self.sync_interval = sync_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._index = CatalogIndex()
+        self._last_seq = 0
+        self._last_sync = 0.0
+        self._last_purge = 0.0
+        self.available = True
+
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._connection().executescript(_SCHEMA)
+        except Exception as e:
+            logger.error(f"Product catalog unavailable: {e}")
+            self.available = False
+
+    def _connection(self):
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def add_products(self, style, products, tags=()):
+        """
+        Store the products a search for a style returned, merging the search's
+        tags with those the products already had.
+
+        Args:
+            style: Style the search was for
+            products: Product dictionaries (see ebay_products.Product.to_dict)
+            tags: Refinement terms of the search (see refinement_tags)
+
+        Returns:
+            Number of products stored
+        """
+        if not self.available or not products:
+            return 0
+        style = normalize_style(style)
+        now = time.time()
+        conn = self._connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for product in products:
+                    item_id = str(product.get('id', ''))
+                    if not item_id:
+                        continue
+                    row = conn.execute("SELECT tags FROM catalog_products WHERE style = ? AND item_id = ?",
+                                       (style, item_id)).fetchone()
+                    merged = sorted(set(tags).union(json.loads(row[0]) if row else ()))
+                    # Replacing the row gives it a new seq, so every process re-indexes it
+                    conn.execute(
+                        "INSERT OR REPLACE INTO catalog_products "
+                        "(style, item_id, title, tags, price_value, product, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (style, item_id, product.get('title', ''), json.dumps(merged),
+                         product.get('price_value'), json.dumps(product), now)
+                    )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        except Exception as e:
+            logger.error(f"Error adding products to the catalog: {e}")
+            return 0
+
+        if now - self._last_purge >= 3600:
+            self._last_purge = now
+            self.purge()
+        return len(products)
+
+    def purge(self, older_than=CATALOG_RETENTION, max_products=CATALOG_MAX_PRODUCTS):
+        """
+        Delete products not seen for older_than seconds, and the least recently
+        seen ones beyond max_products.
+
+        Returns:
+            Number of products deleted
+        """
+        if not self.available:
+            return 0
+        try:
+            conn = self._connection()
+            deleted = conn.execute("DELETE FROM catalog_products WHERE updated_at < ?",
+                                   (time.time() - older_than,)).rowcount
+            deleted += conn.execute(
+                "DELETE FROM catalog_products WHERE seq IN (SELECT seq FROM catalog_products "
+                "ORDER BY updated_at DESC LIMIT -1 OFFSET ?)", (max_products,)
+            ).rowcount
+        except Exception as e:
+            logger.error(f"Error purging the product catalog: {e}")
+            return 0
+        if deleted:
+            logger.info(f"Purged {deleted} products from the catalog")
+            with self._lock:
+                self._rebuild()
+        return deleted
+
+    def _rebuild(self):
+        """Start a fresh index (the next sync loads every row). Call with the lock held."""
+        self._index = CatalogIndex()
+        self._last_seq = 0
+        self._last_sync = 0.0
+
+    def _sync(self, force=False):
+        """Index rows added since the last sync. Call with the lock held."""
+        now = time.monotonic()
+        if not force and now - self._last_sync < self.sync_interval:
+            return
+        self._last_sync = now
+        index = self._index
+        if len(index.products) > 1000 and len(index) < len(index.products) / 2:
+            # Mostly replaced documents: start over
+            self._rebuild()
+            index = self._index
+            self._last_sync = now
+
+        rows = self._connection().execute(
+            "SELECT seq, style, item_id, title, tags, price_value, product, updated_at "
+            "FROM catalog_products WHERE seq > ? ORDER BY seq", (self._last_seq,)
+        ).fetchall()
+        for seq, style, item_id, title, tags, price_value, product, updated_at in rows:
+            index.add(style, item_id, title, json.loads(tags), price_value, json.loads(product), updated_at)
+            self._last_seq = seq
+        if rows:
+            logger.debug(f"Indexed {len(rows)} catalog products (index size: {len(index)})")
+
+    def search(self, style, keywords=None, style_info=None, limit=6, min_price=None, max_price=None,
+               max_age=CATALOG_MAX_AGE):
+        """
+        Answer a product search from the catalog if it has enough matching products.
+
+        Args:
+            style: Fashion style
+            keywords: Optional keywords extracted from user comments (see keyword_extractor);
+                every search term must match and excluded terms must not
+            style_info: Optional prediction whose style tags and attributes rank the results
+            limit: Number of products wanted
+            min_price: Optional lowest price (USD)
+            max_price: Optional highest price (USD)
+            max_age: Skip products last seen more than this many seconds ago
+
+        Returns:
+            Tuple of (products, newest), where products is None if the catalog has
+            fewer than limit matches and newest is when the style's most recent
+            products were found
+        """
+        if not self.available:
+            return None, 0.0
+        from keyword_extractor import QUERY_ORDER
+
+        required, excluded = [], []
+        for category in QUERY_ORDER:
+            for term in (keywords or {}).get(category, []):
+                required.extend(token for token in tokenize(term) if token not in required)
+        for term in (keywords or {}).get('exclude', []):
+            excluded.extend(tokenize(term))
+
+        style = normalize_style(style)
+        try:
+            with self._lock:
+                self._sync()
+                index = self._index
+                results = index.search(style, required, excluded, profile_terms(style_info), CATALOG_PROFILE_WEIGHT,
+                                       limit, min_price, max_price, newer_than=time.time() - max_age)
+                products = [dict(index.products[position]) for position, _ in results]
+                newest = index.newest(style)
+        except Exception as e:
+            logger.error(f"Error searching the product catalog: {e}")
+            return None, 0.0
+
+        if len(products) < limit:
+            LOOKUPS.inc(result='thin')
+            return None, newest
+        LOOKUPS.inc(result='hit')
+        return products, newest
+
+    def stats(self):
+        """Returns the catalog size and this process's index size."""
+        if not self.available:
+            return {'available': False}
+        try:
+            products, styles = self._connection().execute(
+                "SELECT COUNT(*), COUNT(DISTINCT style) FROM catalog_products").fetchone()
+        except Exception as e:
+            return {'available': True, 'error': str(e)}
+        with self._lock:
+            return {
+                'available': True,
+                'products': products,
+                'styles': styles,
+                'indexed': len(self._index),
+                'terms': len(self._index.postings)
+            }
+
+
+_instance = None
+_instance_lock = threading.Lock()
+
+def get_product_catalog():
+    """Returns the process-wide ProductCatalog, or None if CATALOG_ENABLED is off."""
+    global _instance
+    if _instance is None and CATALOG_ENABLED:
+        with _instance_lock:
+            if _instance is None:
+                _instance = ProductCatalog()
+    return _instance
@@ -0,0 +1,265 @@
+"""
+Rate Limiter for Fashion Style Analyzer
+
+This module keeps one token bucket per external API (eBay, OpenAI) in a
+local SQLite database, so every gunicorn worker and worker.py process on a
+host draws from the same budget instead of each assuming it has the whole
+quota to itself.
+
+Background work (cache refreshes and prefetches) may only spend tokens
+above a reserve kept for interactive requests. When an API reports that
+its quota is exhausted, the bucket's refill rate is cut in half; it then
+recovers linearly to the full rate over RATE_LIMIT_RECOVERY_SECONDS.
+"""
+
+import os
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+
+from disk_cache import CACHE_DIR
+from metrics import registry
+
+# Configuration
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+RATE_LIMIT_DB_PATH = os.environ.get('RATE_LIMIT_DB_PATH', os.path.join(CACHE_DIR, 'ratelimit.db'))
+# Share of each bucket background work may not spend
+BACKGROUND_RESERVE = float(os.environ.get('RATE_LIMIT_BACKGROUND_RESERVE', '0.25'))
+# Seconds for a throttled bucket to climb back from the lowest to the full rate
+RATE_LIMIT_RECOVERY_SECONDS = float(os.environ.get('RATE_LIMIT_RECOVERY_SECONDS', '1800'))
+# Lowest share of the configured rate adaptive backoff goes down to
+MIN_RATE_FACTOR = 0.05
+
+# Priority classes
+INTERACTIVE, BACKGROUND = 'interactive', 'background'
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    factor REAL NOT NULL DEFAULT 1.0,
+    updated_at REAL NOT NULL
+);
+"""
+
+DECISIONS = registry.counter(
+    'rate_limit_decisions_total', 'Rate limiter decisions', ('api', 'priority', 'result'))
+TOKENS = registry.gauge('rate_limit_tokens', 'Tokens left in the shared bucket', ('api',))
+RATE_FACTOR = registry.gauge('rate_limit_rate_factor', 'Share of the configured refill rate in effect', ('api',))
+
+
+class RateLimited(RuntimeError):
+    """Raised when no token became available in time."""
+
+
+class RateLimiter:
+    """Token buckets shared by every process on a host through a SQLite database."""
+
+    def __init__(self, path=None):
+        """
+        Open (and create if needed) the bucket database.
+
+        Args:
+            path: SQLite database path (defaults to RATE_LIMIT_DB_PATH)
+        """
+        self.path = path or RATE_LIMIT_DB_PATH
+        self.budgets = {}
+        self._local = threading.local()
+        self.available = True
+
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._connection().executescript(_SCHEMA)
+        except Exception as e:
+            logger.error(f"Rate limiter unavailable, not limiting: {e}")
+            self.available = False
+
+    def _connection(self):
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def configure(self, name, rate, capacity):
+        """
+        Declare an API budget.
+
+        Args:
+            name: Bucket name, e.g. "ebay"
+            rate: Tokens added per second at the full rate
+            capacity: Most tokens the bucket holds (the largest burst)
+        """
+        self.budgets[name] = (float(rate), float(capacity))
+
+    def _update(self, conn, name, now, take=None, floor=0.0, penalize=False):
+        """
+        Refill a bucket up to now and optionally take tokens or cut its rate, in one transaction.
+
+        Returns:
+            (granted, tokens, factor) after the update
+        """
+        rate, capacity = self.budgets[name]
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute("SELECT tokens, factor, updated_at FROM rate_buckets WHERE name = ?",
+                               (name,)).fetchone()
+            tokens, factor, updated_at = row if row else (capacity, 1.0, now)
+            elapsed = max(0.0, now - updated_at)
+            tokens = min(capacity, tokens + elapsed * rate * factor)
+            factor = min(1.0, factor + elapsed / RATE_LIMIT_RECOVERY_SECONDS)
+
+            granted = False
+            if penalize:
+                factor = max(MIN_RATE_FACTOR, factor / 2)
+                tokens = 0.0
+            elif take is not None and tokens - take >= floor:
+                tokens -= take
+                granted = True
+
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (name, tokens, factor, updated_at) VALUES (?, ?, ?, ?)",
+                (name, tokens, factor, now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return granted, tokens, factor
+
+    def try_acquire(self, name, cost=1, priority=INTERACTIVE):
+        """
+        Take tokens from a bucket if it has enough.
+
+        Args:
+            name: Bucket name
+            cost: Tokens to take
+            priority: INTERACTIVE may empty the bucket; BACKGROUND must leave the reserve
+
+        Returns:
+            Seconds to wait before retrying, or 0 if the tokens were taken
+        """
+        if not self.available or name not in self.budgets:
+            return 0
+        rate, capacity = self.budgets[name]
+        floor = capacity * BACKGROUND_RESERVE if priority == BACKGROUND else 0.0
+        try:
+            granted, tokens, factor = self._update(self._connection(), name, time.time(), take=cost, floor=floor)
+        except Exception as e:
+            logger.error(f"Rate limiter error for {name}, allowing the call: {e}")
+            return 0
+        DECISIONS.inc(api=name, priority=priority, result='granted' if granted else 'throttled')
+        if granted:
+            return 0
+        return max(0.01, (cost + floor - tokens) / (rate * factor))
+
+    def acquire(self, name, cost=1, priority=INTERACTIVE, timeout=0):
+        """
+        Take tokens from a bucket, waiting up to timeout seconds for them.
+
+        Args:
+            name: Bucket name
+            cost: Tokens to take
+            priority: INTERACTIVE or BACKGROUND
+            timeout: Longest wait in seconds (0 to fail at once)
+
+        Returns:
+            True if the tokens were taken
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(name, cost, priority)
+            if not wait:
+                return True
+            left = deadline - time.monotonic()
+            if wait > left:
+                return False
+            time.sleep(wait)
+
+    async def acquire_async(self, name, cost=1, priority=INTERACTIVE, timeout=0):
+        """Like acquire, but waits for tokens without blocking the event loop."""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(name, cost, priority)
+            if not wait:
+                return True
+            left = deadline - time.monotonic()
+            if wait > left:
+                return False
+            await asyncio.sleep(wait)
+
+    def penalize(self, name):
+        """Halve a bucket's refill rate and empty it, after the API reported its quota exhausted."""
+        if not self.available or name not in self.budgets:
+            return
+        try:
+            _, _, factor = self._update(self._connection(), name, time.time(), penalize=True)
+            logger.warning(f"{name} quota exhausted; refill rate cut to {factor:.0%} and recovering")
+        except Exception as e:
+            logger.error(f"Rate limiter error penalizing {name}: {e}")
+
+    def remaining(self, name):
+        """
+        Returns the tokens left, capacity and rate factor of a bucket.
+        """
+        rate, capacity = self.budgets[name]
+        if not self.available:
+            return {'tokens': capacity, 'capacity': capacity, 'rate_per_hour': rate * 3600, 'rate_factor': 1.0}
+        _, tokens, factor = self._update(self._connection(), name, time.time())
+        return {
+            'tokens': round(tokens, 2),
+            'capacity': capacity,
+            'rate_per_hour': round(rate * factor * 3600, 1),
+            'rate_factor': round(factor, 4)
+        }
+
+    def stats(self):
+        """Returns remaining() for every configured bucket."""
+        stats = {}
+        for name in self.budgets:
+            try:
+                stats[name] = self.remaining(name)
+            except Exception as e:
+                stats[name] = {'error': str(e)}
+        return stats
+
+
+_instance = None
+_instance_lock = threading.Lock()
+
+def get_rate_limiter():
+    """Returns the process-wide RateLimiter with the eBay and OpenAI budgets configured."""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                limiter = RateLimiter()
+                limiter.available = limiter.available and RATE_LIMIT_ENABLED
+                # eBay standard API limit is 5000 calls an hour
+                limiter.configure('ebay', float(os.environ.get('EBAY_REQUESTS_PER_HOUR', '5000')) / 3600,
+                                  float(os.environ.get('EBAY_BURST', '50')))
+                limiter.configure('openai', float(os.environ.get('OPENAI_REQUESTS_PER_MINUTE', '500')) / 60,
+                                  float(os.environ.get('OPENAI_BURST', '50')))
+                _instance = limiter
+    return _instance
+
+
+def _collect_stats():
+    if _instance is None:
+        return
+    for name, stats in _instance.stats().items():
+        if 'tokens' in stats:
+            TOKENS.set(stats['tokens'], api=name)
+            RATE_FACTOR.set(stats['rate_factor'], api=name)
+
+
+registry.add_collector(_collect_stats)
@@ -0,0 +1,161 @@
+"""
+Service Health Monitor for Fashion Style Analyzer
+
+This module keeps a cached view of the health of the app's backing services
+(SQL database, MongoDB, Backblaze B2, OpenAI, eBay). A single background
+thread runs every registered check on an interval, each with its own
+timeout, and stores the outcome; the readiness endpoint only reads that
+cached state, so it never waits on a slow dependency.
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+# Configuration
+HEALTH_PROBE_INTERVAL = float(os.environ.get('HEALTH_PROBE_INTERVAL', '30'))
+HEALTH_CHECK_TIMEOUT = float(os.environ.get('HEALTH_CHECK_TIMEOUT', '5'))
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+def _timed(check):
+    """Run a check and return (result, seconds taken); exceptions propagate."""
+    start = time.monotonic()
+    result = check()
+    return result, time.monotonic() - start
+
+
+class HealthMonitor:
+    """Runs health checks in the background and caches their results."""
+
+    def __init__(self, interval=HEALTH_PROBE_INTERVAL, timeout=HEALTH_CHECK_TIMEOUT):
+        """
+        Create a monitor with no checks.
+
+        Args:
+            interval: Seconds between probe rounds
+            timeout: Seconds each check may take before it counts as unhealthy
+        """
+        self.interval = interval
+        self.timeout = timeout
+        self._checks = {}
+        self._required = set()
+        self._startup = []
+        self._state = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wake = threading.Event()
+
+    def register(self, name, check, required=False):
+        """
+        Add a health check.
+
+        Args:
+            name: Service name
+            check: Callable returning True when healthy (False or an exception means unhealthy)
+            required: Whether the app is not ready while this service is unhealthy
+        """
+        self._checks[name] = check
+        if required:
+            self._required.add(name)
+
+    def on_start(self, task):
+        """
+        Run a task on the probe thread before its first round (e.g. schema setup).
+        A task that raises is retried before the next round.
+        """
+        self._startup.append(task)
+
+    def _run_startup(self):
+        remaining = []
+        for task in self._startup:
+            try:
+                task()
+            except Exception as e:
+                logger.error(f"Startup task {getattr(task, '__name__', task)} failed: {e}")
+                remaining.append(task)
+        self._startup = remaining
+
+    def probe(self):
+        """Run every check once, in parallel, and update the cached state."""
+        if not self._checks:
+            return
+        executor = ThreadPoolExecutor(max_workers=len(self._checks), thread_name_prefix='health')
+        try:
+            started = {name: executor.submit(_timed, check) for name, check in self._checks.items()}
+            deadline = time.monotonic() + self.timeout
+            for name, future in started.items():
+                error, seconds = None, self.timeout
+                try:
+                    healthy, seconds = future.result(timeout=max(0, deadline - time.monotonic()))
+                    healthy = bool(healthy)
+                    if not healthy:
+                        error = "unavailable"
+                except TimeoutError:
+                    healthy, error = False, f"timed out after {self.timeout}s"
+                except Exception as e:
+                    healthy, error = False, str(e)
+                with self._lock:
+                    previous = self._state.get(name, {}).get('healthy')
+                    self._state[name] = {
+                        'healthy': healthy,
+                        'error': error,
+                        'latency_ms': round(seconds * 1000, 1),
+                        'checked_at': time.time()
+                    }
+                if previous is not healthy:
+                    log = logger.info if healthy else logger.warning
+                    log(f"Service {name} is {'healthy' if healthy else 'unhealthy'}" + (f": {error}" if error else ""))
+        finally:
+            # Do not wait for checks that are still hanging
+            executor.shutdown(wait=False)
+
+    def start(self):
+        """Start the background probe thread (once per process)."""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+
+        def run():
+            while True:
+                if self._startup:
+                    self._run_startup()
+                try:
+                    self.probe()
+                except Exception as e:
+                    logger.error(f"Health probe failed: {e}")
+                self._wake.wait(self.interval)
+                self._wake.clear()
+
+        self._thread = threading.Thread(target=run, name='health-probe', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def refresh(self):
+        """Ask the probe thread to run a round now."""
+        self._wake.set()
+
+    def snapshot(self):
+        """
+        Returns the cached health state without running any check.
+
+        Returns:
+            Dictionary with ready, starting and per-service state
+        """
+        with self._lock:
+            services = {name: dict(state) for name, state in self._state.items()}
+        pending = [name for name in self._checks if name not in services]
+        starting = bool(self._startup) or any(name in self._required for name in pending)
+        ready = not starting and all(services.get(name, {}).get('healthy') for name in self._required)
+        return {
+            'ready': ready,
+            'starting': starting,
+            'services': services
+        }
+
+
+# Process-wide monitor used by the web app
+health_monitor = HealthMonitor()
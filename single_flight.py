@@ -0,0 +1,75 @@
+"""
+Single-flight Calls for Fashion Style Analyzer
+
+This module collapses concurrent calls for the same key into one: the first
+caller runs the function and every caller that arrives while it is running
+waits for and shares its result (or exception). Nothing is kept once the
+call finishes; caching results is left to the caller.
+"""
+
+import logging
+import threading
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key within a process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, timeout=None, **kwargs):
+        """
+        Run fn(*args, **kwargs) unless a call for key is already running, in which case wait for it.
+
+        Args:
+            key: Hashable key identifying identical calls
+            fn: Callable to run
+            timeout: Longest wait in seconds for a running call (None to wait for it to finish)
+
+        Returns:
+            Tuple of (result, shared), where shared is True if another caller's result was reused
+
+        Raises:
+            TimeoutError: If the running call did not finish within timeout
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"Timed out waiting for the in-flight call {key!r}")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        """Returns the number of keys with a call running."""
+        with self._lock:
+            return len(self._calls)
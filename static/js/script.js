@@ -171,48 +171,123 @@ document.addEventListener('DOMContentLoaded', function() {
                 formData.append('user_comments', userComments.value);
             }
 
-            // Send AJAX request
-            fetch('/predict', {
-                method: 'POST',
-                body: formData
-            })
-            .then(response => response.json())
-            .then(data => {
-                // Hide loading indicator
+            // Stream the prediction; each section is rendered as soon as it arrives
+            let partial = {};
+            let finished = false;
+            const showResultsCard = () => {
+                if (!resultsCard.classList.contains('d-none')) return;
+                // Hide loading indicator and show results card
                 loadingIndicator.classList.add('d-none');
-
-                if (data.error) {
-                    errorMessage.textContent = data.error;
-                    errorAlert.classList.remove('d-none');
-                    return;
-                }
-
-                // Update the results card with the prediction data
-                updateResultsCard(data);
-
-                // Show results card
                 resultsCard.classList.remove('d-none');
 
                 // Scroll to results
                 resultsCard.scrollIntoView({ behavior: 'smooth' });
+            };
+
+            fetch('/predict/stream', {
+                method: 'POST',
+                body: formData
+            })
+            .then(response => {
+                if (!response.ok) {
+                    return response.json().then(data => {
+                        throw new Error(data.error || 'Network response was not ok');
+                    });
+                }
+                return readEventStream(response, (event, data) => {
+                    partial = Object.assign(partial, data);
+                    switch (event) {
+                        case 'style':
+                            updateStyleSection(partial);
+                            showResultsCard();
+                            break;
+                        case 'attributes':
+                            updateAttributesSection(partial);
+                            break;
+                        case 'outfits':
+                            updateOutfitCombinations(data.outfit_combinations || []);
+                            break;
+                        case 'products':
+                            updateProductRecommendations(data.products || []);
+                            break;
+                        case 'done':
+                            // Update the results card with the full prediction data
+                            updateResultsCard(data);
+                            showResultsCard();
+                            finished = true;
+                            break;
+                        case 'error':
+                            throw new Error(data.error || 'Style prediction failed');
+                    }
+                });
+            })
+            .then(() => {
+                if (!finished) {
+                    throw new Error('The connection closed before the analysis finished');
+                }
             })
             .catch(error => {
                 console.error('Error:', error);
                 loadingIndicator.classList.add('d-none');
-                errorMessage.textContent = 'An error occurred during analysis. Please try again.';
+                resultsCard.classList.add('d-none');
+                errorMessage.textContent = error.message || 'An error occurred during analysis. Please try again.';
                 errorAlert.classList.remove('d-none');
             });
         });
     }
 
-    // Function to update results card with prediction data
-    function updateResultsCard(data) {
+    // Read a server-sent event stream from a fetch response, calling
+    // onEvent(event, data) for each event; resolves when the stream ends
+    function readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        function dispatch(block) {
+            let event = 'message';
+            const dataLines = [];
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    dataLines.push(line.slice(5).trim());
+                }
+            });
+            if (dataLines.length > 0) {
+                onEvent(event, JSON.parse(dataLines.join('\n')));
+            }
+        }
+
+        function read() {
+            return reader.read().then(({ done, value }) => {
+                buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    dispatch(buffer.slice(0, boundary));
+                    buffer = buffer.slice(boundary + 2);
+                }
+                if (done) {
+                    if (buffer.trim()) dispatch(buffer);
+                    return;
+                }
+                return read();
+            });
+        }
+
+        return read();
+    }
+
+    // Function to update the predicted style and its description
+    function updateStyleSection(data) {
         // Set the predicted style
         document.getElementById('predictedStyle').textContent = data.primary_style;
 
         // Update style description
         document.getElementById('styleDescription').innerHTML = `<p>${data.description}</p>`;
+    }
 
+    // Function to update the attributes section
+    function updateAttributesSection(data) {
         // Show attributes section if available
         if (data.attributes && Object.keys(data.attributes).length > 0) {
             // Update the attributes list
@@ -266,12 +341,18 @@ document.addEventListener('DOMContentLoaded', function() {
             // Show attributes section
             document.getElementById('attributesSection').classList.remove('d-none');
         }
+    }
+
+    // Function to update results card with prediction data
+    function updateResultsCard(data) {
+        updateStyleSection(data);
+        updateAttributesSection(data);
 
         // Update outfit combinations
         updateOutfitCombinations(data.outfit_combinations || []);
 
         // Update product recommendations
-        updateProductRecommendations(data.recommendations || []);
+        updateProductRecommendations(data.products || data.recommendations || []);
 
         // Setup feedback and favorites
         if (data.prediction_id) {
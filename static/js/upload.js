@@ -185,8 +185,20 @@ document.addEventListener('DOMContentLoaded', function() {
             formData.append('user_comments', userComments);
         }
         
-        // Make AJAX request to predict API
-        fetch('/predict', {
+        // Stream the prediction; each section is rendered as soon as it arrives
+        let resultsShown = false;
+        let finished = false;
+        const showResults = () => {
+            if (resultsShown) return;
+            resultsShown = true;
+            // Hide loading section and show results
+            loadingSection.classList.add('d-none');
+            resultsSection.classList.remove('d-none');
+            // Scroll to results section
+            resultsSection.scrollIntoView({ behavior: 'smooth' });
+        };
+        
+        fetch('/predict/stream', {
             method: 'POST',
             body: formData
         })
@@ -196,25 +208,51 @@ document.addEventListener('DOMContentLoaded', function() {
                     throw new Error(data.error || 'Network response was not ok');
                 });
             }
-            return response.json();
+            return readEventStream(response, (event, data) => {
+                switch (event) {
+                    case 'style':
+                        updateStyle(data);
+                        showResults();
+                        break;
+                    case 'attributes':
+                        updateAttributes(data.attributes || {});
+                        break;
+                    case 'outfits':
+                        updateOutfitCombinations(data.outfit_combinations || []);
+                        break;
+                    case 'image':
+                        if (document.getElementById('resultImage')) {
+                            document.getElementById('resultImage').src = data.image_url;
+                        }
+                        break;
+                    case 'products':
+                        updateProductRecommendations(data.products || []);
+                        break;
+                    case 'done':
+                        console.log('Success:', data);
+                        // Display the final results
+                        updateResults(data);
+                        // Set up feedback buttons
+                        setupFeedbackButtons(data.prediction_id, data.primary_style);
+                        showResults();
+                        finished = true;
+                        break;
+                    case 'error':
+                        throw new Error(data.error || 'Style prediction failed');
+                }
+            });
         })
-        .then(data => {
-            console.log('Success:', data);
-            // Display results
-            updateResults(data);
-            // Set up feedback buttons
-            setupFeedbackButtons(data.prediction_id, data.primary_style);
-            // Hide loading section and show results
-            loadingSection.classList.add('d-none');
-            resultsSection.classList.remove('d-none');
-            // Scroll to results section
-            resultsSection.scrollIntoView({ behavior: 'smooth' });
+        .then(() => {
+            if (!finished) {
+                throw new Error('The connection closed before the analysis finished');
+            }
         })
         .catch(error => {
             console.error('Error:', error);
-            // Show error and hide loading section
+            // Show error and hide loading and partial results
             showError(error.message);
             loadingSection.classList.add('d-none');
+            resultsSection.classList.add('d-none');
             introSection.classList.remove('d-none');
             // Reset upload button
             uploadButton.disabled = false;
@@ -223,6 +261,47 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // Read a server-sent event stream from a fetch response, calling
+    // onEvent(event, data) for each event; resolves when the stream ends
+    function readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        function dispatch(block) {
+            let event = 'message';
+            const dataLines = [];
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    dataLines.push(line.slice(5).trim());
+                }
+            });
+            if (dataLines.length > 0) {
+                onEvent(event, JSON.parse(dataLines.join('\n')));
+            }
+        }
+        
+        function read() {
+            return reader.read().then(({ done, value }) => {
+                buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    dispatch(buffer.slice(0, boundary));
+                    buffer = buffer.slice(boundary + 2);
+                }
+                if (done) {
+                    if (buffer.trim()) dispatch(buffer);
+                    return;
+                }
+                return read();
+            });
+        }
+        
+        return read();
+    }
+    
     function startProgressAnimation() {
         let progress = 0;
         const interval = setInterval(() => {
@@ -253,7 +332,7 @@ document.addEventListener('DOMContentLoaded', function() {
         errorContainer.innerHTML = `<div class="alert alert-danger">${message}</div>`;
     }
     
-    function updateResults(data) {
+    function updateStyle(data) {
         // Update primary style
         if (document.getElementById('primaryStyle')) {
             document.getElementById('primaryStyle').textContent = data.primary_style || 'Unknown Style';
@@ -271,6 +350,11 @@ document.addEventListener('DOMContentLoaded', function() {
         if (document.getElementById('stylingTips')) {
             document.getElementById('stylingTips').textContent = data.styling_tips || 'No styling tips available.';
         }
+    }
+    
+    function updateResults(data) {
+        // Update style, tags, description and tips
+        updateStyle(data);
         
         // Update attributes
         updateAttributes(data.attributes || {});
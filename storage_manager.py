@@ -7,13 +7,18 @@ using Backblaze B2 as the storage provider.
 
 import os
 import io
+import time
 import uuid
 import logging
+import threading
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from PIL import Image
 from dotenv import load_dotenv
 
+from image_artifact import as_artifact
+
 # Load environment variables
 load_dotenv()
 
@@ -23,48 +28,97 @@ B2_APPLICATION_KEY = os.environ.get('BACKBLAZE_APPLICATION_KEY')
 B2_BUCKET_NAME = os.environ.get('BACKBLAZE_BUCKET_NAME')
 B2_ENDPOINT = os.environ.get('BACKBLAZE_ENDPOINT')
 
+# Seconds to wait for a connection and for each response, so a stalled call
+# cannot hold an outbound executor thread much past its stage deadline
+B2_CONNECT_TIMEOUT = float(os.environ.get('BACKBLAZE_CONNECT_TIMEOUT', '5'))
+B2_READ_TIMEOUT = float(os.environ.get('BACKBLAZE_READ_TIMEOUT', '20'))
+
+# Minimum seconds between connection attempts after a failure
+CONNECT_RETRY_INTERVAL = float(os.environ.get('CONNECT_RETRY_INTERVAL', '30'))
+
+# File extensions treated as images when listing storage
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp')
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class StorageManager:
-    """Manages cloud storage operations for the Fashion Style Analyzer app."""
+    """
+    Manages cloud storage operations for the Fashion Style Analyzer app.
+    
+    The connection is opened on first use rather than at construction, so
+    creating the manager never blocks; a failed connection is retried at most
+    every CONNECT_RETRY_INTERVAL seconds.
+    """
     
     def __init__(self):
+        """Create the manager without connecting."""
+        self._s3_client = None
+        self._lock = threading.Lock()
+        self._last_attempt = None
+    
+    @property
+    def s3_client(self):
+        """The S3 client, connecting on first use (None if unavailable)."""
+        if self._s3_client is None and (self._last_attempt is None or
+                                        time.monotonic() - self._last_attempt >= CONNECT_RETRY_INTERVAL):
+            with self._lock:
+                if self._s3_client is None:
+                    self._last_attempt = time.monotonic()
+                    self._connect()
+        return self._s3_client
+    
+    def _connect(self):
         """Initialize the storage connection."""
         try:
             # Initialize S3 client (Backblaze B2 uses S3-compatible API)
-            self.s3_client = boto3.client(
+            client = boto3.client(
                 service_name='s3',
                 endpoint_url=f'https://{B2_ENDPOINT}',
                 aws_access_key_id=B2_KEY_ID,
-                aws_secret_access_key=B2_APPLICATION_KEY
+                aws_secret_access_key=B2_APPLICATION_KEY,
+                config=Config(connect_timeout=B2_CONNECT_TIMEOUT, read_timeout=B2_READ_TIMEOUT,
+                              retries={'max_attempts': 2})
             )
             
-            # Verify connection by listing buckets
-            self.s3_client.list_buckets()
-            logger.info("Successfully connected to Backblaze B2 storage")
-            
-            # Verify bucket exists
-            buckets = [bucket['Name'] for bucket in self.s3_client.list_buckets()['Buckets']]
-            if B2_BUCKET_NAME not in buckets:
+            # Verify the connection and that the bucket exists with a single call
+            try:
+                client.head_bucket(Bucket=B2_BUCKET_NAME)
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchBucket'):
+                    raise
                 logger.warning(f"Bucket {B2_BUCKET_NAME} not found. Will attempt to create it.")
-                self.s3_client.create_bucket(Bucket=B2_BUCKET_NAME)
+                client.create_bucket(Bucket=B2_BUCKET_NAME)
                 logger.info(f"Created bucket {B2_BUCKET_NAME}")
+            logger.info("Successfully connected to Backblaze B2 storage")
+            
+            self._s3_client = client
                 
         except ClientError as e:
             logger.error(f"Failed to connect to Backblaze B2: {e}")
-            self.s3_client = None
         except Exception as e:
             logger.error(f"Error initializing storage: {e}")
-            self.s3_client = None
+    
+    def ping(self):
+        """
+        Check that the bucket is reachable (used by the health probe).
+        
+        Returns:
+            Boolean indicating if storage is available
+        """
+        client = self.s3_client
+        if not client:
+            return False
+        client.head_bucket(Bucket=B2_BUCKET_NAME)
+        return True
     
     def store_image(self, image, image_format='JPEG'):
         """
         Store an image in Backblaze B2 storage.
         
         Args:
-            image: PIL Image object
+            image: PIL Image object or ImageArtifact (whose encoding is reused)
             image_format: Format to save the image in (JPEG, PNG, etc.)
             
         Returns:
@@ -89,11 +143,11 @@ class StorageManager:
             current_date = datetime.datetime.now().strftime('%Y/%m/%d')
             storage_path = f"uploads/{current_date}/{image_id}.{image_format.lower()}"
             
-            # Convert image to bytes
-            img_byte_arr = io.BytesIO()
-            image.save(img_byte_arr, format=image_format)
-            img_byte_arr.seek(0)
-            file_size = img_byte_arr.getbuffer().nbytes
+            # Convert image to bytes (memoized on the artifact)
+            artifact = as_artifact(image)
+            image_bytes = artifact.storage_bytes(image_format)
+            img_byte_arr = io.BytesIO(image_bytes)
+            file_size = len(image_bytes)
             
             # Upload to Backblaze B2
             self.s3_client.upload_fileobj(
@@ -104,7 +158,7 @@ class StorageManager:
             )
             
             # Generate a public URL for the image
-            public_url = f"https://{B2_ENDPOINT}/{B2_BUCKET_NAME}/{storage_path}"
+            public_url = self.public_url(storage_path)
             
             logger.info(f"Image stored successfully with ID: {image_id}")
             
@@ -112,7 +166,7 @@ class StorageManager:
                 "image_id": image_id,
                 "storage_path": storage_path,
                 "public_url": public_url,
-                "dimensions": image.size,
+                "dimensions": artifact.size,
                 "file_size": file_size,
                 "success": True
             }
@@ -124,6 +178,10 @@ class StorageManager:
             logger.error(f"Error storing image: {e}")
             return {"success": False, "error": str(e)}
     
+    def public_url(self, storage_path):
+        """Return the public URL of a stored image."""
+        return f"https://{B2_ENDPOINT}/{B2_BUCKET_NAME}/{storage_path}"
+    
     def retrieve_image(self, storage_path):
         """
         Retrieve an image from Backblaze B2 storage.
@@ -156,6 +214,31 @@ class StorageManager:
             logger.error(f"Error retrieving image: {e}")
             return None
     
+    def list_images(self, prefix='uploads/'):
+        """
+        List stored images, one page of keys at a time.
+        
+        Args:
+            prefix: Storage path prefix to list
+            
+        Yields:
+            Storage paths of image objects under the prefix
+        """
+        if not self.s3_client:
+            logger.error("Storage connection not available")
+            return
+        
+        try:
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=B2_BUCKET_NAME, Prefix=prefix):
+                for obj in page.get('Contents', []):
+                    if obj['Key'].lower().endswith(IMAGE_EXTENSIONS):
+                        yield obj['Key']
+        except ClientError as e:
+            logger.error(f"Failed to list images: {e}")
+        except Exception as e:
+            logger.error(f"Error listing images: {e}")
+    
     def delete_image(self, storage_path):
         """
         Delete an image from Backblaze B2 storage.
@@ -182,4 +265,18 @@ class StorageManager:
             return False
         except Exception as e:
             logger.error(f"Error deleting image: {e}")
-            return False
\ No newline at end of file
+            return False
+
+
+# Process-wide manager shared by the app
+_instance = None
+_instance_lock = threading.Lock()
+
+def get_storage_manager():
+    """Returns the process-wide StorageManager, creating it (without connecting) on first use."""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = StorageManager()
+    return _instance
@@ -0,0 +1,149 @@
+"""
+Prediction Worker for Fashion Style Analyzer
+
+Runs predictions queued by /predict in async mode (see job_queue.py). Each
+worker process claims jobs from the shared SQLite queue, runs the same stage
+pipeline as /predict and stores the response for /jobs/<id>. Run as many
+worker processes as the analysis load needs, independently of the web tier;
+they only have to share the queue database with it. Workers also keep the
+eBay result cache warm for popular styles (see cache_warmer.py).
+
+Usage:
+    python worker.py --concurrency 4
+"""
+
+import os
+import time
+import signal
+import socket
+import random
+import argparse
+import logging
+import threading
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import OperationalError
+
+import cache_warmer
+from job_queue import get_job_queue
+from outbound import ExecutorSaturated
+from rate_limiter import RateLimited
+
+# Load environment variables
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Seconds between purges of old finished jobs
+PURGE_INTERVAL = 600
+
+# Failures worth another attempt: outages, timeouts (including stage deadlines) and overload
+TRANSIENT_ERRORS = (TimeoutError, ConnectionError, RateLimited, ExecutorSaturated, OperationalError)
+
+
+def is_transient(error):
+    """
+    Whether a failed job may succeed if run again. Bad uploads and other
+    errors that would fail the same way every time are not retried.
+    """
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    # OpenAI API errors: rate limits and server errors pass, other statuses will not
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return status == 429 or status >= 500
+    # openai's connection and timeout errors carry no status code
+    return type(error).__module__.startswith('openai')
+
+
+def work(app, job_queue, name, stop, poll_interval):
+    """
+    Claim and run jobs until stop is set.
+
+    Args:
+        app: Flask app (for the database session of each job)
+        job_queue: JobQueue to claim from
+        name: Worker name recorded on claimed jobs
+        stop: threading.Event ending the loop once the current job is done
+        poll_interval: Seconds to sleep when the queue is empty
+    """
+    from app import run_prediction_job, prediction_error
+    from models import db
+
+    while not stop.is_set():
+        try:
+            job = job_queue.claim(name)
+        except Exception as e:
+            logger.error(f"{name} could not claim a job: {e}")
+            job = None
+        if job is None:
+            # Jitter keeps idle workers from polling in lockstep
+            stop.wait(poll_interval * random.uniform(0.5, 1.5))
+            continue
+
+        start = time.monotonic()
+        logger.info(f"{name} running {job.kind} job {job.id} (attempt {job.attempts})")
+        with app.app_context():
+            try:
+                if job.kind != 'predict':
+                    raise ValueError(f"Unknown job kind: {job.kind}")
+                if job_queue.complete(job.id, name, run_prediction_job(job)):
+                    logger.info(f"{name} finished job {job.id} in {time.monotonic() - start:.1f}s")
+            except Exception as e:
+                error, _ = prediction_error(e)
+                job_queue.fail(job.id, name, error['error'], retry=is_transient(e))
+            finally:
+                db.session.remove()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run queued style predictions.")
+    parser.add_argument('--concurrency', type=int, default=int(os.environ.get('WORKER_CONCURRENCY', '2')),
+                        help="Jobs run at once by this process")
+    parser.add_argument('--poll-interval', type=float, default=float(os.environ.get('WORKER_POLL_INTERVAL', '1')),
+                        help="Seconds between polls of an empty queue")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    # Importing the app configures the databases and loads the perceptual hash index
+    from app import app
+
+    job_queue = get_job_queue()
+    stop = threading.Event()
+
+    def shutdown(signum, frame):
+        logger.info("Stopping after the current jobs finish")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    threads = [
+        threading.Thread(target=work, args=(app, job_queue, f"{prefix}:{i}", stop, args.poll_interval),
+                         name=f"worker-{i}")
+        for i in range(max(1, args.concurrency))
+    ]
+    if cache_warmer.CACHE_WARM_ENABLED:
+        # Keeps popular styles' eBay results cached (one process per host warms each round)
+        threads.append(threading.Thread(target=cache_warmer.run, args=(app, stop), name='cache-warmer'))
+    for thread in threads:
+        thread.start()
+    logger.info(f"Worker {prefix} started with {max(1, args.concurrency)} slots: {job_queue.stats()}")
+
+    while not stop.wait(PURGE_INTERVAL):
+        try:
+            purged = job_queue.purge()
+            if purged:
+                logger.info(f"Purged {purged} finished jobs")
+        except Exception as e:
+            logger.error(f"Error purging finished jobs: {e}")
+
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == '__main__':
+    main()